@@ -3,13 +3,21 @@ AI Layer for LLM Inference
 Uses Google Gemini API for fast inference
 """
 
-from .inference.gemini_engine import GeminiEngine, get_gemini_engine
+from .inference.gemini_engine import GeminiEngine, get_gemini_engine, warm_up_gemini_engine
+from .inference.scheduler import SchedulerFullError
+from .inference.deadline import DeadlineExceededError, with_deadline
+from .inference.resilience import UpstreamUnavailableError
 from .prompts import plan_prompts, nutrition_prompts, health_prompts
 
 
 __all__ = [
     'GeminiEngine',
     'get_gemini_engine',
+    'warm_up_gemini_engine',
+    'SchedulerFullError',
+    'DeadlineExceededError',
+    'UpstreamUnavailableError',
+    'with_deadline',
     'plan_prompts',
     'nutrition_prompts',
     'health_prompts'
@@ -2,6 +2,14 @@
 Inference submodule - Gemini engine for LLM inference
 """
 
-from .gemini_engine import GeminiEngine, get_gemini_engine
+from .gemini_engine import GeminiEngine, get_gemini_engine, warm_up_gemini_engine, invalidate_user_cache
+from .response_cache import cache_namespace
+from .deadline import DeadlineExceededError, deadline, with_deadline
+from .resilience import UpstreamUnavailableError, CircuitOpenError
+from .scheduler import SchedulerFullError
 
-__all__ = ['GeminiEngine', 'get_gemini_engine']
+__all__ = [
+    'GeminiEngine', 'get_gemini_engine', 'warm_up_gemini_engine', 'invalidate_user_cache', 'cache_namespace',
+    'SchedulerFullError', 'DeadlineExceededError', 'deadline', 'with_deadline',
+    'UpstreamUnavailableError', 'CircuitOpenError'
+]
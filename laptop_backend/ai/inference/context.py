@@ -0,0 +1,30 @@
+"""
+Request context for usage accounting
+The route and user an upstream call is made for, carried in context
+variables so the engine can attribute token usage without every caller
+passing them through.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional, Tuple
+
+current_route: ContextVar[Optional[str]] = ContextVar('current_route', default=None)
+current_user: ContextVar[Optional[str]] = ContextVar('current_user', default=None)
+
+
+def get_usage_context() -> Tuple[Optional[str], Optional[str]]:
+    """Return (route, user_id) of the current request or background task."""
+    return current_route.get(), current_user.get()
+
+
+@contextmanager
+def usage_context(route: Optional[str], user_id: Optional[str] = None) -> Iterator[None]:
+    """Attribute the upstream calls made inside the block to route and user_id."""
+    route_token = current_route.set(route)
+    user_token = current_user.set(user_id)
+    try:
+        yield
+    finally:
+        current_route.reset(route_token)
+        current_user.reset(user_token)
@@ -0,0 +1,74 @@
+"""
+Request deadlines for upstream Gemini calls
+Routes declare a latency budget; the engine caps every queue wait and
+upstream call at the time left, so a hung call fails fast and the route
+can return its fallback instead of holding the request.
+"""
+
+import functools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterator, Optional
+
+# Absolute time.monotonic() deadline of the current request, if any
+_deadline: ContextVar[Optional[float]] = ContextVar('deadline', default=None)
+
+
+class DeadlineExceededError(TimeoutError):
+    """Raised when a generation cannot finish within the request deadline or GEMINI_TIMEOUT."""
+
+
+class UpstreamTimeoutError(DeadlineExceededError):
+    """
+    The upstream call ran its full GEMINI_TIMEOUT without answering.
+
+    Unlike a plain DeadlineExceededError (the request's own budget ran out
+    first), this says the upstream is slow, and feeds the circuit breaker
+    and the adaptive limiter.
+    """
+
+
+def remaining_time() -> Optional[float]:
+    """Seconds left before the current deadline, or None if there is no deadline."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+@contextmanager
+def deadline(seconds: float) -> Iterator[None]:
+    """
+    Run the block with a deadline `seconds` from now.
+
+    A nested deadline never extends an enclosing one.
+    """
+    current = _deadline.get()
+    new = time.monotonic() + seconds
+    token = _deadline.set(new if current is None else min(current, new))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+@contextmanager
+def no_deadline() -> Iterator[None]:
+    """Run the block without a deadline (background work outliving its request)."""
+    token = _deadline.set(None)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def with_deadline(seconds: float) -> Callable:
+    """Decorator declaring the latency budget of a route."""
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with deadline(seconds):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,383 @@
+"""
+Persistent response cache for the Gemini inference engine
+SQLite (WAL mode) store shared by all worker processes on a host
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger('ai')
+
+DEFAULT_CACHE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    'cache',
+    'gemini_cache.sqlite3'
+)
+
+
+class SQLiteResponseCache:
+    """
+    On-disk response cache with the same interface as ResponseCache.
+
+    Responses are zlib-compressed. Every gunicorn worker opens the same
+    database file; WAL mode lets readers proceed while another worker
+    writes. Entries are evicted least-recently-used first when the entry
+    count or total compressed size goes over budget, and expire after
+    their TTL (0 means never).
+
+    Reads do not write: access times are buffered per process and flushed
+    in one statement every access_batch hits or access_flush_interval
+    seconds (and before eviction), so LRU order is approximate. Entry
+    count and total size are kept in a meta row maintained by triggers,
+    so the budget check on each write is O(1); expired rows are purged
+    every purge_interval writes.
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_CACHE_PATH,
+        max_entries: int = 10000,
+        max_bytes: int = 256 * 1024 * 1024,
+        default_ttl: int = 3600,
+        family_ttls: Optional[Dict[str, int]] = None,
+        access_batch: int = 64,
+        access_flush_interval: float = 30.0,
+        purge_interval: int = 100
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.family_ttls = family_ttls or {}
+
+        self.access_batch = access_batch
+        self.access_flush_interval = access_flush_interval
+        self.purge_interval = purge_interval
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+        # Access times not yet written to the database
+        self._pending_access: Dict[str, float] = {}
+        self._last_access_flush = time.monotonic()
+        self._sets_since_purge = 0
+
+        # Counters are per process; occupancy comes from the shared file
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = self._conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                family TEXT,
+                namespace TEXT,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(responses)")}
+        if 'namespace' not in columns:
+            # Cache files created before namespaces existed
+            conn.execute("ALTER TABLE responses ADD COLUMN namespace TEXT")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses(last_access)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_namespace ON responses(namespace)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_expires_at ON responses(expires_at)")
+        conn.commit()
+        self._create_meta(conn)
+        logger.info(f"AI_CACHE: SQLite response cache at {self.path}")
+
+    def _create_meta(self, conn: sqlite3.Connection):
+        """Create the occupancy meta row and the triggers that keep it current."""
+        # One transaction, so no row is written between seeding and the triggers
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses_meta (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    entries INTEGER NOT NULL,
+                    bytes INTEGER NOT NULL
+                )
+            """)
+            conn.execute(
+                "INSERT OR IGNORE INTO responses_meta (id, entries, bytes) "
+                "SELECT 1, COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            )
+            conn.execute("""
+                CREATE TRIGGER IF NOT EXISTS responses_meta_insert AFTER INSERT ON responses
+                BEGIN
+                    UPDATE responses_meta SET entries = entries + 1, bytes = bytes + NEW.size WHERE id = 1;
+                END
+            """)
+            conn.execute("""
+                CREATE TRIGGER IF NOT EXISTS responses_meta_delete AFTER DELETE ON responses
+                BEGIN
+                    UPDATE responses_meta SET entries = entries - 1, bytes = bytes - OLD.size WHERE id = 1;
+                END
+            """)
+            conn.execute("""
+                CREATE TRIGGER IF NOT EXISTS responses_meta_update AFTER UPDATE OF size ON responses
+                BEGIN
+                    UPDATE responses_meta SET bytes = bytes - OLD.size + NEW.size WHERE id = 1;
+                END
+            """)
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+
+    def _occupancy(self, conn: sqlite3.Connection) -> Tuple[int, int]:
+        """Return (entries, bytes) from the meta row."""
+        return conn.execute("SELECT entries, bytes FROM responses_meta WHERE id = 1").fetchone()
+
+    def _conn(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _rollback(self):
+        """End this thread's failed transaction, so its connection doesn't keep the write lock."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            return
+        try:
+            conn.rollback()
+        except sqlite3.Error as e:
+            logger.warning(f"AI_CACHE: SQLite cache rollback failed: {e}")
+
+    def ttl_for(self, family: Optional[str] = None) -> int:
+        """Return the TTL in seconds that applies to a prompt family."""
+        if family and family in self.family_ttls:
+            return self.family_ttls[family]
+        return self.default_ttl
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached value for key, or None on miss or expiry."""
+        entry = self.get_with_age(key)
+        return entry[0] if entry is not None else None
+
+    def get_with_age(self, key: str) -> Optional[Tuple[str, float]]:
+        """Return (value, seconds since it was stored) for key, or None on miss or expiry."""
+        now = time.time()
+        try:
+            conn = self._conn()
+            row = conn.execute(
+                "SELECT value, expires_at, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None:
+                self._count('misses')
+                return None
+
+            value, expires_at, created_at = row
+            if expires_at and expires_at <= now:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                conn.commit()
+                self._count('expirations')
+                self._count('misses')
+                return None
+
+            self._touch(key, now)
+            self._count('hits')
+            return zlib.decompress(value).decode('utf-8'), now - created_at
+
+        except (sqlite3.Error, zlib.error) as e:
+            logger.warning(f"AI_CACHE: SQLite cache read failed: {e}")
+            self._rollback()
+            self._count('misses')
+            return None
+
+    def set(self, key: str, value: str, family: Optional[str] = None, namespace: Optional[str] = None):
+        """Store a compressed value, evicting older entries to stay within budget."""
+        blob = zlib.compress(value.encode('utf-8'))
+        size = len(key) + len(blob)
+        if size > self.max_bytes:
+            logger.warning(f"AI_CACHE: Response of {size} bytes exceeds cache budget, not cached")
+            return
+
+        now = time.time()
+        ttl = self.ttl_for(family)
+        expires_at = now + ttl if ttl > 0 else 0
+
+        try:
+            conn = self._conn()
+            # Upsert rather than REPLACE, so the meta triggers see an update
+            conn.execute(
+                "INSERT INTO responses "
+                "(key, value, family, namespace, size, created_at, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value, family = excluded.family, "
+                "namespace = excluded.namespace, size = excluded.size, created_at = excluded.created_at, "
+                "expires_at = excluded.expires_at, last_access = excluded.last_access",
+                (key, blob, family, namespace, size, now, expires_at, now)
+            )
+            with self._lock:
+                self._pending_access.pop(key, None)
+            self._evict(conn, now)
+            conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"AI_CACHE: SQLite cache write failed: {e}")
+            self._rollback()
+
+    def _touch(self, key: str, now: float):
+        """Buffer an access time, flushing the buffer when it is full or old."""
+        with self._lock:
+            self._pending_access[key] = now
+            due = (
+                len(self._pending_access) >= self.access_batch
+                or time.monotonic() - self._last_access_flush >= self.access_flush_interval
+            )
+        if due:
+            # Access times only order evictions: a failed flush must not turn the hit into a miss
+            try:
+                conn = self._conn()
+                self._flush_access(conn)
+                conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"AI_CACHE: SQLite access-time flush failed: {e}")
+                self._rollback()
+
+    def _flush_access(self, conn: sqlite3.Connection):
+        """Write buffered access times (the caller commits)."""
+        with self._lock:
+            pending = self._pending_access
+            self._pending_access = {}
+            self._last_access_flush = time.monotonic()
+        if pending:
+            conn.executemany(
+                "UPDATE responses SET last_access = ? WHERE key = ?",
+                [(at, key) for key, at in pending.items()]
+            )
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        """Purge expired rows every purge_interval writes, then LRU rows until within budget."""
+        with self._lock:
+            self._sets_since_purge += 1
+            purge = self._sets_since_purge >= self.purge_interval
+            if purge:
+                self._sets_since_purge = 0
+
+        count, total_bytes = self._occupancy(conn)
+        over_budget = count > self.max_entries or total_bytes > self.max_bytes
+        if purge or over_budget:
+            expired = conn.execute(
+                "DELETE FROM responses WHERE expires_at > 0 AND expires_at <= ?", (now,)
+            ).rowcount
+            if expired > 0:
+                self._count('expirations', expired)
+                count, total_bytes = self._occupancy(conn)
+
+        if count <= self.max_entries and total_bytes <= self.max_bytes:
+            return
+
+        # Recent hits must count before picking least-recently-used victims
+        self._flush_access(conn)
+
+        victims = []
+        for key, size in conn.execute("SELECT key, size FROM responses ORDER BY last_access"):
+            if count <= self.max_entries and total_bytes <= self.max_bytes:
+                break
+            victims.append((key,))
+            count -= 1
+            total_bytes -= size
+
+        conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+        self._count('evictions', len(victims))
+
+    def delete(self, key: str) -> bool:
+        """Remove a single entry. Returns True if it existed."""
+        try:
+            conn = self._conn()
+            deleted = conn.execute("DELETE FROM responses WHERE key = ?", (key,)).rowcount
+            conn.commit()
+            return deleted > 0
+        except sqlite3.Error as e:
+            logger.warning(f"AI_CACHE: SQLite cache delete failed: {e}")
+            self._rollback()
+            return False
+
+    def invalidate_namespace(self, prefix: str) -> int:
+        """Remove every entry (for every worker) whose namespace starts with prefix. Returns the count."""
+        try:
+            conn = self._conn()
+            deleted = conn.execute(
+                "DELETE FROM responses WHERE substr(namespace, 1, ?) = ?", (len(prefix), prefix)
+            ).rowcount
+            conn.commit()
+            return deleted
+        except sqlite3.Error as e:
+            logger.warning(f"AI_CACHE: SQLite cache invalidation failed: {e}")
+            self._rollback()
+            return 0
+
+    def clear(self):
+        """Drop all entries (for every worker) and reset this process's counters."""
+        try:
+            conn = self._conn()
+            conn.execute("DELETE FROM responses")
+            conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"AI_CACHE: SQLite cache clear failed: {e}")
+            self._rollback()
+
+        with self._lock:
+            self._pending_access = {}
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+            self.expirations = 0
+
+    def _count(self, counter: str, amount: int = 1):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def stats(self) -> Dict:
+        """Return cache counters and occupancy."""
+        try:
+            entries, total_bytes = self._occupancy(self._conn())
+        except sqlite3.Error:
+            entries, total_bytes = None, None
+
+        with self._lock:
+            total_requests = self.hits + self.misses
+            hit_rate = self.hits / total_requests if total_requests > 0 else 0
+            return {
+                "backend": "sqlite",
+                "path": self.path,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": f"{hit_rate:.2%}",
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "entries": entries,
+                "max_entries": self.max_entries,
+                "bytes": total_bytes,
+                "max_bytes": self.max_bytes,
+                "default_ttl": self.default_ttl,
+                "family_ttls": dict(self.family_ttls)
+            }
+
+    def __len__(self) -> int:
+        try:
+            return self._occupancy(self._conn())[0]
+        except sqlite3.Error:
+            return 0
@@ -4,14 +4,42 @@ Fast LLM inference using Google's Gemini API
 """
 
 import os
+import asyncio
+import concurrent.futures
 import logging
 import threading
 import hashlib
-from typing import Dict, Optional
+import json
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
 import google.generativeai as genai
 
+from .response_cache import ResponseCache, namespace_prefix, parse_family_ttls
+from .disk_cache import SQLiteResponseCache, DEFAULT_CACHE_PATH
+from .single_flight import SingleFlight
+from .refresher import BackgroundRefresher
+from .scheduler import InferenceScheduler
+from .limiter import AdaptiveLimiter
+from .health import UpstreamHealth, FamilyLatency, HEALTHY, DEGRADED, UNKNOWN
+from .hedging import HedgeBudget
+from .resilience import (
+    CircuitBreaker, CircuitOpenError, RetryPolicy, UpstreamUnavailableError, is_congestion, is_retryable
+)
+from .metrics import output_metrics, usage_metrics
+from .context import get_usage_context
+from .deadline import DeadlineExceededError, UpstreamTimeoutError, remaining_time
+from ..utils.model_utils import calculate_token_estimate
+
 logger = logging.getLogger('ai')
 
+# Engine readiness, reported on /health. Construction only configures the
+# client; the connection is warmed and probed on a background thread.
+STATE_COLD = "cold"                  # configured, warm-up not started
+STATE_WARMING = "warming"            # warm-up probe in flight
+STATE_READY = "ready"                # probe succeeded
+STATE_DEGRADED = "degraded"          # probe failed; requests are still attempted
+STATE_UNCONFIGURED = "unconfigured"  # GEMINI_API_KEY missing; generation raises
+
 
 class GeminiEngine:
     """
@@ -31,52 +59,308 @@ class GeminiEngine:
         return cls._instance
 
     def __init__(self):
-        """Initialize the Gemini engine."""
+        """
+        Initialize the Gemini engine.
+
+        Makes no network calls and does not raise on missing configuration;
+        call start_warmup() to connect in the background.
+        """
         if self._initialized:
             return
+        with self._lock:
+            if not self._initialized:
+                self._setup()
 
+    def _setup(self):
         logger.info("=" * 60)
         logger.info("Initializing Gemini Inference Engine")
         logger.info("=" * 60)
 
+        # Readiness state machine (see STATE_*)
+        self._state_lock = threading.Lock()
+        self._state = STATE_COLD
+        self._state_since = time.time()
+        self._state_error: Optional[str] = None
+        self._warmup_seconds: Optional[float] = None
+
         # Configuration from environment
         self.api_key = os.getenv("GEMINI_API_KEY")
-        if not self.api_key:
-            raise ValueError("GEMINI_API_KEY environment variable is required")
-
         self.model_name = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
         self.max_new_tokens = int(os.getenv("MAX_NEW_TOKENS", "1024"))
         self.temperature = float(os.getenv("TEMPERATURE", "0.7"))
         self.timeout = int(os.getenv("GEMINI_TIMEOUT", "60"))
+        # JSON mode with a response schema when callers provide one
+        self.structured_output = os.getenv("GEMINI_STRUCTURED_OUTPUT", "true").lower() == "true"
 
-        # Configure the API
-        genai.configure(api_key=self.api_key)
+        self.model = None
+        if self.api_key:
+            # Configure the API (no network calls until the first generation)
+            genai.configure(api_key=self.api_key)
 
-        # Initialize the model
-        self.model = genai.GenerativeModel(
-            model_name=self.model_name,
-            generation_config={
-                "temperature": self.temperature,
-                "max_output_tokens": self.max_new_tokens,
-                "top_p": 0.9,
-            }
+            # Initialize the model
+            self.model = genai.GenerativeModel(
+                model_name=self.model_name,
+                generation_config={
+                    "temperature": self.temperature,
+                    "max_output_tokens": self.max_new_tokens,
+                    "top_p": 0.9,
+                }
+            )
+        else:
+            logger.error("GEMINI_API_KEY environment variable is not set; AI generation is disabled")
+            self._set_state(STATE_UNCONFIGURED, "GEMINI_API_KEY environment variable is required")
+
+        # Stale-while-revalidate: entries older than the soft TTL are served
+        # and regenerated in the background (see generate_swr); entries in
+        # these families expire after a longer hard TTL (see _with_swr_ttls)
+        self.swr_soft_ttl = int(os.getenv("GEMINI_SWR_SOFT_TTL", "3600"))
+        self.swr_families = set(filter(None, (
+            family.strip() for family in os.getenv(
+                "GEMINI_SWR_FAMILIES", "health_analysis,nutrition_analysis"
+            ).split(",")
+        )))
+
+        # Response cache (in-memory per worker, or SQLite shared by all workers)
+        self.cache_backend = os.getenv("GEMINI_CACHE_BACKEND", "memory").lower()
+        self._cache = self._build_cache()
+
+        # Identical concurrent prompts share one upstream call
+        self._inflight = SingleFlight()
+
+        self._refresher = BackgroundRefresher(
+            workers=int(os.getenv("GEMINI_REFRESH_WORKERS", "2")),
+            max_pending=int(os.getenv("GEMINI_REFRESH_MAX_PENDING", "32"))
         )
 
-        # Simple response cache
-        self._cache: Dict[str, str] = {}
-        self._cache_hits = 0
-        self._cache_misses = 0
+        # Admission control for upstream calls
+        max_concurrency = int(os.getenv("GEMINI_MAX_CONCURRENCY", "4"))
+        limiter = None
+        if os.getenv("GEMINI_ADAPTIVE_CONCURRENCY", "true").lower() == "true":
+            latency_target = os.getenv("GEMINI_LATENCY_TARGET")
+            limiter = AdaptiveLimiter(
+                initial_limit=max_concurrency,
+                min_limit=int(os.getenv("GEMINI_CONCURRENCY_FLOOR", "1")),
+                max_limit=int(os.getenv("GEMINI_CONCURRENCY_CEILING", "16")),
+                latency_target=float(latency_target) if latency_target else None
+            )
+        self._scheduler = InferenceScheduler(
+            max_concurrency=max_concurrency,
+            max_queue=int(os.getenv("GEMINI_MAX_QUEUE", "32")),
+            queue_timeout=float(os.getenv("GEMINI_QUEUE_TIMEOUT", "30")),
+            limiter=limiter
+        )
+
+        # Passive health from real traffic; the active probe runs at most
+        # once per interval (0 disables it) and its result is cached
+        self._health = UpstreamHealth(
+            window=int(os.getenv("GEMINI_HEALTH_WINDOW", "200")),
+            min_success_rate=float(os.getenv("GEMINI_HEALTH_MIN_SUCCESS_RATE", "0.9"))
+        )
+        self.probe_interval = int(os.getenv("GEMINI_HEALTH_PROBE_INTERVAL", "300"))
+        self._probe_lock = threading.Lock()
+        self._probe_result: Optional[Dict] = None
+
+        # Request hedging: an interactive call in a hedged family that has not
+        # returned by the family's rolling p90 latency gets a duplicate, and
+        # the first response wins; duplicates are capped by the hedge budget
+        self._family_latency = FamilyLatency(
+            window=int(os.getenv("GEMINI_HEDGE_WINDOW", "200")),
+            min_samples=int(os.getenv("GEMINI_HEDGE_MIN_SAMPLES", "20"))
+        )
+        self.hedging = os.getenv("GEMINI_HEDGING", "false").lower() == "true"
+        self.hedge_families = set(filter(None, (
+            family.strip() for family in os.getenv(
+                "GEMINI_HEDGE_FAMILIES", "meal_suggestions,workout_adjustment,nutrition_adjustment"
+            ).split(",")
+        )))
+        self.hedge_percentile = float(os.getenv("GEMINI_HEDGE_PERCENTILE", "90"))
+        self._hedge_budget = HedgeBudget(ratio=float(os.getenv("GEMINI_HEDGE_BUDGET", "0.05")))
+
+        # Retries for transient errors (429/5xx) and a circuit breaker that
+        # fails calls fast while the API keeps failing
+        self._retry = RetryPolicy(
+            max_attempts=int(os.getenv("GEMINI_RETRY_ATTEMPTS", "3")),
+            base_delay=float(os.getenv("GEMINI_RETRY_BASE_DELAY", "0.5")),
+            max_delay=float(os.getenv("GEMINI_RETRY_MAX_DELAY", "8"))
+        )
+        self._breaker = CircuitBreaker(
+            failure_threshold=int(os.getenv("GEMINI_BREAKER_THRESHOLD", "5")),
+            reset_timeout=float(os.getenv("GEMINI_BREAKER_RESET_TIMEOUT", "30"))
+        )
 
-        # Test connection
-        self._test_connection()
+        # Event loop used by the synchronous batch helper (started lazily)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_lock = threading.Lock()
 
         self._initialized = True
         logger.info(f"Model: {self.model_name}")
         logger.info("Gemini Inference Engine initialized successfully")
         logger.info("=" * 60)
 
-    def _test_connection(self):
-        """Test connection to Gemini API."""
+    def _set_state(self, state: str, error: Optional[str] = None):
+        with self._state_lock:
+            self._state = state
+            self._state_since = time.time()
+            self._state_error = error
+
+    @property
+    def state(self) -> str:
+        """Current readiness state (one of the STATE_* constants)."""
+        return self._state
+
+    def readiness(self) -> Dict:
+        """Readiness state for /health."""
+        with self._state_lock:
+            return {
+                "state": self._state,
+                "since": self._state_since,
+                "error": self._state_error,
+                "warmup_seconds": self._warmup_seconds,
+                "upstream": self._health.status(),
+                "breaker": self._breaker.state,
+                "model": self.model_name
+            }
+
+    def start_warmup(self) -> bool:
+        """
+        Warm the connection on a background thread.
+
+        Starts the batch event loop and sends one probe generation, so the
+        first user request does not pay for connection setup. Requests
+        arriving meanwhile are served normally.
+
+        Returns:
+            True if a warm-up was started (only from the cold state)
+        """
+        with self._state_lock:
+            if self._state != STATE_COLD:
+                return False
+            self._state = STATE_WARMING
+            self._state_since = time.time()
+        threading.Thread(target=self._warm_up, name="gemini-warmup", daemon=True).start()
+        return True
+
+    def _warm_up(self):
+        start = time.monotonic()
+        self._get_loop()
+        with self._probe_lock:
+            error = self._run_probe()
+        self._warmup_seconds = round(time.monotonic() - start, 3)
+        self._set_state(STATE_DEGRADED if error else STATE_READY, error)
+        logger.info(f"AI_INFERENCE: Warm-up finished, state={self._state}, elapsed_time={self._warmup_seconds:.2f}s")
+
+    def _observe_upstream(
+        self,
+        latency: float,
+        error: Optional[BaseException] = None,
+        prompt_family: Optional[str] = None
+    ):
+        """
+        Record an upstream call outcome for passive health, the circuit
+        breaker and family latency. A call cut short by the request's own
+        deadline says nothing about the upstream and is not recorded.
+        """
+        if isinstance(error, DeadlineExceededError) and not isinstance(error, UpstreamTimeoutError):
+            return
+        self._health.record(latency, error)
+        if error is not None and is_congestion(error):
+            self._breaker.record_failure()
+        else:
+            self._breaker.record_success()
+        if error is None:
+            self._family_latency.record(prompt_family, latency)
+            if self._state == STATE_DEGRADED:
+                self._set_state(STATE_READY)
+
+    def _run_probe(self) -> Optional[str]:
+        """Send the probe generation and cache its result; returns the error, if any."""
+        start = time.monotonic()
+        error = self._test_connection()
+        self._probe_result = {
+            "ok": error is None,
+            "error": error,
+            "at": time.time(),
+            "latency": round(time.monotonic() - start, 3)
+        }
+        return error
+
+    def probe(self) -> Optional[Dict]:
+        """
+        Result of the active probe, re-running it if it is older than
+        probe_interval seconds.
+
+        Only one caller runs the probe; concurrent callers get the cached
+        result. Returns None if probing is disabled or has never run.
+        """
+        if self.probe_interval <= 0 or self.model is None:
+            return self._probe_result
+        cached = self._probe_result
+        if cached is not None and time.time() - cached["at"] < self.probe_interval:
+            return cached
+        if not self._probe_lock.acquire(blocking=False):
+            return cached
+        try:
+            error = self._run_probe()
+            if self._state in (STATE_READY, STATE_DEGRADED):
+                self._set_state(STATE_DEGRADED if error else STATE_READY, error)
+        finally:
+            self._probe_lock.release()
+        return self._probe_result
+
+    def _require_model(self):
+        """Raise if the engine cannot call the API (missing API key)."""
+        if self.model is None:
+            raise ValueError("GEMINI_API_KEY environment variable is required")
+
+    def _build_cache(self):
+        """Create the response cache backend selected by GEMINI_CACHE_BACKEND."""
+        family_ttls = self._with_swr_ttls(parse_family_ttls(os.getenv("GEMINI_CACHE_FAMILY_TTLS")))
+        default_ttl = int(os.getenv("GEMINI_CACHE_TTL", "3600"))
+
+        if self.cache_backend == "sqlite":
+            try:
+                return SQLiteResponseCache(
+                    path=os.getenv("GEMINI_CACHE_PATH", DEFAULT_CACHE_PATH),
+                    max_entries=int(os.getenv("GEMINI_CACHE_MAX_ENTRIES", "10000")),
+                    max_bytes=int(os.getenv("GEMINI_CACHE_MAX_MB", "256")) * 1024 * 1024,
+                    default_ttl=default_ttl,
+                    family_ttls=family_ttls
+                )
+            except Exception as e:
+                logger.warning(f"AI_CACHE: SQLite cache unavailable ({e}), using in-memory cache")
+                self.cache_backend = "memory"
+
+        return ResponseCache(
+            max_entries=int(os.getenv("GEMINI_CACHE_MAX_ENTRIES", "1024")),
+            max_bytes=int(os.getenv("GEMINI_CACHE_MAX_MB", "32")) * 1024 * 1024,
+            default_ttl=default_ttl,
+            family_ttls=family_ttls
+        )
+
+    def _with_swr_ttls(self, family_ttls: Dict[str, int]) -> Dict[str, int]:
+        """
+        Give the stale-while-revalidate families a hard TTL above the soft TTL.
+
+        A family without a TTL override expires after GEMINI_SWR_HARD_TTL_FACTOR
+        soft TTLs. An override that is not above the soft TTL would leave no
+        window in which a stale entry is served, so it is raised to the same.
+        """
+        factor = max(2, int(os.getenv("GEMINI_SWR_HARD_TTL_FACTOR", "24")))
+        hard_ttl = self.swr_soft_ttl * factor
+        for family in self.swr_families:
+            ttl = family_ttls.get(family)
+            if ttl is None:
+                family_ttls[family] = hard_ttl
+            elif 0 < ttl <= self.swr_soft_ttl:
+                logger.warning(
+                    f"AI_CACHE: TTL {ttl}s for SWR family {family} is not above "
+                    f"GEMINI_SWR_SOFT_TTL {self.swr_soft_ttl}s, using {hard_ttl}s"
+                )
+                family_ttls[family] = hard_ttl
+        return family_ttls
+
+    def _test_connection(self) -> Optional[str]:
+        """Test connection to Gemini API; returns an error message, or None if it works."""
         try:
             # Quick test with a simple prompt
             response = self.model.generate_content(
@@ -85,23 +369,68 @@ class GeminiEngine:
             )
             if response.text:
                 logger.info(f"Connected to Gemini API. Model: {self.model_name}")
-            else:
-                logger.warning("Gemini API returned empty response")
+                return None
+            logger.warning("Gemini API returned empty response")
+            return "Gemini API returned empty response"
         except Exception as e:
             logger.warning(f"Error testing Gemini connection: {e}")
+            return str(e)
 
-    def _get_cache_key(self, prompt: str, max_new_tokens: int, temperature: float) -> str:
-        """Generate a cache key for the request."""
-        key_str = f"{prompt}_{max_new_tokens}_{temperature}"
+    def _get_cache_key(
+        self,
+        prompt: str,
+        max_new_tokens: int,
+        temperature: float,
+        response_schema: Optional[Dict] = None,
+        cache_key_inputs: Optional[Dict] = None
+    ) -> str:
+        """
+        Generate a cache key for the request.
+
+        The key is built from cache_key_inputs (the canonical, bucketed inputs
+        declared by the prompt builder) when given, else from the prompt text.
+        It never includes the user or cache namespace, so users with the same
+        bucketed inputs share an entry.
+        """
+        if cache_key_inputs is not None:
+            source = f"inputs:{json.dumps(cache_key_inputs, sort_keys=True, default=str)}"
+        else:
+            source = prompt
+        key_str = f"{source}_{max_new_tokens}_{temperature}"
+        if response_schema is not None:
+            key_str += f"_json:{json.dumps(response_schema, sort_keys=True)}"
         return hashlib.md5(key_str.encode()).hexdigest()
 
+    def _generation_config(
+        self,
+        max_new_tokens: int,
+        temperature: float,
+        top_p: float,
+        response_schema: Optional[Dict] = None
+    ) -> Dict:
+        """Build the per-request generation config, in JSON mode if a schema is given."""
+        generation_config = {
+            "temperature": temperature,
+            "max_output_tokens": max_new_tokens,
+            "top_p": top_p,
+        }
+        if response_schema is not None:
+            generation_config["response_mime_type"] = "application/json"
+            generation_config["response_schema"] = response_schema
+        return generation_config
+
     def generate(
         self,
         prompt: str,
         max_new_tokens: Optional[int] = None,
         temperature: Optional[float] = None,
         top_p: Optional[float] = None,
-        use_cache: bool = True
+        use_cache: bool = True,
+        prompt_family: Optional[str] = None,
+        priority: str = "interactive",
+        response_schema: Optional[Dict] = None,
+        cache_key_inputs: Optional[Dict] = None,
+        cache_namespace: Optional[str] = None
     ) -> str:
         """
         Generate text using Gemini.
@@ -112,9 +441,27 @@ class GeminiEngine:
             temperature: Sampling temperature
             top_p: Nucleus sampling threshold
             use_cache: Whether to use response cache
+            prompt_family: Prompt family (e.g. "plan", "health_analysis"),
+                used for per-family cache TTLs
+            priority: Scheduling class, "interactive" or "bulk"; interactive
+                calls are admitted ahead of bulk ones when the engine is busy
+            response_schema: Response schema (see ai.prompts.schemas); when set,
+                the model runs in JSON mode constrained to this schema.
+                Ignored if GEMINI_STRUCTURED_OUTPUT is false.
+            cache_key_inputs: Canonical inputs the prompt depends on, from the
+                prompt builder's *_key() function (see ai.prompts.cache_keys).
+                When set, the response is cached under these instead of the
+                prompt text, so near-identical profiles share an entry.
+            cache_namespace: Namespace of the user data the response depends
+                on, from response_cache.cache_namespace(). Stored as a tag on
+                the entry (not part of its key) so profile writes can drop it
+                with invalidate_user_cache()
 
         Returns:
             Generated text
+
+        Raises:
+            SchedulerFullError: The engine is saturated; retry after e.retry_after
         """
         max_new_tokens = max_new_tokens or self.max_new_tokens
         temperature = temperature or self.temperature
@@ -122,93 +469,700 @@ class GeminiEngine:
 
         logger.info(f"AI_INFERENCE: Starting generation with Gemini model={self.model_name}")
 
+        if not self.structured_output:
+            response_schema = None
+        generation_config = self._generation_config(max_new_tokens, temperature, top_p, response_schema)
+
+        if not use_cache:
+            return self._generate_uncached(prompt, generation_config, priority, prompt_family)
+
         # Check cache
-        if use_cache:
-            cache_key = self._get_cache_key(prompt, max_new_tokens, temperature)
-            if cache_key in self._cache:
-                self._cache_hits += 1
-                logger.info("AI_INFERENCE: Cache HIT - returning cached response")
-                return self._cache[cache_key]
-            self._cache_misses += 1
+        cache_key = self._get_cache_key(
+            prompt, max_new_tokens, temperature, response_schema, cache_key_inputs
+        )
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            logger.info("AI_INFERENCE: Cache HIT - returning cached response")
+            return cached
+
+        # Coalesce with an identical in-flight generation, if any
+        future, is_leader = self._inflight.join(cache_key)
+        if not is_leader:
+            logger.info("AI_INFERENCE: Joining in-flight generation for identical prompt")
+            try:
+                return future.result(self._call_timeout())
+            except concurrent.futures.TimeoutError as e:
+                raise DeadlineExceededError("Request deadline exceeded waiting for an in-flight generation") from e
 
         try:
-            # Create generation config for this request
-            generation_config = {
-                "temperature": temperature,
-                "max_output_tokens": max_new_tokens,
-                "top_p": top_p,
-            }
+            generated_text = self._generate_uncached(prompt, generation_config, priority, prompt_family)
+            self._cache.set(cache_key, generated_text, family=prompt_family, namespace=cache_namespace)
+        except BaseException as e:
+            # Also on KeyboardInterrupt/SystemExit/GeneratorExit, so followers never wait on a dead leader
+            self._inflight.complete(cache_key, error=e)
+            raise
 
-            response = self.model.generate_content(
+        self._inflight.complete(cache_key, result=generated_text)
+        return generated_text
+
+    def generate_swr(
+        self,
+        prompt: str,
+        max_new_tokens: Optional[int] = None,
+        temperature: Optional[float] = None,
+        top_p: Optional[float] = None,
+        prompt_family: Optional[str] = None,
+        response_schema: Optional[Dict] = None,
+        cache_key_inputs: Optional[Dict] = None,
+        cache_namespace: Optional[str] = None,
+        soft_ttl: Optional[int] = None,
+        validate: Optional[Callable[[str], bool]] = None
+    ) -> Tuple[str, float]:
+        """
+        Generate with stale-while-revalidate caching.
+
+        A cached response is returned immediately whatever its age; if it is
+        older than soft_ttl it is regenerated on the background refresh pool
+        for the next caller. Only a cache miss blocks on generation, as in
+        generate(). Entries still expire after the cache's hard TTL for the
+        family, which for GEMINI_SWR_FAMILIES is kept above the soft TTL.
+
+        Args:
+            prompt, max_new_tokens, temperature, top_p, prompt_family,
+            response_schema, cache_key_inputs, cache_namespace: As generate()
+            soft_ttl: Age in seconds after which a cached response is
+                refreshed; defaults to GEMINI_SWR_SOFT_TTL
+            validate: Called with a background refresh's output; the
+                refresh replaces the cached response only if it returns True,
+                so the last good response keeps being served
+
+        Returns:
+            Tuple of (generated text, age in seconds of the returned response)
+
+        Raises:
+            SchedulerFullError: On a cache miss, if the engine is saturated
+        """
+        max_new_tokens = max_new_tokens or self.max_new_tokens
+        temperature = temperature or self.temperature
+        top_p = top_p or 0.9
+        soft_ttl = self.swr_soft_ttl if soft_ttl is None else soft_ttl
+
+        if not self.structured_output:
+            response_schema = None
+        cache_key = self._get_cache_key(
+            prompt, max_new_tokens, temperature, response_schema, cache_key_inputs
+        )
+
+        entry = self._cache.get_with_age(cache_key)
+        if entry is None:
+            generated_text = self.generate(
                 prompt,
-                generation_config=generation_config
+                max_new_tokens=max_new_tokens,
+                temperature=temperature,
+                top_p=top_p,
+                prompt_family=prompt_family,
+                response_schema=response_schema,
+                cache_key_inputs=cache_key_inputs,
+                cache_namespace=cache_namespace
+            )
+            return generated_text, 0.0
+
+        cached, age = entry
+        if age > soft_ttl:
+            generation_config = self._generation_config(max_new_tokens, temperature, top_p, response_schema)
+
+            def refresh():
+                generated_text = self._generate_uncached(prompt, generation_config, "bulk", prompt_family)
+                if validate is not None and not validate(generated_text):
+                    logger.warning(f"AI_CACHE: Background refresh for family={prompt_family} produced invalid output, keeping cached response")
+                    return
+                self._cache.set(cache_key, generated_text, family=prompt_family, namespace=cache_namespace)
+
+            if self._refresher.submit(cache_key, refresh):
+                logger.info(f"AI_CACHE: Serving stale response (age={age:.0f}s) for family={prompt_family}, refreshing in background")
+        else:
+            logger.info("AI_INFERENCE: Cache HIT - returning cached response")
+        return cached, age
+
+    def _generate_uncached(
+        self,
+        prompt: str,
+        generation_config: Dict,
+        priority: str,
+        prompt_family: Optional[str] = None
+    ) -> str:
+        """Call the Gemini API and return the generated text, retrying transient errors."""
+        self._require_model()
+        attempt = 1
+        while True:
+            try:
+                return self._generate_attempt(prompt, generation_config, priority, prompt_family)
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    logger.error(f"AI_INFERENCE: Generation error: {e}", exc_info=True)
+                    final = self._give_up(e, attempt)
+                    if final is e:
+                        raise
+                    raise final from e
+                time.sleep(delay)
+                attempt += 1
+
+    def _generate_attempt(
+        self,
+        prompt: str,
+        generation_config: Dict,
+        priority: str,
+        prompt_family: Optional[str] = None
+    ) -> str:
+        """Make one upstream call (unless the circuit breaker is open)."""
+        self._check_breaker()
+        with self._scheduler.slot(priority, self._call_timeout()):
+            call_timeout = self._call_timeout()
+            start = time.monotonic()
+            try:
+                if self._should_hedge(priority, prompt_family):
+                    response = asyncio.run_coroutine_threadsafe(
+                        asyncio.wait_for(
+                            self._hedged_generate_content(prompt, generation_config, prompt_family, call_timeout),
+                            call_timeout
+                        ),
+                        self._get_loop()
+                    ).result()
+                else:
+                    response = self.model.generate_content(
+                        prompt,
+                        generation_config=generation_config,
+                        request_options={"timeout": call_timeout}
+                    )
+            except Exception as e:
+                error = self._timeout_error(e, start, call_timeout)
+                self._observe_upstream(time.monotonic() - start, error)
+                if error is not e:
+                    raise error from e
+                raise
+            latency = time.monotonic() - start
+            self._observe_upstream(latency, prompt_family=prompt_family)
+
+        self._record_usage(response, prompt, prompt_family, latency)
+        return self._extract_text(response)
+
+    def _check_breaker(self):
+        """Raise CircuitOpenError without calling the API while the breaker is open."""
+        if not self._breaker.allow():
+            raise CircuitOpenError("Gemini circuit breaker is open", self._breaker.retry_after())
+
+    def _retry_delay(self, error: Exception, attempt: int) -> Optional[float]:
+        """Backoff before retrying after a failed attempt, or None to give up."""
+        if not is_retryable(error):
+            return None
+        if attempt >= self._retry.max_attempts:
+            self._retry.record('exhausted')
+            return None
+        delay = self._retry.backoff(attempt)
+        left = remaining_time()
+        if left is not None and delay >= left:
+            return None
+        self._retry.record('retries')
+        logger.warning(f"AI_INFERENCE: Transient error on attempt {attempt}: {error}, retrying in {delay:.2f}s")
+        return delay
+
+    def _give_up(self, error: Exception, attempts: int) -> Exception:
+        """The exception to raise for an error that will not be retried."""
+        if is_retryable(error):
+            return UpstreamUnavailableError(
+                f"Gemini unavailable after {attempts} attempt(s): {error}",
+                self._breaker.retry_after()
+            )
+        return error
+
+    def _call_timeout(self) -> float:
+        """
+        Seconds the next queue wait or upstream call may take: GEMINI_TIMEOUT,
+        capped by the time left before the request deadline.
+        """
+        left = remaining_time()
+        if left is None:
+            return self.timeout
+        if left <= 0:
+            raise DeadlineExceededError("Request deadline exceeded")
+        return min(self.timeout, left)
+
+    def _timeout_error(self, error: Exception, start: float, call_timeout: float) -> Exception:
+        """
+        Map an upstream error raised once the call's time budget ran out to
+        UpstreamTimeoutError if the budget was the full GEMINI_TIMEOUT, or to
+        DeadlineExceededError if the request deadline had capped it.
+        """
+        if isinstance(error, DeadlineExceededError):
+            return error
+        if isinstance(error, TimeoutError) or time.monotonic() - start >= call_timeout:
+            if call_timeout >= self.timeout:
+                return UpstreamTimeoutError(f"Gemini call exceeded GEMINI_TIMEOUT ({call_timeout:.1f}s)")
+            return DeadlineExceededError(f"Gemini call exceeded its {call_timeout:.1f}s time budget")
+        return error
+
+    def _should_hedge(self, priority: str, prompt_family: Optional[str]) -> bool:
+        """Whether this call is eligible for hedging; eligible calls earn hedge budget."""
+        if not self.hedging or priority != "interactive" or prompt_family not in self.hedge_families:
+            return False
+        self._hedge_budget.on_call()
+        return True
+
+    async def _hedged_generate_content(
+        self,
+        prompt: str,
+        generation_config: Dict,
+        prompt_family: str,
+        call_timeout: float
+    ):
+        """
+        Call the API, firing a duplicate if no response arrives within the
+        family's rolling p90 latency; the first successful response wins and
+        the other call is cancelled.
+
+        Runs on the engine loop. The caller holds a scheduler slot for the
+        primary call; the duplicate only runs if another slot is free right
+        away and the hedge budget allows it. On every exit, including
+        cancellation while waiting for the hedge delay, unfinished calls are
+        cancelled and awaited before the hedge slot is released.
+        """
+        primary = asyncio.ensure_future(
+            self.model.generate_content_async(
+                prompt, generation_config=generation_config, request_options={"timeout": call_timeout}
+            )
+        )
+        tasks = [primary]
+        holds_hedge_slot = False
+        try:
+            delay = self._family_latency.percentile(prompt_family, self.hedge_percentile)
+            if delay is None:
+                return await primary
+
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if done:
+                return primary.result()
+            if not self._scheduler.try_acquire():
+                self._hedge_budget.record('skipped_capacity')
+                return await primary
+            if not self._hedge_budget.try_spend():
+                self._scheduler.release()
+                return await primary
+            holds_hedge_slot = True
+
+            logger.info(f"AI_INFERENCE: Hedging family={prompt_family} call after {delay:.2f}s")
+            hedge = asyncio.ensure_future(
+                self.model.generate_content_async(
+                    prompt, generation_config=generation_config, request_options={"timeout": call_timeout}
+                )
             )
+            tasks.append(hedge)
+            pending = {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self._hedge_budget.record('hedge_wins')
+                        return task.result()
+            # Both calls failed
+            return primary.result()
+        finally:
+            unfinished = [task for task in tasks if not task.done()]
+            for task in unfinished:
+                task.cancel()
+            if unfinished:
+                await asyncio.gather(*unfinished, return_exceptions=True)
+            if holds_hedge_slot:
+                self._scheduler.release()
+
+    def _record_usage(
+        self,
+        response,
+        prompt: str,
+        prompt_family: Optional[str],
+        latency: float,
+        generated_text: Optional[str] = None
+    ):
+        """Record the call's token usage for its prompt family, route and user."""
+        route, user_id = get_usage_context()
+        usage = getattr(response, 'usage_metadata', None)
+        if usage is not None and getattr(usage, 'prompt_token_count', None) is not None:
+            prompt_tokens = usage.prompt_token_count or 0
+            output_tokens = getattr(usage, 'candidates_token_count', 0) or 0
+            estimated = False
+        else:
+            if generated_text is None:
+                try:
+                    generated_text = response.text or ""
+                except Exception:
+                    generated_text = ""
+            prompt_tokens = calculate_token_estimate(prompt)
+            output_tokens = calculate_token_estimate(generated_text)
+            estimated = True
+
+        usage_metrics.record(prompt_family, route, user_id, prompt_tokens, output_tokens, latency, estimated)
+        logger.debug(
+            f"AI_USAGE: family={prompt_family}, route={route}, userId={user_id}, "
+            f"prompt_tokens={prompt_tokens}, output_tokens={output_tokens}, latency={latency:.2f}s"
+        )
 
-            # Handle the response
-            if not response.text:
-                # Check if blocked by safety filters
-                if response.prompt_feedback:
-                    error_msg = f"Gemini blocked the prompt: {response.prompt_feedback}"
-                    logger.error(f"AI_INFERENCE: {error_msg}")
-                    raise RuntimeError(error_msg)
-                error_msg = "Gemini returned empty response"
+    def _extract_text(self, response) -> str:
+        """Return the text of a Gemini response, raising if it is empty or blocked."""
+        if not response.text:
+            # Check if blocked by safety filters
+            if response.prompt_feedback:
+                error_msg = f"Gemini blocked the prompt: {response.prompt_feedback}"
                 logger.error(f"AI_INFERENCE: {error_msg}")
                 raise RuntimeError(error_msg)
+            error_msg = "Gemini returned empty response"
+            logger.error(f"AI_INFERENCE: {error_msg}")
+            raise RuntimeError(error_msg)
 
-            generated_text = response.text
+        generated_text = response.text
 
-            # Cache the result
-            if use_cache:
-                self._cache[cache_key] = generated_text
+        logger.info(
+            f"AI_INFERENCE: Generation complete. "
+            f"Response length: {len(generated_text)} chars"
+        )
+        return generated_text
 
-            logger.info(
-                f"AI_INFERENCE: Generation complete. "
-                f"Response length: {len(generated_text)} chars"
-            )
-            return generated_text
+    def generate_stream(
+        self,
+        prompt: str,
+        max_new_tokens: Optional[int] = None,
+        temperature: Optional[float] = None,
+        top_p: Optional[float] = None,
+        use_cache: bool = True,
+        prompt_family: Optional[str] = None,
+        priority: str = "interactive",
+        response_schema: Optional[Dict] = None,
+        cache_key_inputs: Optional[Dict] = None,
+        cache_namespace: Optional[str] = None
+    ) -> Iterator[str]:
+        """
+        Generate text using Gemini, yielding chunks as they arrive.
+
+        A cache hit yields the whole cached response as a single chunk.
+        The full text is cached once the stream completes. Streams are not
+        coalesced with other in-flight calls.
+
+        Yields:
+            Generated text chunks
+        """
+        max_new_tokens = max_new_tokens or self.max_new_tokens
+        temperature = temperature or self.temperature
+        top_p = top_p or 0.9
+
+        logger.info(f"AI_INFERENCE: Starting streaming generation with Gemini model={self.model_name}")
 
+        if not self.structured_output:
+            response_schema = None
+        generation_config = self._generation_config(max_new_tokens, temperature, top_p, response_schema)
+
+        cache_key = self._get_cache_key(
+            prompt, max_new_tokens, temperature, response_schema, cache_key_inputs
+        )
+        if use_cache:
+            cached = self._cache.get(cache_key)
+            if cached is not None:
+                logger.info("AI_INFERENCE: Cache HIT - returning cached response")
+                yield cached
+                return
+
+        self._require_model()
+        chunks = []
+        usage_chunk = None
+        attempt = 1
+        while True:
+            try:
+                self._check_breaker()
+                # The slot is held until the stream is fully consumed
+                with self._scheduler.slot(priority, self._call_timeout()):
+                    call_timeout = self._call_timeout()
+                    start = time.monotonic()
+                    try:
+                        response = self.model.generate_content(
+                            prompt,
+                            generation_config=generation_config,
+                            stream=True,
+                            request_options={"timeout": call_timeout}
+                        )
+                        for chunk in response:
+                            # Usage metadata arrives with the final chunk
+                            if getattr(chunk, 'usage_metadata', None) is not None:
+                                usage_chunk = chunk
+                            text = chunk.text if chunk.parts else ""
+                            if text:
+                                chunks.append(text)
+                                yield text
+                    except Exception as e:
+                        error = self._timeout_error(e, start, call_timeout)
+                        self._observe_upstream(time.monotonic() - start, error)
+                        if error is not e:
+                            raise error from e
+                        raise
+                    latency = time.monotonic() - start
+                    self._observe_upstream(latency, prompt_family=prompt_family)
+                break
+            except Exception as e:
+                # Only retry while nothing has been yielded to the caller
+                delay = None if chunks else self._retry_delay(e, attempt)
+                if delay is None:
+                    logger.error(f"AI_INFERENCE: Streaming generation error: {e}", exc_info=True)
+                    final = self._give_up(e, attempt)
+                    if final is e:
+                        raise
+                    raise final from e
+                time.sleep(delay)
+                attempt += 1
+
+        generated_text = "".join(chunks)
+        self._record_usage(usage_chunk, prompt, prompt_family, latency, generated_text)
+        if not generated_text:
+            error_msg = "Gemini returned empty response"
+            logger.error(f"AI_INFERENCE: {error_msg}")
+            raise RuntimeError(error_msg)
+
+        if use_cache:
+            self._cache.set(cache_key, generated_text, family=prompt_family, namespace=cache_namespace)
+
+        logger.info(
+            f"AI_INFERENCE: Streaming generation complete. "
+            f"Response length: {len(generated_text)} chars"
+        )
+
+    async def generate_async(
+        self,
+        prompt: str,
+        max_new_tokens: Optional[int] = None,
+        temperature: Optional[float] = None,
+        top_p: Optional[float] = None,
+        use_cache: bool = True,
+        prompt_family: Optional[str] = None,
+        priority: str = "interactive",
+        response_schema: Optional[Dict] = None,
+        cache_key_inputs: Optional[Dict] = None,
+        cache_namespace: Optional[str] = None
+    ) -> str:
+        """
+        Generate text using Gemini without blocking the event loop.
+
+        Same arguments, caching, coalescing and error semantics as generate().
+
+        Returns:
+            Generated text
+        """
+        max_new_tokens = max_new_tokens or self.max_new_tokens
+        temperature = temperature or self.temperature
+        top_p = top_p or 0.9
+
+        logger.info(f"AI_INFERENCE: Starting async generation with Gemini model={self.model_name}")
+
+        if not self.structured_output:
+            response_schema = None
+        generation_config = self._generation_config(max_new_tokens, temperature, top_p, response_schema)
+
+        if not use_cache:
+            return await self._generate_uncached_async(prompt, generation_config, priority, prompt_family)
+
+        # Check cache
+        cache_key = self._get_cache_key(
+            prompt, max_new_tokens, temperature, response_schema, cache_key_inputs
+        )
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            logger.info("AI_INFERENCE: Cache HIT - returning cached response")
+            return cached
+
+        # Coalesce with an identical in-flight generation (sync or async)
+        future, is_leader = self._inflight.join(cache_key)
+        if not is_leader:
+            logger.info("AI_INFERENCE: Joining in-flight generation for identical prompt")
+            try:
+                return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), self._call_timeout())
+            except asyncio.TimeoutError as e:
+                raise DeadlineExceededError("Request deadline exceeded waiting for an in-flight generation") from e
+
+        try:
+            generated_text = await self._generate_uncached_async(prompt, generation_config, priority, prompt_family)
+            self._cache.set(cache_key, generated_text, family=prompt_family, namespace=cache_namespace)
+        except BaseException as e:
+            self._inflight.complete(cache_key, error=e)
+            raise
+
+        self._inflight.complete(cache_key, result=generated_text)
+        return generated_text
+
+    async def _generate_uncached_async(
+        self,
+        prompt: str,
+        generation_config: Dict,
+        priority: str,
+        prompt_family: Optional[str] = None
+    ) -> str:
+        """Call the Gemini API through the SDK's async client, retrying transient errors."""
+        self._require_model()
+        attempt = 1
+        while True:
+            try:
+                return await self._generate_attempt_async(prompt, generation_config, priority, prompt_family)
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    logger.error(f"AI_INFERENCE: Async generation error: {e}", exc_info=True)
+                    final = self._give_up(e, attempt)
+                    if final is e:
+                        raise
+                    raise final from e
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    async def _generate_attempt_async(
+        self,
+        prompt: str,
+        generation_config: Dict,
+        priority: str,
+        prompt_family: Optional[str] = None
+    ) -> str:
+        """Make one upstream call through the async client (unless the circuit breaker is open)."""
+        self._check_breaker()
+        await self._scheduler.acquire_async(priority, self._call_timeout())
+        try:
+            call_timeout = self._call_timeout()
+        except DeadlineExceededError:
+            self._scheduler.release()
+            raise
+        start = time.monotonic()
+        error: Optional[Exception] = None
+        finished = False
+        try:
+            if self._should_hedge(priority, prompt_family):
+                call = self._hedged_generate_content(prompt, generation_config, prompt_family, call_timeout)
+            else:
+                call = self.model.generate_content_async(
+                    prompt,
+                    generation_config=generation_config,
+                    request_options={"timeout": call_timeout}
+                )
+            response = await asyncio.wait_for(call, call_timeout)
+            finished = True
         except Exception as e:
-            logger.error(f"AI_INFERENCE: Generation error: {e}", exc_info=True)
+            error = self._timeout_error(e, start, call_timeout)
+            finished = True
+            self._observe_upstream(time.monotonic() - start, error)
+            if error is not e:
+                raise error from e
             raise
+        finally:
+            latency = time.monotonic() - start
+            # A cancelled call never finished upstream: free the slot without a sample
+            self._scheduler.release(latency if finished else None, error, priority)
+        self._observe_upstream(latency, prompt_family=prompt_family)
+        self._record_usage(response, prompt, prompt_family, latency)
+        return self._extract_text(response)
 
-    def health_check(self) -> Dict:
+    async def generate_batch_async(
+        self,
+        requests: List[Dict[str, Any]],
+        concurrency: Optional[int] = None
+    ) -> List[Union[str, Exception]]:
         """
-        Perform health check on the Gemini engine.
+        Run several generations concurrently.
+
+        Args:
+            requests: List of generate() keyword-argument dicts, e.g.
+                [{"prompt": "...", "max_new_tokens": 800, "prompt_family": "plan"}]
+            concurrency: Max generations of this batch in flight at once.
+                Keeps a large batch from filling the scheduler queue (and
+                timing out there) at the expense of other callers.
+
+        Returns:
+            Results in request order; a failed generation yields its exception
+            instead of raising, so one failure does not cancel the others.
+        """
+        logger.info(f"AI_INFERENCE: Starting batch of {len(requests)} generations, concurrency={concurrency}")
+        semaphore = asyncio.Semaphore(concurrency) if concurrency else None
+
+        async def run(request):
+            if semaphore is None:
+                return await self.generate_async(**request)
+            async with semaphore:
+                return await self.generate_async(**request)
+
+        return await asyncio.gather(
+            *(run(request) for request in requests),
+            return_exceptions=True
+        )
+
+    def generate_batch(
+        self,
+        requests: List[Dict[str, Any]],
+        timeout: Optional[float] = None,
+        concurrency: Optional[int] = None
+    ) -> List[Union[str, Exception]]:
+        """
+        Synchronous wrapper around generate_batch_async() for Flask routes.
+
+        The batch runs on the engine's own event loop, so a request thread
+        issues all generations concurrently while blocking only once.
+        """
+        coro = self.generate_batch_async(requests, concurrency)
+        return asyncio.run_coroutine_threadsafe(coro, self._get_loop()).result(timeout)
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        """Return the engine's background event loop, starting it on first use."""
+        with self._loop_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(
+                    target=loop.run_forever,
+                    name="gemini-engine-loop",
+                    daemon=True
+                )
+                thread.start()
+                self._loop = loop
+        return self._loop
+
+    def health_check(self, probe: bool = False) -> Dict:
+        """
+        Report engine health without spending a generation.
+
+        The status comes from the success rate of recent real traffic. With
+        probe=True the cached active probe is included, re-run at most once
+        per GEMINI_HEALTH_PROBE_INTERVAL; it also decides the status while
+        there has been no traffic yet.
 
         Returns:
             Status dictionary with engine metrics
         """
-        try:
-            # Test inference
-            test_output = self.generate(
-                "Say 'OK' if you are working.",
-                max_new_tokens=10,
-                use_cache=False
-            )
+        probe_result = self.probe() if probe else self._probe_result
+        upstream = self._health.stats()
 
-            total_requests = self._cache_hits + self._cache_misses
-            hit_rate = self._cache_hits / total_requests if total_requests > 0 else 0
+        status = upstream["status"]
+        if self.model is None:
+            status = "unhealthy"
+        elif status == UNKNOWN and probe_result is not None:
+            status = HEALTHY if probe_result["ok"] else DEGRADED
 
-            return {
-                "status": "healthy",
-                "engine": "Gemini",
-                "model": self.model_name,
-                "test_inference": "passed",
-                "test_output": test_output[:100],
-                "cache_stats": {
-                    "hits": self._cache_hits,
-                    "misses": self._cache_misses,
-                    "hit_rate": f"{hit_rate:.2%}",
-                    "entries": len(self._cache)
-                }
-            }
-        except Exception as e:
-            return {
-                "status": "unhealthy",
-                "error": str(e),
-                "engine": "Gemini",
-                "model": self.model_name
-            }
+        return {
+            "status": status,
+            "engine": "Gemini",
+            "model": self.model_name,
+            "readiness": self.readiness(),
+            "upstream": upstream,
+            "probe": probe_result,
+            "cache_stats": self._cache.stats(),
+            "coalescing_stats": self._inflight.stats(),
+            "refresh_stats": self._refresher.stats(),
+            "usage_stats": usage_metrics.stats()["totals"],
+            "scheduler_stats": self._scheduler.stats(),
+            "family_latency": self._family_latency.stats(),
+            "hedge_stats": self._hedge_budget.stats(),
+            "retry_stats": self._retry.stats(),
+            "breaker_stats": self._breaker.stats(),
+            "output_stats": output_metrics.stats()
+        }
 
     def get_model_info(self) -> Dict:
         """Return model metadata."""
@@ -223,10 +1177,14 @@ class GeminiEngine:
     def clear_cache(self):
         """Clear the response cache."""
         self._cache.clear()
-        self._cache_hits = 0
-        self._cache_misses = 0
         logger.info("AI_CACHE: Response cache cleared")
 
+    def invalidate_cache(self, prefix: str) -> int:
+        """Remove the cached responses in every namespace starting with prefix."""
+        removed = self._cache.invalidate_namespace(prefix)
+        logger.info(f"AI_CACHE: Invalidated {removed} cached responses in namespace {prefix}*")
+        return removed
+
     def __repr__(self) -> str:
         return f"GeminiEngine(model={self.model_name})"
 
@@ -240,3 +1198,31 @@ def get_gemini_engine() -> GeminiEngine:
         Initialized GeminiEngine instance
     """
     return GeminiEngine()
+
+
+def warm_up_gemini_engine() -> GeminiEngine:
+    """
+    Create the engine and start its background warm-up.
+
+    Called once at worker start; set GEMINI_WARMUP=false to skip the probe
+    (the engine is still configured, and connects on first use).
+    """
+    engine = GeminiEngine()
+    if os.getenv("GEMINI_WARMUP", "true").lower() == "true":
+        engine.start_warmup()
+    return engine
+
+
+def invalidate_user_cache(user_id: str, families: List[str]) -> int:
+    """
+    Drop a user's cached responses for the given prompt families.
+
+    Called by the services after a profile write, to free entries the user's
+    old profile will no longer hit. Does nothing if the engine has not been
+    initialized in this process; other workers cannot read a stale entry
+    anyway, since a changed profile changes the cache key inputs.
+    """
+    engine = GeminiEngine._instance
+    if engine is None or not engine._initialized:
+        return 0
+    return sum(engine.invalidate_cache(namespace_prefix(family, user_id)) for family in families)
@@ -0,0 +1,136 @@
+"""
+Passive upstream health for the Gemini engine
+Success rate, latency percentiles and last error of real traffic, so
+health checks do not need to spend a generation; per-prompt-family
+latency distributions for request hedging
+"""
+
+import math
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+HEALTHY = "healthy"
+DEGRADED = "degraded"
+UNKNOWN = "unknown"
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of values (pct in 0-100), or None if empty."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = min(len(ordered), max(1, math.ceil(pct / 100 * len(ordered))))
+    return ordered[rank - 1]
+
+
+class UpstreamHealth:
+    """
+    Rolling window of the last `window` upstream calls.
+
+    The status is "unknown" until a call has been made, and "degraded"
+    while the success rate over the window is below min_success_rate.
+    """
+
+    def __init__(self, window: int = 200, min_success_rate: float = 0.9):
+        self.window = window
+        self.min_success_rate = min_success_rate
+        self._lock = threading.Lock()
+        # (success, latency) per call
+        self._samples: Deque[Tuple[bool, float]] = deque(maxlen=window)
+        self.total_calls = 0
+        self.total_failures = 0
+        self.consecutive_failures = 0
+        self.last_success_at: Optional[float] = None
+        self.last_error_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    def record(self, latency: float, error: Optional[BaseException] = None):
+        """Record one upstream call; error is the exception it raised, if any."""
+        now = time.time()
+        with self._lock:
+            self._samples.append((error is None, latency))
+            self.total_calls += 1
+            if error is None:
+                self.consecutive_failures = 0
+                self.last_success_at = now
+            else:
+                self.total_failures += 1
+                self.consecutive_failures += 1
+                self.last_error_at = now
+                self.last_error = f"{type(error).__name__}: {error}"[:300]
+
+    def status(self) -> str:
+        """healthy, degraded or unknown (no traffic yet)."""
+        with self._lock:
+            return self._status()
+
+    def _status(self) -> str:
+        if not self._samples:
+            return UNKNOWN
+        if self._success_rate() < self.min_success_rate:
+            return DEGRADED
+        return HEALTHY
+
+    def _success_rate(self) -> float:
+        return sum(success for success, _ in self._samples) / len(self._samples)
+
+    def stats(self) -> Dict:
+        """Return the window's success rate, latency percentiles and last error."""
+        with self._lock:
+            latencies = [latency for success, latency in self._samples if success]
+            p50, p90, p99 = (percentile(latencies, pct) for pct in (50, 90, 99))
+            return {
+                "status": self._status(),
+                "window_calls": len(self._samples),
+                "success_rate": round(self._success_rate(), 3) if self._samples else None,
+                "latency_p50": round(p50, 3) if p50 is not None else None,
+                "latency_p90": round(p90, 3) if p90 is not None else None,
+                "latency_p99": round(p99, 3) if p99 is not None else None,
+                "total_calls": self.total_calls,
+                "total_failures": self.total_failures,
+                "consecutive_failures": self.consecutive_failures,
+                "last_success_at": self.last_success_at,
+                "last_error_at": self.last_error_at,
+                "last_error": self.last_error
+            }
+
+
+class FamilyLatency:
+    """
+    Rolling latency window of successful calls per prompt family.
+
+    percentile() returns None until a family has min_samples calls, so
+    decisions are not driven by a handful of samples.
+    """
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.window = window
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self._samples: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=self.window))
+
+    def record(self, family: Optional[str], latency: float):
+        """Record the latency of a successful call."""
+        with self._lock:
+            self._samples[family or "unknown"].append(latency)
+
+    def percentile(self, family: Optional[str], pct: float) -> Optional[float]:
+        """Rolling latency percentile for family, or None if there are too few samples."""
+        with self._lock:
+            samples = list(self._samples.get(family or "unknown", ()))
+        if len(samples) < self.min_samples:
+            return None
+        return percentile(samples, pct)
+
+    def stats(self) -> Dict:
+        """Return sample counts and p50/p90/p99 latency per family."""
+        with self._lock:
+            snapshot = {family: list(samples) for family, samples in self._samples.items()}
+        stats = {}
+        for family, samples in snapshot.items():
+            stats[family] = {"samples": len(samples)}
+            for pct in (50, 90, 99):
+                stats[family][f"p{pct}"] = round(percentile(samples, pct), 3)
+        return stats
@@ -0,0 +1,62 @@
+"""
+Hedge budget for duplicate upstream requests
+Caps the extra load that request hedging adds to a fraction of calls
+"""
+
+import threading
+from typing import Dict
+
+
+class HedgeBudget:
+    """
+    Token bucket that allows hedges for at most `ratio` of eligible calls.
+
+    Every eligible call earns `ratio` tokens (up to `burst`), and a hedge
+    spends one, so over time hedges stay below ratio * calls.
+    """
+
+    def __init__(self, ratio: float = 0.05, burst: float = 10.0):
+        self.ratio = ratio
+        self.burst = burst
+        self._tokens = 0.0
+        self._lock = threading.Lock()
+
+        self.eligible = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.skipped_budget = 0
+        self.skipped_capacity = 0
+
+    def on_call(self):
+        """Record an eligible call, earning budget for future hedges."""
+        with self._lock:
+            self.eligible += 1
+            self._tokens = min(self.burst, self._tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        """Spend one hedge from the budget if available."""
+        with self._lock:
+            if self._tokens < 1:
+                self.skipped_budget += 1
+                return False
+            self._tokens -= 1
+            self.hedged += 1
+            return True
+
+    def record(self, counter: str):
+        """Increment hedge_wins or skipped_capacity."""
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def stats(self) -> Dict:
+        """Return hedge counters."""
+        with self._lock:
+            return {
+                "ratio": self.ratio,
+                "eligible": self.eligible,
+                "hedged": self.hedged,
+                "hedge_wins": self.hedge_wins,
+                "skipped_budget": self.skipped_budget,
+                "skipped_capacity": self.skipped_capacity,
+                "hedge_rate": round(self.hedged / self.eligible, 4) if self.eligible else 0.0
+            }
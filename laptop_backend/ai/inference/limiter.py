@@ -0,0 +1,155 @@
+"""
+Adaptive concurrency limit for upstream Gemini calls
+AIMD controller driven by observed latency and error rate
+"""
+
+import logging
+import math
+import threading
+from collections import deque
+from typing import Dict, Optional
+
+logger = logging.getLogger('ai')
+
+
+class AdaptiveLimiter:
+    """
+    Additive-increase / multiplicative-decrease concurrency limit.
+
+    Every completed upstream call is reported with its latency and outcome.
+    Only congestion counts as a failure (429, 5xx, timeouts; see
+    resilience.is_congestion): client errors and callers that went away are
+    not reported at all. After each window of samples the limit is:
+      - multiplied by `backoff` if any call was congested, or if the window's mean
+        latency exceeds the latency target (a fixed target when configured,
+        otherwise `tolerance` x the long-run baseline latency);
+      - increased by one if latency is healthy and the limit was actually
+        reached during the window (no point growing an idle limit).
+
+    Samples are windowed and baselined per priority class: a 12-week bulk
+    plan call legitimately takes many times longer than an interactive
+    adjustment, and mixing the two would read a healthy bulk batch as
+    congestion. The fixed latency target, being tuned for a user waiting,
+    only applies to interactive calls; bulk calls are always judged against
+    their own baseline.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 16,
+        latency_target: Optional[float] = None,
+        window: int = 10,
+        tolerance: float = 2.0,
+        backoff: float = 0.7
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.window = window
+        self.tolerance = tolerance
+        self.backoff = backoff
+
+        self._limit = float(max(min_limit, min(max_limit, initial_limit)))
+        self._lock = threading.Lock()
+        self._classes: Dict[str, _ClassWindow] = {}
+
+        self.increases = 0
+        self.decreases = 0
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    def on_sample(self, latency: float, success: bool, in_flight: int, priority: str = 'interactive'):
+        """
+        Record one completed call.
+
+        Args:
+            latency: Seconds the upstream call took
+            success: False if the call failed with a congestion signal
+            in_flight: Calls running when this one finished (including it)
+            priority: Priority class of the call; latency is only compared
+                with other calls of the same class
+        """
+        with self._lock:
+            state = self._classes.get(priority)
+            if state is None:
+                state = self._classes[priority] = _ClassWindow(self.window)
+            state.samples.append(latency)
+            if not success:
+                state.errors += 1
+            elif state.baseline is None:
+                state.baseline = latency
+            else:
+                # Slow-moving baseline so one bad window doesn't shift it
+                state.baseline = 0.95 * state.baseline + 0.05 * latency
+            if in_flight >= self.limit:
+                state.saturated = True
+
+            if len(state.samples) >= self.window or state.errors:
+                self._adjust(priority, state)
+
+    def _adjust(self, priority: str, state: '_ClassWindow'):
+        """Apply AIMD to a class's finished window. Caller holds the lock."""
+        mean_latency = sum(state.samples) / len(state.samples)
+        target = self._target(priority, state)
+        old_limit = self.limit
+
+        if state.errors or (target is not None and mean_latency > target):
+            self._limit = max(float(self.min_limit), math.floor(self._limit * self.backoff))
+            if self.limit < old_limit:
+                self.decreases += 1
+        elif state.saturated:
+            self._limit = min(float(self.max_limit), self._limit + 1)
+            if self.limit > old_limit:
+                self.increases += 1
+
+        if self.limit != old_limit:
+            logger.info(
+                f"AI_LIMITER: Concurrency limit {old_limit} -> {self.limit} "
+                f"(priority={priority}, mean_latency={mean_latency:.2f}s, errors={state.errors})"
+            )
+
+        state.samples.clear()
+        state.errors = 0
+        state.saturated = False
+
+    def _target(self, priority: str, state: '_ClassWindow') -> Optional[float]:
+        if self.latency_target is not None and priority == 'interactive':
+            return self.latency_target
+        if state.baseline is None:
+            return None
+        return state.baseline * self.tolerance
+
+    def stats(self) -> Dict:
+        """Return the current limit and controller state."""
+        with self._lock:
+            classes = {}
+            for priority, state in self._classes.items():
+                target = self._target(priority, state)
+                classes[priority] = {
+                    "baseline_latency": round(state.baseline, 3) if state.baseline is not None else None,
+                    "latency_target": round(target, 3) if target is not None else None
+                }
+            return {
+                "limit": self.limit,
+                "min_limit": self.min_limit,
+                "max_limit": self.max_limit,
+                "classes": classes,
+                "increases": self.increases,
+                "decreases": self.decreases
+            }
+
+
+class _ClassWindow:
+    """Sample window and latency baseline for one priority class."""
+
+    __slots__ = ("samples", "errors", "saturated", "baseline")
+
+    def __init__(self, window: int):
+        self.samples = deque(maxlen=window)
+        self.errors = 0
+        self.saturated = False
+        self.baseline: Optional[float] = None
@@ -0,0 +1,174 @@
+"""
+Output quality and usage metrics for Gemini generations
+Per-prompt-family parse failure and mock-data fallback rates, and token
+usage per prompt family, route and user
+"""
+
+import os
+import threading
+from collections import OrderedDict, defaultdict
+from typing import Dict, Optional
+
+
+class OutputMetrics:
+    """
+    Count, per prompt family, how generated output fared downstream.
+
+    - responses: outputs that were parsed (successfully or not)
+    - parse_failures: outputs that were not valid JSON
+    - repairs: truncated outputs salvaged by repair_truncated_json()
+    - errors: generations that raised before producing output
+    - fallbacks: results replaced with mock data (after a parse failure,
+      an invalid structure or an error)
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = defaultdict(lambda: {"responses": 0, "parse_failures": 0, "repairs": 0, "errors": 0, "fallbacks": 0})
+
+    def record_parse(self, family: str, success: bool):
+        """Record one parsed output."""
+        with self._lock:
+            counts = self._counts[family]
+            counts["responses"] += 1
+            if not success:
+                counts["parse_failures"] += 1
+
+    def record_repair(self, family: str):
+        """Record an output that parsed only after truncation repair."""
+        with self._lock:
+            self._counts[family]["repairs"] += 1
+
+    def record_fallback(self, family: str, error: bool = False):
+        """Record a fallback to mock data; error=True if generation itself failed."""
+        with self._lock:
+            counts = self._counts[family]
+            counts["fallbacks"] += 1
+            if error:
+                counts["errors"] += 1
+
+    def stats(self) -> Dict:
+        """Return counters and rates per prompt family."""
+        with self._lock:
+            stats = {}
+            for family, counts in self._counts.items():
+                attempts = counts["responses"] + counts["errors"]
+                stats[family] = dict(
+                    counts,
+                    parse_failure_rate=round(counts["parse_failures"] / counts["responses"], 4) if counts["responses"] else 0.0,
+                    fallback_rate=round(counts["fallbacks"] / attempts, 4) if attempts else 0.0
+                )
+            return stats
+
+    def clear(self):
+        """Reset all counters."""
+        with self._lock:
+            self._counts.clear()
+
+
+# Shared by the engine, format_response() and the routes/services that fall back
+output_metrics = OutputMetrics()
+
+
+def _usage_counts() -> Dict:
+    return {"calls": 0, "estimated_calls": 0, "prompt_tokens": 0, "output_tokens": 0, "latency_seconds": 0.0}
+
+
+class UsageMetrics:
+    """
+    Token usage of upstream calls, from the usage_metadata Gemini returns.
+
+    Aggregated per prompt family, per route and per user (the most recently
+    active max_users users). Calls whose response carries no usage metadata
+    are counted with estimated tokens and reported as estimated_calls.
+    Cost uses per-million-token prices for prompt and output tokens.
+    """
+
+    def __init__(self, input_price: float = 0.0, output_price: float = 0.0, max_users: int = 1000):
+        self.input_price = input_price
+        self.output_price = output_price
+        self.max_users = max_users
+        self._lock = threading.Lock()
+        self._families = defaultdict(_usage_counts)
+        self._routes = defaultdict(_usage_counts)
+        self._users: "OrderedDict[str, Dict]" = OrderedDict()
+        self._totals = _usage_counts()
+        self.evicted_users = 0
+
+    def record(
+        self,
+        family: Optional[str],
+        route: Optional[str],
+        user_id: Optional[str],
+        prompt_tokens: int,
+        output_tokens: int,
+        latency: float,
+        estimated: bool = False
+    ):
+        """Record one upstream call."""
+        with self._lock:
+            buckets = [self._totals, self._families[family or "unknown"], self._routes[route or "background"]]
+            if user_id:
+                if user_id not in self._users:
+                    self._users[user_id] = _usage_counts()
+                    if len(self._users) > self.max_users:
+                        self._users.popitem(last=False)
+                        self.evicted_users += 1
+                self._users.move_to_end(user_id)
+                buckets.append(self._users[user_id])
+
+            for counts in buckets:
+                counts["calls"] += 1
+                counts["prompt_tokens"] += prompt_tokens
+                counts["output_tokens"] += output_tokens
+                counts["latency_seconds"] += latency
+                if estimated:
+                    counts["estimated_calls"] += 1
+
+    def _summary(self, counts: Dict) -> Dict:
+        calls = counts["calls"]
+        cost = (counts["prompt_tokens"] * self.input_price + counts["output_tokens"] * self.output_price) / 1_000_000
+        return dict(
+            counts,
+            latency_seconds=round(counts["latency_seconds"], 3),
+            total_tokens=counts["prompt_tokens"] + counts["output_tokens"],
+            avg_latency_seconds=round(counts["latency_seconds"] / calls, 3) if calls else 0.0,
+            tokens_per_second=round(counts["output_tokens"] / counts["latency_seconds"], 1) if counts["latency_seconds"] else 0.0,
+            cost=round(cost, 6),
+            cost_per_request=round(cost / calls, 6) if calls else 0.0
+        )
+
+    def stats(self, top_users: int = 20) -> Dict:
+        """Return usage totals and breakdowns; users are the top_users by total tokens."""
+        with self._lock:
+            users = sorted(
+                self._users.items(),
+                key=lambda item: item[1]["prompt_tokens"] + item[1]["output_tokens"],
+                reverse=True
+            )[:top_users]
+            return {
+                "totals": self._summary(self._totals),
+                "by_family": {family: self._summary(counts) for family, counts in self._families.items()},
+                "by_route": {route: self._summary(counts) for route, counts in self._routes.items()},
+                "by_user": {user_id: self._summary(counts) for user_id, counts in users},
+                "tracked_users": len(self._users),
+                "evicted_users": self.evicted_users,
+                "prices_per_million_tokens": {"input": self.input_price, "output": self.output_price}
+            }
+
+    def clear(self):
+        """Reset all counters."""
+        with self._lock:
+            self._families.clear()
+            self._routes.clear()
+            self._users.clear()
+            self._totals = _usage_counts()
+            self.evicted_users = 0
+
+
+# Recorded by the engine on every upstream call
+usage_metrics = UsageMetrics(
+    input_price=float(os.getenv("GEMINI_PRICE_INPUT_PER_MTOK", "0.075")),
+    output_price=float(os.getenv("GEMINI_PRICE_OUTPUT_PER_MTOK", "0.30")),
+    max_users=int(os.getenv("USAGE_MAX_USERS", "1000"))
+)
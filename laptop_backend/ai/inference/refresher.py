@@ -0,0 +1,110 @@
+"""
+Background refresh pool for stale-while-revalidate serving
+Regenerates stale cache entries off the request path, one refresh per key
+"""
+
+import contextvars
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Set, Tuple
+
+from .deadline import no_deadline
+
+logger = logging.getLogger('ai')
+
+
+class BackgroundRefresher:
+    """
+    Run cache refreshes on a small thread pool.
+
+    A key already being refreshed is not queued again, so a burst of
+    requests for one stale entry triggers a single regeneration. At most
+    max_pending refreshes are queued or running; beyond that, stale
+    entries keep being served until a slot frees up.
+
+    A submit with rerun=True for a key that is already running is not
+    dropped: the latest such refresh runs once more after the current one,
+    for work whose inputs changed while it ran.
+    """
+
+    def __init__(self, workers: int = 2, max_pending: int = 32):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="gemini-refresh")
+        self._pending: Set[str] = set()
+        self._reruns: Dict[str, Tuple[contextvars.Context, Callable[[], None]]] = {}
+        self._lock = threading.Lock()
+
+        self.scheduled = 0
+        self.deduplicated = 0
+        self.reruns = 0
+        self.dropped = 0
+        self.completed = 0
+        self.failed = 0
+
+    def submit(self, key: str, refresh: Callable[[], None], rerun: bool = False) -> bool:
+        """
+        Schedule refresh() for key unless one is already pending.
+
+        Args:
+            rerun: If one is pending, run refresh() once more after it
+
+        Returns:
+            True if a refresh was scheduled (now or as a rerun)
+        """
+        with self._lock:
+            if key in self._pending:
+                if rerun:
+                    self._reruns[key] = (contextvars.copy_context(), refresh)
+                    return True
+                self.deduplicated += 1
+                return False
+            if len(self._pending) >= self.max_pending:
+                self.dropped += 1
+                return False
+            self._pending.add(key)
+            self.scheduled += 1
+
+        # Run in the submitter's context, so usage is attributed to its route and user
+        # (without its deadline: the refresh outlives the request)
+        self._executor.submit(contextvars.copy_context().run, self._run, key, refresh)
+        return True
+
+    def _run(self, key: str, refresh: Callable[[], None]):
+        try:
+            with no_deadline():
+                refresh()
+            self._count('completed')
+        except Exception as e:
+            logger.warning(f"AI_CACHE: Background refresh failed: {e}")
+            self._count('failed')
+        finally:
+            with self._lock:
+                rerun = self._reruns.pop(key, None)
+                if rerun is None:
+                    self._pending.discard(key)
+                else:
+                    self.reruns += 1
+            if rerun is not None:
+                context, refresh = rerun
+                self._executor.submit(context.run, self._run, key, refresh)
+
+    def _count(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def stats(self) -> Dict:
+        """Return refresh counters."""
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "pending": len(self._pending),
+                "max_pending": self.max_pending,
+                "scheduled": self.scheduled,
+                "deduplicated": self.deduplicated,
+                "reruns": self.reruns,
+                "dropped": self.dropped,
+                "completed": self.completed,
+                "failed": self.failed
+            }
@@ -0,0 +1,194 @@
+"""
+Retries and circuit breaking for upstream Gemini calls
+Transient errors (429, 5xx, connection resets) are retried with jittered
+exponential backoff; after repeated failures the breaker opens and calls
+fail fast until a half-open probe succeeds.
+"""
+
+import logging
+import random
+import threading
+import time
+from typing import Dict, Optional
+
+from .deadline import DeadlineExceededError, UpstreamTimeoutError
+
+logger = logging.getLogger('ai')
+
+# HTTP statuses of transient upstream errors (google.api_core exceptions carry them as .code)
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class UpstreamUnavailableError(RuntimeError):
+    """Gemini is unavailable: transient errors persisted through every retry, or the breaker is open."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(UpstreamUnavailableError):
+    """Raised without calling the API while the circuit breaker is open."""
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Whether error is a transient upstream failure worth retrying."""
+    if isinstance(error, (DeadlineExceededError, UpstreamUnavailableError)):
+        return False
+    code = getattr(error, 'code', None)
+    if isinstance(code, int):
+        return code in RETRYABLE_STATUS
+    return isinstance(error, (ConnectionError, TimeoutError))
+
+
+def is_congestion(error: BaseException) -> bool:
+    """
+    Whether error signals upstream congestion (429, 5xx, connection errors,
+    timeouts), as opposed to a bad request or the caller going away.
+
+    A request deadline that ran out is not congestion; only a call that
+    used its full GEMINI_TIMEOUT (UpstreamTimeoutError) is.
+    """
+    if isinstance(error, DeadlineExceededError):
+        return isinstance(error, UpstreamTimeoutError)
+    return is_retryable(error) or isinstance(error, TimeoutError)
+
+
+class RetryPolicy:
+    """
+    Bounded retries with full-jitter exponential backoff.
+
+    Attempt n (from 1) is followed by a random delay of up to
+    min(max_delay, base_delay * 2 ** (n - 1)) seconds.
+    """
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.5, max_delay: float = 8.0):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self.retries = 0
+        self.exhausted = 0
+
+    def backoff(self, attempt: int) -> float:
+        """Delay before retrying after the given (1-based) attempt."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def record(self, counter: str):
+        """Increment retries or exhausted."""
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def stats(self) -> Dict:
+        """Return retry counters."""
+        with self._lock:
+            return {
+                "max_attempts": self.max_attempts,
+                "retries": self.retries,
+                "exhausted": self.exhausted
+            }
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    - closed: calls pass; failure_threshold consecutive failures open it
+    - open: calls are rejected until reset_timeout seconds have passed
+    - half_open: one probe call passes; success closes the breaker,
+      failure opens it again. A probe that never reports back (e.g. it was
+      rejected by the scheduler) is replaced after reset_timeout.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._consecutive_failures = 0
+        self._opened_at: Optional[float] = None
+        self._probe_started: Optional[float] = None
+
+        self.opened = 0
+        self.rejected = 0
+        self.probes = 0
+        self.last_opened_at: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        """closed, open or half_open."""
+        return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may go upstream now; counts a rejection if not."""
+        if self.failure_threshold <= 0:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            if self._state == OPEN and now - self._opened_at >= self.reset_timeout:
+                self._state = HALF_OPEN
+                self._probe_started = None
+                logger.info("AI_BREAKER: Circuit half-open, probing upstream")
+            if self._state == HALF_OPEN:
+                if self._probe_started is None or now - self._probe_started >= self.reset_timeout:
+                    self._probe_started = now
+                    self.probes += 1
+                    return True
+            elif self._state == CLOSED:
+                return True
+            self.rejected += 1
+            return False
+
+    def retry_after(self) -> int:
+        """Seconds until the breaker lets a probe through."""
+        with self._lock:
+            if self._state != OPEN:
+                return 1
+            return max(1, int(self.reset_timeout - (time.monotonic() - self._opened_at)) + 1)
+
+    def record_success(self):
+        """Record an upstream call that got a response."""
+        with self._lock:
+            if self._state != CLOSED:
+                logger.info("AI_BREAKER: Circuit closed, upstream recovered")
+            self._state = CLOSED
+            self._consecutive_failures = 0
+            self._probe_started = None
+
+    def record_failure(self):
+        """Record an upstream call that failed transiently or timed out."""
+        with self._lock:
+            self._consecutive_failures += 1
+            if self._state == HALF_OPEN or (
+                self._state == CLOSED and self._consecutive_failures >= self.failure_threshold > 0
+            ):
+                self._open()
+
+    def _open(self):
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._probe_started = None
+        self.opened += 1
+        self.last_opened_at = time.time()
+        logger.warning(
+            f"AI_BREAKER: Circuit opened after {self._consecutive_failures} consecutive failures, "
+            f"failing fast for {self.reset_timeout:.0f}s"
+        )
+
+    def stats(self) -> Dict:
+        """Return breaker state and counters."""
+        with self._lock:
+            return {
+                "state": self._state,
+                "consecutive_failures": self._consecutive_failures,
+                "failure_threshold": self.failure_threshold,
+                "reset_timeout": self.reset_timeout,
+                "opened": self.opened,
+                "rejected": self.rejected,
+                "probes": self.probes,
+                "last_opened_at": self.last_opened_at
+            }
@@ -0,0 +1,200 @@
+"""
+Response cache for the Gemini inference engine
+Bounded LRU cache with per-entry TTL and a byte-size budget
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger('ai')
+
+
+def cache_namespace(family: str, user_id: str, version: Any = 0) -> str:
+    """
+    Namespace for cache entries that depend on one user's profile.
+
+    The namespace is a tag on the entry, not part of its key: entries are
+    keyed on the prompt's (bucketed) inputs and shared across users, and
+    invalidate_namespace(namespace_prefix(...)) frees the entries last
+    written for a user after a profile change. An entry shared by several
+    users carries the namespace of its last writer.
+    """
+    return f"{namespace_prefix(family, user_id)}v{version}"
+
+
+def namespace_prefix(family: str, user_id: str) -> str:
+    """Prefix shared by every version of a user's namespace for one family."""
+    return f"{family}:{user_id}:"
+
+
+def parse_family_ttls(spec: Optional[str]) -> Dict[str, int]:
+    """
+    Parse per-prompt-family TTL overrides.
+
+    Args:
+        spec: Comma separated "family=seconds" pairs,
+              e.g. "plan=3600,health_analysis=86400"
+
+    Returns:
+        Mapping of prompt family to TTL in seconds
+    """
+    ttls = {}
+    if not spec:
+        return ttls
+
+    for item in spec.split(','):
+        if '=' not in item:
+            continue
+        family, seconds = item.split('=', 1)
+        try:
+            ttls[family.strip()] = int(seconds.strip())
+        except ValueError:
+            logger.warning(f"AI_CACHE: Ignoring invalid TTL override '{item.strip()}'")
+    return ttls
+
+
+class ResponseCache:
+    """
+    Thread-safe in-memory response cache.
+
+    Entries are evicted least-recently-used first whenever the entry count
+    or the total byte size goes over budget, and expire after their TTL.
+    A TTL of 0 means the entry never expires.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        max_bytes: int = 32 * 1024 * 1024,
+        default_ttl: int = 3600,
+        family_ttls: Optional[Dict[str, int]] = None
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.family_ttls = family_ttls or {}
+
+        # key -> (value, expires_at, size_bytes, namespace, created_at)
+        self._entries: "OrderedDict[str, Tuple[str, float, int, Optional[str], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def ttl_for(self, family: Optional[str] = None) -> int:
+        """Return the TTL in seconds that applies to a prompt family."""
+        if family and family in self.family_ttls:
+            return self.family_ttls[family]
+        return self.default_ttl
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached value for key, or None on miss or expiry."""
+        entry = self.get_with_age(key)
+        return entry[0] if entry is not None else None
+
+    def get_with_age(self, key: str) -> Optional[Tuple[str, float]]:
+        """Return (value, seconds since it was stored) for key, or None on miss or expiry."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            now = time.time()
+            value, expires_at, _, _, created_at = entry
+            if expires_at and expires_at <= now:
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value, now - created_at
+
+    def set(self, key: str, value: str, family: Optional[str] = None, namespace: Optional[str] = None):
+        """Store a value, evicting older entries to stay within budget."""
+        size = len(key) + len(value.encode('utf-8'))
+        if size > self.max_bytes:
+            logger.warning(f"AI_CACHE: Response of {size} bytes exceeds cache budget, not cached")
+            return
+
+        now = time.time()
+        ttl = self.ttl_for(family)
+        expires_at = now + ttl if ttl > 0 else 0
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, expires_at, size, namespace, now)
+            self._bytes += size
+
+            while self._entries and (
+                len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+            ):
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+
+    def delete(self, key: str) -> bool:
+        """Remove a single entry. Returns True if it existed."""
+        with self._lock:
+            if key not in self._entries:
+                return False
+            self._remove(key)
+            return True
+
+    def invalidate_namespace(self, prefix: str) -> int:
+        """Remove every entry whose namespace starts with prefix. Returns the count."""
+        with self._lock:
+            victims = [
+                key for key, (_, _, _, namespace, _) in self._entries.items()
+                if namespace and namespace.startswith(prefix)
+            ]
+            for key in victims:
+                self._remove(key)
+            return len(victims)
+
+    def clear(self):
+        """Drop all entries and reset counters."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+            self.expirations = 0
+
+    def _remove(self, key: str):
+        """Remove an entry and release its bytes. Caller holds the lock."""
+        _, _, size, _, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def stats(self) -> Dict:
+        """Return cache counters and occupancy."""
+        with self._lock:
+            total_requests = self.hits + self.misses
+            hit_rate = self.hits / total_requests if total_requests > 0 else 0
+            return {
+                "backend": "memory",
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": f"{hit_rate:.2%}",
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "default_ttl": self.default_ttl,
+                "family_ttls": dict(self.family_ttls)
+            }
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,227 @@
+"""
+Admission control for upstream Gemini calls
+Concurrency limit plus a bounded, prioritized wait queue
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from .deadline import DeadlineExceededError
+from .limiter import AdaptiveLimiter
+from .resilience import is_congestion
+
+logger = logging.getLogger('ai')
+
+# Lower value = served first
+PRIORITIES = {
+    'interactive': 0,  # Adjustments, suggestions, analyses - a user is waiting
+    'bulk': 1,         # Whole-plan generation
+}
+
+
+class SchedulerFullError(RuntimeError):
+    """Raised when a call cannot be admitted; carries a retry-after hint in seconds."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class InferenceScheduler:
+    """
+    Limit concurrent upstream calls.
+
+    Up to `limit` calls run at once. Further callers wait in a queue
+    ordered by priority class, then arrival. When the queue is full, or a
+    caller has waited longer than queue_timeout, SchedulerFullError is
+    raised immediately with an estimate of when capacity frees up.
+
+    With a limiter, the limit follows the limiter (see AdaptiveLimiter);
+    otherwise it is fixed at max_concurrency.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 4,
+        max_queue: int = 32,
+        queue_timeout: float = 30.0,
+        limiter: Optional[AdaptiveLimiter] = None
+    ):
+        self.max_concurrency = max_concurrency
+        self.limiter = limiter
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+
+        self._cond = threading.Condition()
+        self._waiters = []  # heap of (priority, sequence)
+        self._sequence = itertools.count()
+        self._active = 0
+
+        # Exponentially weighted average of how long a slot is held
+        self._avg_service_time = 5.0
+
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    @property
+    def limit(self) -> int:
+        """Number of calls allowed to run concurrently."""
+        if self.limiter is not None:
+            return self.limiter.limit
+        return self.max_concurrency
+
+    def acquire(self, priority: str = 'interactive', timeout: Optional[float] = None):
+        """
+        Block until a slot is free. Raises SchedulerFullError if it cannot be admitted.
+
+        timeout is the caller's remaining time budget; if it runs out before
+        queue_timeout, DeadlineExceededError is raised instead.
+        """
+        rank = PRIORITIES.get(priority, PRIORITIES['bulk'])
+
+        with self._cond:
+            if self._active < self.limit and not self._waiters:
+                self._active += 1
+                self.admitted += 1
+                return
+
+            if len(self._waiters) >= self.max_queue:
+                self.rejected += 1
+                retry_after = self._retry_after()
+                logger.warning(
+                    f"AI_SCHEDULER: Rejected {priority} call, queue full "
+                    f"({len(self._waiters)} waiting), retry_after={retry_after}s"
+                )
+                raise SchedulerFullError("Inference queue is full", retry_after)
+
+            ticket = (rank, next(self._sequence))
+            heapq.heappush(self._waiters, ticket)
+            self.queued += 1
+            wait = self.queue_timeout if timeout is None else min(self.queue_timeout, timeout)
+            deadline = time.monotonic() + wait
+
+            while True:
+                if self._waiters[0] == ticket and self._active < self.limit:
+                    heapq.heappop(self._waiters)
+                    self._active += 1
+                    self.admitted += 1
+                    # Let the next waiter check for a free slot too
+                    self._cond.notify_all()
+                    return
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._waiters.remove(ticket)
+                    heapq.heapify(self._waiters)
+                    self.timed_out += 1
+                    self._cond.notify_all()
+                    if wait < self.queue_timeout:
+                        logger.warning(f"AI_SCHEDULER: {priority} call ran out of its deadline in queue")
+                        raise DeadlineExceededError("Request deadline exceeded waiting for an inference slot")
+                    retry_after = self._retry_after()
+                    logger.warning(f"AI_SCHEDULER: {priority} call timed out in queue, retry_after={retry_after}s")
+                    raise SchedulerFullError("Timed out waiting for an inference slot", retry_after)
+
+                self._cond.wait(remaining)
+
+    async def acquire_async(self, priority: str = 'interactive', timeout: Optional[float] = None):
+        """
+        acquire() for coroutines; the blocking wait runs on a worker thread.
+
+        If the caller is cancelled while waiting (a hedge loser, wait_for,
+        batch cancellation), the thread keeps waiting and releases the slot
+        as soon as it gets one, so a cancelled wait never leaks a slot.
+        """
+        waiter = asyncio.ensure_future(asyncio.to_thread(self.acquire, priority, timeout))
+        try:
+            await asyncio.shield(waiter)
+        except asyncio.CancelledError:
+            waiter.add_done_callback(self._release_abandoned)
+            raise
+
+    def _release_abandoned(self, waiter: "asyncio.Future"):
+        """Release a slot acquired for a caller that was cancelled while waiting."""
+        if not waiter.cancelled() and waiter.exception() is None:
+            self.release()
+
+    def try_acquire(self) -> bool:
+        """Take a slot only if one is free and nobody is waiting; never blocks or queues."""
+        with self._cond:
+            if self._active < self.limit and not self._waiters:
+                self._active += 1
+                self.admitted += 1
+                return True
+            return False
+
+    def release(
+        self,
+        service_time: Optional[float] = None,
+        error: Optional[BaseException] = None,
+        priority: str = 'interactive'
+    ):
+        """
+        Free a slot, recording how long the upstream call took and how it ended.
+
+        Only successes and congestion errors (see resilience.is_congestion)
+        are sampled; a client error, or no service_time (the caller gave up
+        before the upstream finished), frees the slot without a sample.
+        """
+        with self._cond:
+            in_flight = self._active
+            self._active -= 1
+            if service_time is not None and (error is None or is_congestion(error)):
+                self._avg_service_time = 0.8 * self._avg_service_time + 0.2 * service_time
+                if self.limiter is not None:
+                    self.limiter.on_sample(service_time, error is None, in_flight, priority)
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, priority: str = 'interactive', timeout: Optional[float] = None) -> Iterator[None]:
+        """
+        Context manager that holds a slot for the duration of the block.
+
+        The block's exception is the call's outcome. BaseExceptions
+        (GeneratorExit when a stream's consumer disconnects, interrupts)
+        free the slot without a sample.
+        """
+        self.acquire(priority, timeout)
+        start = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            self.release(time.monotonic() - start, e, priority)
+            raise
+        except BaseException:
+            self.release()
+            raise
+        self.release(time.monotonic() - start, priority=priority)
+
+    def _retry_after(self) -> int:
+        """Estimate seconds until the queue drains enough to admit a new call."""
+        backlog = len(self._waiters) + 1
+        return max(1, math.ceil(self._avg_service_time * backlog / max(1, self.limit)))
+
+    def stats(self) -> Dict:
+        """Return scheduler counters and current load."""
+        with self._cond:
+            return {
+                "limit": self.limit,
+                "active": self._active,
+                "queue_depth": len(self._waiters),
+                "max_queue": self.max_queue,
+                "admitted": self.admitted,
+                "queued": self.queued,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+                "avg_service_time": round(self._avg_service_time, 3),
+                "adaptive": self.limiter.stats() if self.limiter is not None else None
+            }
@@ -0,0 +1,77 @@
+"""
+Single-flight request coalescing
+Concurrent callers with the same key share one in-flight computation
+"""
+
+import threading
+from concurrent.futures import Future
+from typing import Any, Dict, Tuple
+
+
+class LeaderAbandonedError(RuntimeError):
+    """The leader of a coalesced call exited without producing a result."""
+
+
+class SingleFlight:
+    """
+    Coalesce identical in-flight calls.
+
+    The first caller for a key (the leader) runs the work; callers that
+    arrive while it is running wait on the same future and receive its
+    result, or its exception. The leader must call complete() on every
+    exit path, including BaseException.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+
+    def join(self, key: str) -> Tuple[Future, bool]:
+        """
+        Register interest in key.
+
+        Returns:
+            Tuple of (future, is_leader). The leader must call complete().
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+
+            future = Future()
+            self._calls[key] = future
+            self.leaders += 1
+            return future, True
+
+    def complete(self, key: str, result: Any = None, error: BaseException = None):
+        """
+        Publish the leader's outcome to all waiters and forget the key.
+
+        A leader that exited without an outcome of its own (KeyboardInterrupt,
+        SystemExit, GeneratorExit, cancellation) fails its waiters with
+        LeaderAbandonedError rather than re-raising that exit in their threads.
+        """
+        with self._lock:
+            future = self._calls.pop(key, None)
+        if future is None:
+            return
+        if error is not None:
+            if not isinstance(error, Exception):
+                abandoned = LeaderAbandonedError(f"In-flight call abandoned by its leader ({type(error).__name__})")
+                abandoned.__cause__ = error
+                error = abandoned
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def stats(self) -> Dict:
+        """Return coalescing counters."""
+        with self._lock:
+            return {
+                "leader_calls": self.leaders,
+                "coalesced_calls": self.coalesced,
+                "in_flight": len(self._calls)
+            }
@@ -6,5 +6,7 @@ from . import plan_prompts
 from . import nutrition_prompts
 from . import health_prompts
 from . import agents_prompts
+from . import schemas
+from . import cache_keys
 
-__all__ = ['plan_prompts', 'nutrition_prompts', 'health_prompts', 'agents_prompts']
+__all__ = ['plan_prompts', 'nutrition_prompts', 'health_prompts', 'agents_prompts', 'schemas', 'cache_keys']
@@ -0,0 +1,85 @@
+"""
+Canonical cache-key inputs for profile-driven prompts
+Prompt builders declare the inputs their output depends on through a
+matching *_key() function; numeric inputs are bucketed so near-identical
+profiles (75.5 vs 75.6 kg, 2013.75 vs 2014 kcal) share one cached response.
+Pass the result as GeminiEngine.generate(cache_key_inputs=...).
+"""
+
+import math
+from typing import Any, Dict, Iterable, Optional, Tuple, Union
+
+# Bucket sizes
+CALORIE_STEP = 50      # kcal
+MACRO_STEP = 5         # g
+WEIGHT_STEP = 1        # kg
+HEIGHT_STEP = 2        # cm
+BMI_STEP = 0.5
+BODY_FAT_STEP = 1      # %
+HEART_RATE_STEP = 5    # bpm
+
+AGE_BANDS = ((18, "<18"), (25, "18-24"), (35, "25-34"), (45, "35-44"), (55, "45-54"), (65, "55-64"))
+
+
+def bucket(value: Any, step: float) -> Union[float, int, str, None]:
+    """
+    Round a numeric value to the nearest multiple of step.
+
+    Numeric strings are parsed; NaN and infinity are treated as missing.
+    Anything else is returned as normalized text, so unknown values still
+    key on what the prompt would show.
+    """
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return text(value)
+    if not math.isfinite(number):
+        return None
+    rounded = round(number / step) * step
+    return int(rounded) if rounded == int(rounded) else round(rounded, 2)
+
+
+def age_band(age: Any) -> Optional[str]:
+    """Map an age to its band (e.g. 31 -> "25-34"); NaN and infinity are treated as missing."""
+    try:
+        age = float(age)
+    except (TypeError, ValueError):
+        return text(age)
+    if not math.isfinite(age):
+        return None
+    for upper, band in AGE_BANDS:
+        if age < upper:
+            return band
+    return "65+"
+
+
+def text(value: Any) -> Optional[str]:
+    """Normalize free text: trimmed and lower-cased, None if empty."""
+    if value is None:
+        return None
+    value = str(value).strip().lower()
+    return value or None
+
+
+def text_set(values: Optional[Iterable]) -> Tuple[str, ...]:
+    """Normalize a list of tags (allergies, restrictions) into a sorted tuple."""
+    if not values:
+        return ()
+    if isinstance(values, str):
+        values = [values]
+    return tuple(sorted({text(value) for value in values if text(value)}))
+
+
+def prompt_key(name: str, version: int = 1, **inputs: Any) -> Dict[str, Any]:
+    """
+    Build the cache-key inputs for one prompt.
+
+    Args:
+        name: Prompt builder name
+        version: Bump when the prompt template changes, to retire old entries
+        **inputs: Canonicalized inputs the prompt depends on
+
+    Returns:
+        JSON-serializable dict
+    """
+    return {"prompt": name, "v": version, **inputs}
@@ -4,6 +4,11 @@ Prompt templates for health metrics analysis and insights
 
 from typing import Dict, Any, List
 
+from .cache_keys import (
+    BMI_STEP, BODY_FAT_STEP, HEART_RATE_STEP, HEIGHT_STEP, WEIGHT_STEP,
+    age_band, bucket, prompt_key, text
+)
+
 
 def analyze_health_metrics_prompt(health_data: Dict[str, Any]) -> str:
     """
@@ -63,6 +68,23 @@ Return ONLY valid JSON:"""
     return prompt
 
 
+def analyze_health_metrics_key(health_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Cache-key inputs for analyze_health_metrics_prompt(), with bucketed metrics."""
+    return prompt_key(
+        'analyze_health_metrics',
+        age=age_band(health_data.get('age')),
+        gender=text(health_data.get('gender')),
+        weight=bucket(health_data.get('weight'), WEIGHT_STEP),
+        height=bucket(health_data.get('height'), HEIGHT_STEP),
+        bmi=bucket(health_data.get('bmi'), BMI_STEP),
+        activity_level=text(health_data.get('activity_level', 'moderate')),
+        fitness_goal=text(health_data.get('fitness_goal', 'general health')),
+        resting_heart_rate=bucket(health_data.get('resting_heart_rate'), HEART_RATE_STEP),
+        blood_pressure=text(health_data.get('blood_pressure')),
+        body_fat_percentage=bucket(health_data.get('body_fat_percentage'), BODY_FAT_STEP)
+    )
+
+
 def track_progress_prompt(
     current_health: Dict[str, Any],
     historical_data: List[Dict[str, Any]],
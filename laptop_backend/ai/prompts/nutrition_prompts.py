@@ -4,6 +4,11 @@ Prompt templates for nutrition analysis and recommendations
 
 from typing import Dict, Any, List
 
+from .cache_keys import (
+    BMI_STEP, CALORIE_STEP, HEIGHT_STEP, MACRO_STEP, WEIGHT_STEP,
+    age_band, bucket, prompt_key, text, text_set
+)
+
 
 def analyze_nutrition_profile_prompt(nutrition_data: Dict[str, Any], health_data: Dict[str, Any]) -> str:
     """
@@ -63,6 +68,28 @@ Return ONLY valid JSON:"""
     return prompt
 
 
+def analyze_nutrition_profile_key(nutrition_data: Dict[str, Any], health_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Cache-key inputs for analyze_nutrition_profile_prompt(), with bucketed goals and metrics."""
+    return prompt_key(
+        'analyze_nutrition_profile',
+        diet_type=text(nutrition_data.get('diet_type', 'standard')),
+        calorie_goal=bucket(nutrition_data.get('calorie_goal', 2000), CALORIE_STEP),
+        protein_goal=bucket(nutrition_data.get('protein_goal'), MACRO_STEP),
+        carb_goal=bucket(nutrition_data.get('carb_goal'), MACRO_STEP),
+        fat_goal=bucket(nutrition_data.get('fat_goal'), MACRO_STEP),
+        meals_per_day=text(nutrition_data.get('meals_per_day', 3)),
+        allergies=text_set(nutrition_data.get('allergies')),
+        dietary_restrictions=text_set(nutrition_data.get('dietary_restrictions')),
+        cuisine_preferences=text_set(nutrition_data.get('cuisine_preferences')),
+        age=age_band(health_data.get('age')),
+        weight=bucket(health_data.get('weight'), WEIGHT_STEP),
+        height=bucket(health_data.get('height'), HEIGHT_STEP),
+        bmi=bucket(health_data.get('bmi'), BMI_STEP),
+        activity_level=text(health_data.get('activity_level', 'moderate')),
+        fitness_goal=text(health_data.get('fitness_goal', 'general health'))
+    )
+
+
 def analyze_meal_log_prompt(meal_data: List[Dict], daily_goals: Dict[str, Any]) -> str:
     """
     Generate prompt for analyzing meal logs against daily goals.
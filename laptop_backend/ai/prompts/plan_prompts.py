@@ -6,6 +6,8 @@ Optimized for smaller LLMs (1B-3B parameters)
 from typing import Dict, Any, List
 import json
 
+from .cache_keys import CALORIE_STEP, bucket, prompt_key, text, text_set
+
 
 def generate_nutrition_prompt(user_data: Dict[str, Any], weeks: int = 2) -> str:
     """
@@ -77,6 +79,48 @@ def generate_plan_prompt(user_data: Dict[str, Any], plan_type: str) -> str:
         return generate_combined_prompt(user_data, duration_weeks)
 
 
+def _nutrition_key_inputs(user_data: Dict[str, Any]) -> Dict[str, Any]:
+    profile = user_data.get('profile', {})
+    nutrition = user_data.get('nutrition', {})
+    return {
+        'calorie_goal': bucket(nutrition.get('calorie_goal', 2000), CALORIE_STEP),
+        'fitness_goal': text(profile.get('fitness_goal', 'maintenance')),
+        'diet_type': text(nutrition.get('diet_type', 'standard')),
+        'allergies': text_set(nutrition.get('allergies')),
+    }
+
+
+def _fitness_key_inputs(user_data: Dict[str, Any]) -> Dict[str, Any]:
+    profile = user_data.get('profile', {})
+    preferences = user_data.get('preferences', {})
+    return {
+        'fitness_goal': text(profile.get('fitness_goal', 'general health')),
+        'workouts_per_week': text(profile.get('workouts_per_day', 3)),
+        'intensity': text(preferences.get('intensity', 'moderate')),
+    }
+
+
+def generate_plan_key(user_data: Dict[str, Any], plan_type: str) -> Dict[str, Any]:
+    """Cache-key inputs for generate_plan_prompt(), with the calorie goal bucketed."""
+    preferences = user_data.get('preferences', {})
+    if plan_type not in ('diet', 'workout'):
+        plan_type = 'combined'
+
+    inputs = {}
+    if plan_type != 'workout':
+        inputs.update(_nutrition_key_inputs(user_data))
+    if plan_type != 'diet':
+        inputs.update(_fitness_key_inputs(user_data))
+    if plan_type == 'combined':
+        # The combined prompt does not mention allergies or intensity
+        del inputs['allergies'], inputs['intensity']
+    return prompt_key(
+        f"generate_{plan_type}_plan",
+        weeks=min(preferences.get('duration_weeks', 2), 4),
+        **inputs
+    )
+
+
 def generate_combined_prompt(user_data: Dict[str, Any], weeks: int = 2) -> str:
     """
     Generate a simple prompt for combined diet AND workout plan.
@@ -108,6 +152,129 @@ Generate {weeks} different weeks:"""
     return prompt
 
 
+# Per-week themes so concurrently generated weeks don't repeat each other
+DIET_WEEK_THEMES = [
+    'Mediterranean', 'Asian-inspired', 'Mexican-inspired', 'Classic American',
+    'Middle Eastern', 'Italian', 'Indian-inspired', 'Nordic'
+]
+
+WORKOUT_WEEK_FOCUSES = [
+    'Full Body Foundation', 'Upper Body Strength', 'Lower Body Power', 'Core & Cardio',
+    'Push/Pull Split', 'Endurance Circuit', 'Mobility & Strength', 'HIIT Conditioning'
+]
+
+
+def _week_theme(themes: List[str], week: int) -> str:
+    return themes[(week - 1) % len(themes)]
+
+
+def _other_themes(themes: List[str], week: int, total_weeks: int) -> str:
+    others = {_week_theme(themes, w) for w in range(1, total_weeks + 1)} - {_week_theme(themes, week)}
+    return ', '.join(sorted(others)) or 'none'
+
+
+def generate_nutrition_week_prompt(
+    user_data: Dict[str, Any],
+    week: int,
+    total_weeks: int,
+    avoid_dishes: List[str] = None
+) -> str:
+    """
+    Generate a prompt for a single week of a meal plan.
+    Each week gets its own theme so weeks generated in parallel stay varied.
+    """
+    profile = user_data.get('profile', {})
+    nutrition = user_data.get('nutrition', {})
+
+    calories = nutrition.get('calorie_goal', 2000)
+    goal = profile.get('fitness_goal', 'maintenance')
+    diet_type = nutrition.get('diet_type', 'standard')
+    allergies = nutrition.get('allergies', [])
+
+    restrictions = ', '.join(allergies) if allergies else 'none'
+
+    # Adjust calories based on goal
+    if 'loss' in goal.lower() or 'lose' in goal.lower():
+        calories = int(calories * 0.85)
+    elif 'gain' in goal.lower() or 'muscle' in goal.lower():
+        calories = int(calories * 1.15)
+
+    avoid = f"\nDo not use these dishes: {', '.join(avoid_dishes)}." if avoid_dishes else ""
+
+    prompt = f"""Create week {week} of a {total_weeks}-week meal plan.
+Calories: {calories}/day. Diet: {diet_type}. Allergies: {restrictions}.
+Theme: {_week_theme(DIET_WEEK_THEMES, week)}. Other weeks use: {_other_themes(DIET_WEEK_THEMES, week, total_weeks)}.{avoid}
+
+Return JSON only:
+{{"week":"Week {week}","breakfast":{{"dishName":"Oatmeal with Berries","calories":"400","protein":"15g","carbs":"60g","fats":"12g","completed":false}},"lunch":{{"dishName":"Grilled Chicken Salad","calories":"500","protein":"40g","carbs":"30g","fats":"20g","completed":false}},"dinner":{{"dishName":"Salmon with Vegetables","calories":"550","protein":"45g","carbs":"25g","fats":"25g","completed":false}}}}"""
+
+    return prompt
+
+
+def generate_fitness_week_prompt(
+    user_data: Dict[str, Any],
+    week: int,
+    total_weeks: int,
+    avoid_workouts: List[str] = None
+) -> str:
+    """
+    Generate a prompt for a single week of a workout plan.
+    Each week gets its own focus and a progression phase so weeks
+    generated in parallel still form a program.
+    """
+    profile = user_data.get('profile', {})
+    preferences = user_data.get('preferences', {})
+
+    goal = profile.get('fitness_goal', 'general health')
+    workouts_per_week = profile.get('workouts_per_day', 3)
+    intensity = preferences.get('intensity', 'moderate')
+
+    # Build for three weeks, then deload
+    phase = 'deload (lighter volume)' if week % 4 == 0 else f"build (progression step {week - week // 4})"
+    avoid = f"\nDo not reuse these workouts: {', '.join(avoid_workouts)}." if avoid_workouts else ""
+
+    prompt = f"""Create week {week} of a {total_weeks}-week workout plan.
+Goal: {goal}. Days/week: {workouts_per_week}. Intensity: {intensity}. Phase: {phase}.
+Focus: {_week_theme(WORKOUT_WEEK_FOCUSES, week)}. Other weeks focus on: {_other_themes(WORKOUT_WEEK_FOCUSES, week, total_weeks)}.{avoid}
+
+Return JSON only:
+{{"week":"Week {week}","workoutName":"Full Body A","completed":false,"exercises":[{{"name":"Squats","sets":"3","reps":"10","completed":false}},{{"name":"Bench Press","sets":"3","reps":"10","completed":false}},{{"name":"Rows","sets":"3","reps":"10","completed":false}},{{"name":"Shoulder Press","sets":"3","reps":"10","completed":false}},{{"name":"Plank","sets":"3","reps":"30s","completed":false}}]}}"""
+
+    return prompt
+
+
+def generate_nutrition_week_key(
+    user_data: Dict[str, Any],
+    week: int,
+    total_weeks: int,
+    avoid_dishes: List[str] = None
+) -> Dict[str, Any]:
+    """Cache-key inputs for generate_nutrition_week_prompt()."""
+    return prompt_key(
+        'generate_nutrition_week',
+        week=week,
+        total_weeks=total_weeks,
+        avoid=text_set(avoid_dishes),
+        **_nutrition_key_inputs(user_data)
+    )
+
+
+def generate_fitness_week_key(
+    user_data: Dict[str, Any],
+    week: int,
+    total_weeks: int,
+    avoid_workouts: List[str] = None
+) -> Dict[str, Any]:
+    """Cache-key inputs for generate_fitness_week_prompt()."""
+    return prompt_key(
+        'generate_fitness_week',
+        week=week,
+        total_weeks=total_weeks,
+        avoid=text_set(avoid_workouts),
+        **_fitness_key_inputs(user_data)
+    )
+
+
 def validate_plan_prompt(user_data: Dict[str, Any], plan_data: Dict[str, Any]) -> str:
     """
     Generate prompt for validating an existing plan.
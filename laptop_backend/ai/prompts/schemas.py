@@ -0,0 +1,147 @@
+"""
+Response schemas for structured-output (JSON mode) generation
+Passed as GeminiEngine.generate(response_schema=...) so the model is
+constrained to emit JSON of the shape each prompt asks for.
+Uses the OpenAPI subset accepted by the Gemini API.
+"""
+
+from typing import Any, Dict, List
+
+
+def _object(properties: Dict[str, Any], required: List[str] = None) -> Dict[str, Any]:
+    schema = {"type": "OBJECT", "properties": properties}
+    schema["required"] = list(properties) if required is None else required
+    return schema
+
+
+def _array(items: Dict[str, Any]) -> Dict[str, Any]:
+    return {"type": "ARRAY", "items": items}
+
+
+STRING = {"type": "STRING"}
+INTEGER = {"type": "INTEGER"}
+NUMBER = {"type": "NUMBER"}
+BOOLEAN = {"type": "BOOLEAN"}
+STRING_LIST = _array(STRING)
+
+
+# Plans
+
+MEAL = _object({
+    "dishName": STRING,
+    "calories": STRING,
+    "protein": STRING,
+    "carbs": STRING,
+    "fats": STRING,
+    "completed": BOOLEAN,
+})
+
+EXERCISE = _object({
+    "name": STRING,
+    "sets": STRING,
+    "reps": STRING,
+    "completed": BOOLEAN,
+})
+
+DIET_WEEK = _object({
+    "week": STRING,
+    "breakfast": MEAL,
+    "lunch": MEAL,
+    "dinner": MEAL,
+})
+
+WORKOUT_WEEK = _object({
+    "week": STRING,
+    "workoutName": STRING,
+    "completed": BOOLEAN,
+    "exercises": _array(EXERCISE),
+})
+
+PLAN = _object(
+    {"diet": _array(DIET_WEEK), "workouts": _array(WORKOUT_WEEK)},
+    required=[]
+)
+
+PLAN_VALIDATION = _object({
+    "score": INTEGER,
+    "feedback": STRING,
+    "improvements": STRING_LIST,
+})
+
+WORKOUT_ADJUSTMENT = _object({"exercises": _array(EXERCISE)})
+
+NUTRITION_ADJUSTMENT = _object({
+    "adjusted_meals": _object({"breakfast": MEAL, "lunch": MEAL, "dinner": MEAL}, required=[])
+})
+
+
+# Analyses
+
+HEALTH_ANALYSIS = _object({
+    "bmi_assessment": _object({"category": STRING, "description": STRING}),
+    "health_insights": STRING_LIST,
+    "risk_factors": STRING_LIST,
+    "recommendations": STRING_LIST,
+    "optimal_ranges": _object({
+        "weight_range": STRING,
+        "bmi_range": STRING,
+        "recommended_activity": STRING,
+    }),
+    "priority_actions": STRING_LIST,
+})
+
+NUTRITION_ANALYSIS = _object({
+    "analysis": _object({
+        "calorie_appropriateness": STRING,
+        "macro_balance": STRING,
+        "diet_compatibility": STRING,
+    }),
+    "recommendations": STRING_LIST,
+    "suggested_adjustments": _object({
+        "calorie_goal": INTEGER,
+        "protein_goal": INTEGER,
+        "carb_goal": INTEGER,
+        "fat_goal": INTEGER,
+    }),
+    "meal_timing_tips": STRING_LIST,
+    "supplement_suggestions": STRING_LIST,
+})
+
+MEAL_SUGGESTIONS = _object({
+    "suggestions": _array(_object({
+        "name": STRING,
+        "description": STRING,
+        "calories": INTEGER,
+        "protein": INTEGER,
+        "carbs": INTEGER,
+        "fats": INTEGER,
+        "ingredients": STRING_LIST,
+        "prep_time": STRING,
+    }))
+})
+
+
+# Agents
+
+FITNESS_AGENT = _object({
+    "workouts": _array(_object({
+        "day": STRING,
+        "workoutName": STRING,
+        "duration_minutes": INTEGER,
+        "completed": BOOLEAN,
+        "exercises": _array(EXERCISE),
+    }))
+})
+
+NUTRITION_AGENT = _object({
+    "food_plan": _array(_object({
+        "meal": STRING,
+        "dishName": STRING,
+        "calories": STRING,
+        "protein": STRING,
+        "carbs": STRING,
+        "fats": STRING,
+        "completed": BOOLEAN,
+    })),
+    "daily_total_calories": INTEGER,
+})
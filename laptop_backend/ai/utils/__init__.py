@@ -2,6 +2,6 @@
 Utilities submodule - Helper functions for AI layer
 """
 
-from .model_utils import validate_generation_params, format_response
+from .model_utils import validate_generation_params, format_response, repair_truncated_json, StreamingJSONParser
 
-__all__ = ['validate_generation_params', 'format_response']
+__all__ = ['validate_generation_params', 'format_response', 'repair_truncated_json', 'StreamingJSONParser']
@@ -4,7 +4,10 @@ Utility functions for AI layer operations
 
 import json
 import logging
-from typing import Dict, Any, Optional, Tuple
+import re
+from typing import Dict, Any, List, Optional, Tuple
+
+from ..inference.metrics import output_metrics
 
 logger = logging.getLogger(__name__)
 
@@ -48,7 +51,9 @@ def validate_generation_params(
 
 def format_response(
     raw_output: str,
-    expected_format: str = "json"
+    expected_format: str = "json",
+    prompt_family: Optional[str] = None,
+    repair: bool = False
 ) -> Dict[str, Any]:
     """
     Format and parse LLM output.
@@ -56,39 +61,33 @@ def format_response(
     Args:
         raw_output: Raw output from LLM
         expected_format: Expected output format ('json', 'text')
+        prompt_family: Prompt family the output came from; JSON parse
+            outcomes are counted per family in output_metrics
+        repair: If the JSON is invalid (typically cut off at max tokens),
+            salvage the complete elements with repair_truncated_json().
+            The result then has "repaired": True and a "repair" report.
 
     Returns:
         Formatted response dictionary
     """
     if expected_format == "json":
-        try:
-            # Try to extract JSON from the output
-            json_start = raw_output.find('{')
-            json_end = raw_output.rfind('}') + 1
-
-            if json_start != -1 and json_end > json_start:
-                json_str = raw_output[json_start:json_end]
-                parsed = json.loads(json_str)
-                return {
+        result = _parse_json_output(raw_output)
+        if not result["success"] and repair:
+            data, report = repair_truncated_json(raw_output)
+            if data is not None:
+                logger.warning(f"Repaired truncated JSON, dropped {report['dropped_chars']} chars")
+                result = {
                     "success": True,
-                    "data": parsed,
-                    "raw_output": raw_output
-                }
-            else:
-                logger.warning("No JSON object found in output")
-                return {
-                    "success": False,
-                    "error": "No JSON object found in output",
-                    "raw_output": raw_output
+                    "data": data,
+                    "raw_output": raw_output,
+                    "repaired": True,
+                    "repair": report
                 }
-
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse JSON: {e}")
-            return {
-                "success": False,
-                "error": f"Invalid JSON: {str(e)}",
-                "raw_output": raw_output
-            }
+                if prompt_family:
+                    output_metrics.record_repair(prompt_family)
+        if prompt_family:
+            output_metrics.record_parse(prompt_family, result["success"])
+        return result
 
     # Text format
     return {
@@ -98,6 +97,133 @@ def format_response(
     }
 
 
+def _parse_json_output(raw_output: str) -> Dict[str, Any]:
+    """Parse the outermost JSON object in LLM output."""
+    try:
+        # Try to extract JSON from the output
+        json_start = raw_output.find('{')
+        json_end = raw_output.rfind('}') + 1
+
+        if json_start != -1 and json_end > json_start:
+            json_str = raw_output[json_start:json_end]
+            parsed = json.loads(json_str)
+            return {
+                "success": True,
+                "data": parsed,
+                "raw_output": raw_output
+            }
+        else:
+            logger.warning("No JSON object found in output")
+            return {
+                "success": False,
+                "error": "No JSON object found in output",
+                "raw_output": raw_output
+            }
+
+    except json.JSONDecodeError as e:
+        logger.error(f"Failed to parse JSON: {e}")
+        return {
+            "success": False,
+            "error": f"Invalid JSON: {str(e)}",
+            "raw_output": raw_output
+        }
+
+
+def repair_truncated_json(text: str) -> Tuple[Optional[Any], Dict[str, Any]]:
+    """
+    Salvage a JSON object that was cut off mid-output.
+
+    Scans from the first '{', remembering the last element boundary: after
+    a complete array element or before the ',' that follows it (at any
+    depth), or after '[' or a root member while no object below the root
+    is open. The text is cut there and everything still open is closed.
+    An element that was still open at the cut and holds no array in
+    progress (e.g. a meal, or an exercise with only a name) is dropped
+    whole; one that does (a week cut inside its "exercises") keeps the
+    complete items of that array.
+
+    Args:
+        text: LLM output containing a (possibly truncated) JSON object
+
+    Returns:
+        Tuple of (parsed data or None, report). Data is None if nothing
+        complete was salvaged (no array element survived the cut), so the
+        caller's error path runs. The report has "dropped_chars",
+        "dropped_text" (a preview of what was cut) and "closed" (the
+        brackets appended).
+    """
+    report = {"dropped_chars": 0, "dropped_text": "", "closed": ""}
+
+    start = text.find('{')
+    if start == -1:
+        return None, report
+
+    stack = []
+    open_objects = 0  # Objects open below the root
+    in_string = False
+    escaped = False
+    cut, cut_stack = None, None
+
+    for i in range(start, len(text)):
+        char = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+            continue
+
+        if char == '"':
+            in_string = True
+        elif char in '{[':
+            if char == '{' and stack:
+                open_objects += 1
+            stack.append('}' if char == '{' else ']')
+            if not open_objects:
+                cut, cut_stack = i + 1, list(stack)
+        elif char in '}]':
+            if not stack:
+                break
+            if stack.pop() == '}' and stack:
+                open_objects -= 1
+            if not stack:
+                # Complete object; nothing to repair past this point
+                cut, cut_stack = i + 1, []
+                break
+            if stack[-1] == ']' or not open_objects:
+                cut, cut_stack = i + 1, list(stack)
+        elif char == ',' and (stack[-1] == ']' or not open_objects):
+            cut, cut_stack = i, list(stack)
+
+    if cut is None:
+        return None, report
+
+    closers = ''.join(reversed(cut_stack))
+    dropped = text[cut:].strip()
+    try:
+        data = json.loads(text[start:cut].rstrip() + closers)
+    except json.JSONDecodeError:
+        return None, report
+    if closers and not _has_elements(data):
+        return None, report
+
+    report["dropped_chars"] = len(dropped)
+    report["dropped_text"] = dropped[:80]
+    report["closed"] = closers
+    return data, report
+
+
+def _has_elements(data: Any) -> bool:
+    """Whether any array in data has at least one element."""
+    if isinstance(data, list):
+        return bool(data)
+    if isinstance(data, dict):
+        return any(_has_elements(value) for value in data.values())
+    return False
+
+
 def extract_json_from_text(text: str) -> Optional[Dict]:
     """
     Extract JSON object from text that may contain additional content.
@@ -124,6 +250,169 @@ def extract_json_from_text(text: str) -> Optional[Dict]:
         return None
 
 
+_STRUCTURAL = re.compile(r'[{}\[\]":]')
+_STRING_END = re.compile(r'["\\]')
+
+
+class StreamingJSONParser:
+    """
+    Incremental parser for a JSON object streamed inside LLM output.
+
+    Text is fed chunk by chunk and every character is scanned once.
+    Leading chatter and markdown code fences before the first '{' are
+    skipped. Whenever an object element of a top-level array property
+    (e.g. each week of "diet" or "workouts") closes, it is parsed and
+    returned from feed() as a (key, element) pair.
+
+    Usage:
+        parser = StreamingJSONParser(array_keys=['diet', 'workouts'])
+        for chunk in stream:
+            for key, item in parser.feed(chunk):
+                ...
+        data = parser.result()
+    """
+
+    def __init__(self, array_keys: Optional[List[str]] = None):
+        """
+        Args:
+            array_keys: Top-level array properties to emit elements from;
+                None emits elements of every top-level array
+        """
+        self.array_keys = set(array_keys) if array_keys is not None else None
+        self.done = False
+
+        self._chunks: List[str] = []
+        self._offset = 0           # Absolute position of the current chunk
+        self._root_start = None    # Absolute position of the root '{'
+        self._root_end = None
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+        self._key_parts: List[str] = []   # Top-level string being read
+        self._last_key = None
+        self._array_key = None            # Top-level array being collected
+        self._element_parts: List[str] = []
+        self._element_start = None        # Start of current element in chunk
+
+    @property
+    def text(self) -> str:
+        """All text fed so far."""
+        return ''.join(self._chunks)
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """
+        Consume a chunk of text.
+
+        Returns:
+            List of (array_key, element) pairs completed by this chunk
+        """
+        completed = []
+        self._chunks.append(chunk)
+        pos = 0
+        n = len(chunk)
+
+        if self._root_start is None:
+            pos = chunk.find('{')
+            if pos == -1:
+                self._offset += n
+                return completed
+            self._root_start = self._offset + pos
+            self._depth = 1
+            pos += 1
+
+        if self._element_start is not None:
+            self._element_start = 0
+        key_start = 0 if self._in_string and self._depth == 1 else None
+
+        while pos < n and not self.done:
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                    pos += 1
+                    continue
+                match = _STRING_END.search(chunk, pos)
+                if match is None:
+                    break
+                pos = match.start()
+                if chunk[pos] == '\\':
+                    self._escape = True
+                    pos += 1
+                    continue
+                # Closing quote
+                self._in_string = False
+                if key_start is not None:
+                    self._key_parts.append(chunk[key_start:pos])
+                    self._last_key = ''.join(self._key_parts)
+                    key_start = None
+                pos += 1
+                continue
+
+            match = _STRUCTURAL.search(chunk, pos)
+            if match is None:
+                break
+            pos = match.start()
+            char = chunk[pos]
+
+            if char == '"':
+                self._in_string = True
+                if self._depth == 1:
+                    self._key_parts = []
+                    key_start = pos + 1
+            elif char == ':':
+                pass
+            elif char in '{[':
+                self._depth += 1
+                if self._depth == 2 and char == '[':
+                    key = self._last_key
+                    if self.array_keys is None or key in self.array_keys:
+                        self._array_key = key
+                elif self._depth == 3 and char == '{' and self._array_key is not None:
+                    self._element_parts = []
+                    self._element_start = pos
+            else:
+                self._depth -= 1
+                if self._depth == 2 and self._element_start is not None:
+                    self._element_parts.append(chunk[self._element_start:pos + 1])
+                    self._element_start = None
+                    element = self._parse_element()
+                    if element is not None:
+                        completed.append((self._array_key, element))
+                elif self._depth == 1:
+                    self._array_key = None
+                elif self._depth == 0:
+                    self._root_end = self._offset + pos + 1
+                    self.done = True
+            pos += 1
+
+        if self._in_string and key_start is not None:
+            self._key_parts.append(chunk[key_start:])
+        if self._element_start is not None:
+            self._element_parts.append(chunk[self._element_start:])
+
+        self._offset += n
+        return completed
+
+    def _parse_element(self) -> Optional[Any]:
+        element_text = ''.join(self._element_parts)
+        self._element_parts = []
+        try:
+            return json.loads(element_text)
+        except json.JSONDecodeError as e:
+            logger.warning(f"Skipping unparseable streamed element in '{self._array_key}': {e}")
+            return None
+
+    def result(self) -> Optional[Dict]:
+        """Return the parsed root object once it has closed, else None."""
+        if not self.done:
+            return None
+        try:
+            return json.loads(self.text[self._root_start:self._root_end])
+        except json.JSONDecodeError as e:
+            logger.error(f"Failed to parse streamed JSON: {e}")
+            return None
+
+
 def sanitize_user_input(user_input: str, max_length: int = 5000) -> str:
     """
     Sanitize user input before passing to LLM.
@@ -0,0 +1,255 @@
+"""
+Validation and normalization of diet/workout plan payloads
+
+LLM output arrives with loosely typed fields: calories as 400 or
+"400 kcal", macros as 15 or "15 g", sets as 3, completed as "false",
+weekName instead of week, exercises as bare strings. The normalizers here
+turn generated plans into the canonical shape the app consumes (the mock
+plan format) in a single pass, before they are stored:
+
+    meal      {"dishName": str, "calories": "400", "protein": "15g",
+               "carbs": "60g", "fats": "12g", "completed": bool}
+    exercise  {"name": str, "sets": "3", "reps": "10", "completed": bool}
+    diet week {"week": "Week 1", "breakfast": meal, "lunch": meal, "dinner": meal}
+    workout   {"week": "Week 1", "workoutName": str, "completed": bool,
+               "exercises": [exercise, ...]}
+
+Numeric fields are only rewritten when the whole value is a number (with
+an optional unit); anything else ("3-4", "2x10", "300-400 kcal") is kept as
+written, and a missing meal stays missing.
+
+Field specs are compiled once, at import, into flat tuples of
+(key, aliases, coercer); normalizing a record is one loop over its spec.
+Aliases are replaced by their canonical key (a record never carries both),
+and keys outside the spec (e.g. actualMeal, workoutId) are passed through.
+
+Plans already in Firestore are not normalized: they may hold user edits and
+legacy shapes, and are patched in place by the services (see
+services.plan_service.find_stored_week).
+"""
+
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# A whole value that is one number, optionally followed by its unit
+_KCAL = re.compile(r'\s*(-?\d+(?:\.\d+)?)\s*(?:kcal|cal|calories)?\s*', re.IGNORECASE)
+_GRAMS = re.compile(r'\s*(-?\d+(?:\.\d+)?)\s*(?:g|grams?)?\s*', re.IGNORECASE)
+_COUNT = re.compile(r'\s*(-?\d+(?:\.\d+)?)\s*')
+_MISSING = object()
+
+MEAL_TYPES = ('breakfast', 'lunch', 'dinner')
+
+
+class PlanValidationError(ValueError):
+    """Raised when a payload cannot be normalized; path locates the bad field."""
+
+    def __init__(self, message: str, path: str):
+        super().__init__(f"{path}: {message}")
+        self.path = path
+
+
+# Field coercers: (value, path) -> canonical value. value is None when missing;
+# a coercer returning None leaves the field out.
+
+def _format_number(number: float) -> str:
+    return str(int(number)) if number == int(number) else str(round(number, 1))
+
+
+def _whole_number(value: Any, pattern: re.Pattern) -> Optional[float]:
+    """The value as a number if all of it is one number (in pattern's unit), else None."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        match = pattern.fullmatch(value)
+        if match:
+            return float(match.group(1))
+    return None
+
+
+def _text(value, path) -> Optional[str]:
+    return None if value is None else str(value).strip()
+
+
+def _as_written(value, path) -> Optional[str]:
+    return value if isinstance(value, str) else _text(value, path)
+
+
+def _kcal(value, path) -> Optional[str]:
+    number = _whole_number(value, _KCAL)
+    return _as_written(value, path) if number is None else str(int(round(number)))
+
+
+def _grams(value, path) -> Optional[str]:
+    number = _whole_number(value, _GRAMS)
+    return _as_written(value, path) if number is None else f"{_format_number(number)}g"
+
+
+def _count(value, path) -> Optional[str]:
+    number = _whole_number(value, _COUNT)
+    return _as_written(value, path) if number is None else _format_number(number)
+
+
+def _reps(value, path) -> Optional[str]:
+    # Keep time and per-side reps ("30s", "10 each") as written
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return _format_number(float(value))
+    return _text(value, path)
+
+
+def _flag(value, path) -> bool:
+    if isinstance(value, str):
+        return value.strip().lower() in ('true', 'yes', '1', 'done', 'completed')
+    return bool(value)
+
+
+def _compile_record(
+    fields: List[Tuple[str, Tuple[str, ...], Callable, bool]]
+) -> Callable[[Any, str], Dict]:
+    """
+    Build a normalizer for one record type.
+
+    Args:
+        fields: (key, aliases, coercer, required) per canonical field
+
+    Returns:
+        normalize(raw, path) -> canonical dict; raises PlanValidationError
+    """
+    spec = tuple(fields)
+    alias_keys = frozenset(alias for _, aliases, _, _ in spec for alias in aliases)
+
+    def normalize(raw, path):
+        if not isinstance(raw, dict):
+            raise PlanValidationError(f"expected an object, got {type(raw).__name__}", path)
+
+        record = {key: value for key, value in raw.items() if key not in alias_keys}
+        for key, aliases, coerce, required in spec:
+            value = raw.get(key, _MISSING)
+            if value is _MISSING:
+                for alias in aliases:
+                    value = raw.get(alias, _MISSING)
+                    if value is not _MISSING:
+                        break
+            if value is _MISSING or value is None:
+                if required:
+                    raise PlanValidationError(f"missing required field '{key}'", path)
+                value = None
+            value = coerce(value, f"{path}.{key}")
+            if value is None:
+                record.pop(key, None)
+            else:
+                record[key] = value
+        return record
+
+    return normalize
+
+
+_normalize_meal = _compile_record([
+    ('dishName', ('name', 'dish', 'meal_name'), _text, False),
+    ('calories', ('kcal', 'calorie'), _kcal, False),
+    ('protein', (), _grams, False),
+    ('carbs', ('carbohydrates',), _grams, False),
+    ('fats', ('fat',), _grams, False),
+    ('completed', (), _flag, False),
+])
+
+_normalize_exercise = _compile_record([
+    ('name', ('exercise', 'exerciseName'), _text, True),
+    ('sets', (), _count, False),
+    ('reps', ('duration', 'time'), _reps, False),
+    ('completed', (), _flag, False),
+])
+
+
+def _meal(value, path):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = {'dishName': value}
+    return _normalize_meal(value, path)
+
+
+def _exercises(value, path):
+    if not isinstance(value, list):
+        raise PlanValidationError("expected a list of exercises", path)
+    exercises = []
+    for i, item in enumerate(value):
+        if isinstance(item, str):
+            item = {'name': item}
+        exercises.append(_normalize_exercise(item, f"{path}[{i}]"))
+    return exercises
+
+
+_normalize_diet_week = _compile_record([
+    ('week', ('weekName', 'week_name'), _text, False),
+    ('breakfast', (), _meal, False),
+    ('lunch', (), _meal, False),
+    ('dinner', (), _meal, False),
+])
+
+_normalize_workout_week = _compile_record([
+    ('week', ('weekName', 'week_name'), _text, False),
+    ('workoutName', ('name', 'workout_name', 'title'), _text, False),
+    ('completed', (), _flag, False),
+    ('exercises', ('workouts',), _exercises, True),
+])
+
+
+def normalize_meal(raw: Any, path: str = "meal") -> Optional[Dict]:
+    """Return the canonical form of one meal, or None if it is missing."""
+    return _meal(raw, path)
+
+
+def normalize_exercise(raw: Any, path: str = "exercise") -> Dict:
+    """Return the canonical form of one exercise (a bare string is taken as its name)."""
+    if isinstance(raw, str):
+        raw = {'name': raw}
+    return _normalize_exercise(raw, path)
+
+
+def normalize_exercises(raw: Any, path: str = "exercises") -> List[Dict]:
+    """Return the canonical form of a list of exercises."""
+    return _exercises(raw, path)
+
+
+def normalize_diet_week(raw: Any, path: str = "diet_week") -> Dict:
+    """Return the canonical form of one diet week; it must contain at least one meal."""
+    if isinstance(raw, dict) and not any(isinstance(raw.get(meal), (dict, str)) for meal in MEAL_TYPES):
+        raise PlanValidationError("no meals", path)
+    return _normalize_diet_week(raw, path)
+
+
+def normalize_workout_week(raw: Any, path: str = "workout_week") -> Dict:
+    """Return the canonical form of one workout week; it must contain an exercises list."""
+    return _normalize_workout_week(raw, path)
+
+
+def normalize_plan(raw: Any) -> Tuple[Dict[str, List[Dict]], List[str]]:
+    """
+    Normalize a whole generated plan; weeks that cannot be normalized are dropped.
+
+    Args:
+        raw: {"diet": [...], "workouts": [...]}; either key may be missing
+
+    Returns:
+        Tuple of (plan with canonical "diet" and "workouts" lists, error
+        messages for the weeks that failed)
+    """
+    plan = {'diet': [], 'workouts': []}
+    errors = []
+    if not isinstance(raw, dict):
+        return plan, [f"plan: expected an object, got {type(raw).__name__}"]
+
+    for section, normalize in (('diet', normalize_diet_week), ('workouts', normalize_workout_week)):
+        weeks = raw.get(section) or []
+        if not isinstance(weeks, list):
+            errors.append(f"{section}: expected a list")
+            continue
+        for i, week in enumerate(weeks):
+            try:
+                plan[section].append(normalize(week, f"{section}[{i}]"))
+            except PlanValidationError as e:
+                errors.append(str(e))
+
+    return plan, errors
@@ -8,7 +8,7 @@ It registers blueprints and sets up the application.
 import os
 import logging
 from dotenv import load_dotenv
-from flask import Flask, jsonify, Response
+from flask import Flask, jsonify, Response, request
 from flask_cors import CORS
 import markdown2
 import json
@@ -38,7 +38,7 @@ def create_app():
     app.config['JSONIFY_PRETTYPRINT_REGULAR'] = True
     
     # Register blueprints
-    from routes import auth_bp, user_bp, plan_bp, tracking_bp, user_ai_bp, agents_bp
+    from routes import auth_bp, user_bp, plan_bp, tracking_bp, user_ai_bp, agents_bp, admin_bp
 
     app.register_blueprint(auth_bp)
     app.register_blueprint(user_bp)
@@ -46,6 +46,27 @@ def create_app():
     app.register_blueprint(tracking_bp)
     app.register_blueprint(user_ai_bp)  # AI-enhanced health & nutrition endpoints
     app.register_blueprint(agents_bp)  # Fitness & nutrition agents
+    app.register_blueprint(admin_bp)  # Admin stats
+
+    from ai.inference.context import current_route, current_user
+
+    @app.before_request
+    def bind_usage_context():
+        """Attribute AI token usage during this request to its route and user."""
+        # Set on every request, so values never leak from a previous request on this thread
+        rule = request.url_rule
+        current_route.set(f"{request.method} {rule.rule}" if rule else None)
+        current_user.set((request.view_args or {}).get('user_id'))
+
+    # Configure the Gemini engine now and warm its connection in the
+    # background, so the first AI request does not pay for the setup
+    from ai import warm_up_gemini_engine
+    ai_engine = warm_up_gemini_engine()
+
+    # Start the background job workers, so jobs left queued (or orphaned by
+    # a dead process) before a restart run without waiting for a new submit
+    from services.job_queue import get_job_queue
+    get_job_queue().start()
     
     # Health check endpoint
     @app.route('/health', methods=['GET'])
@@ -54,7 +75,8 @@ def create_app():
         logger.debug("Health check endpoint accessed")
         return jsonify({
             'status': 'ok',
-            'service': 'nutrition-workout-api'
+            'service': 'nutrition-workout-api',
+            'ai_engine': ai_engine.readiness()
         }), 200
     
     # Root endpoint
@@ -67,7 +89,11 @@ def create_app():
             # ============ SYSTEM ============
             'health_check': {
                 'input': None,
-                'output': {'status': 'ok', 'service': 'nutrition-workout-api'}
+                'output': {
+                    'status': 'ok',
+                    'service': 'nutrition-workout-api',
+                    'ai_engine': {'state': 'ready', 'since': 1705314600.0, 'error': None, 'warmup_seconds': 0.42, 'upstream': 'healthy', 'breaker': 'closed', 'model': 'gemini-1.5-flash'}
+                }
             },
             
             # ============ AUTH ============
@@ -486,6 +512,42 @@ def create_app():
         logger.warning(f"Resource not found: {str(error)}")
         return jsonify({'error': 'Not found', 'message': 'The requested resource was not found'}), 404
 
+    from ai.inference.scheduler import SchedulerFullError
+    from ai.inference.deadline import DeadlineExceededError
+    from ai.inference.resilience import UpstreamUnavailableError
+
+    @app.errorhandler(SchedulerFullError)
+    def ai_overloaded(error):
+        logger.warning(f"AI service overloaded: {str(error)}")
+        response = jsonify({
+            'error': 'AI service busy',
+            'message': str(error),
+            'retry_after': error.retry_after
+        })
+        response.headers['Retry-After'] = str(error.retry_after)
+        return response, 429
+
+    @app.errorhandler(UpstreamUnavailableError)
+    def ai_unavailable(error):
+        logger.warning(f"AI service unavailable: {str(error)}")
+        response = jsonify({
+            'error': 'AI service unavailable',
+            'message': str(error),
+            'retry_after': error.retry_after,
+            'degraded': True
+        })
+        response.headers['Retry-After'] = str(error.retry_after)
+        return response, 503
+
+    @app.errorhandler(DeadlineExceededError)
+    def ai_deadline_exceeded(error):
+        logger.warning(f"AI request deadline exceeded: {str(error)}")
+        return jsonify({
+            'error': 'AI service timed out',
+            'message': str(error),
+            'degraded': True
+        }), 504
+
     @app.errorhandler(500)
     def internal_error(error):
         logger.error(f"Internal server error: {str(error)}", exc_info=True)
@@ -8,5 +8,6 @@ from .plan import plan_bp  # AI-powered plan routes
 from .tracking import tracking_bp
 from .user_ai import user_ai_bp  # AI-enhanced health & nutrition routes
 from .agents import agents_bp  # Fitness & nutrition agents
+from .admin import admin_bp  # Usage and engine stats
 
-__all__ = ['auth_bp', 'user_bp', 'plan_bp', 'tracking_bp', 'user_ai_bp', 'agents_bp']
+__all__ = ['auth_bp', 'user_bp', 'plan_bp', 'tracking_bp', 'user_ai_bp', 'agents_bp', 'admin_bp']
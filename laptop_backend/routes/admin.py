@@ -0,0 +1,51 @@
+"""
+Admin Blueprint - AI usage and output statistics.
+Requests must send the ADMIN_API_KEY value in the X-Admin-Key header;
+the endpoints are disabled while ADMIN_API_KEY is not set.
+"""
+
+import hmac
+import os
+
+from flask import Blueprint, jsonify, request
+
+from ai import get_gemini_engine
+from ai.inference.metrics import output_metrics, usage_metrics
+
+admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
+
+
+@admin_bp.before_request
+def require_admin_key():
+    """Reject requests without the admin key."""
+    admin_key = os.getenv('ADMIN_API_KEY')
+    if not admin_key or not hmac.compare_digest(request.headers.get('X-Admin-Key', ''), admin_key):
+        return jsonify({'error': 'Forbidden'}), 403
+
+
+@admin_bp.route('/stats', methods=['GET'])
+def get_stats():
+    """
+    Token usage (per prompt family, route and user) and output quality stats.
+
+    Query Params:
+        top_users: Number of heaviest users to include (default 20)
+    """
+    top_users = request.args.get('top_users', 20, type=int)
+    return jsonify({
+        'usage': usage_metrics.stats(top_users=top_users),
+        'output': output_metrics.stats()
+    }), 200
+
+
+@admin_bp.route('/engine', methods=['GET'])
+def get_engine_health():
+    """
+    Gemini engine health from recent traffic, plus cache and scheduler stats.
+
+    Query Params:
+        probe: "true" to include the active probe (re-run at most once per
+            GEMINI_HEALTH_PROBE_INTERVAL seconds, otherwise cached)
+    """
+    probe = request.args.get('probe', 'false').lower() == 'true'
+    return jsonify(get_gemini_engine().health_check(probe=probe)), 200
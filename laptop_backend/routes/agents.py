@@ -8,8 +8,8 @@ from flask import Blueprint, jsonify, request
 import logging
 import time
 
-from ai import get_gemini_engine
-from ai.prompts import agents_prompts
+from ai import get_gemini_engine, SchedulerFullError, DeadlineExceededError, UpstreamUnavailableError, with_deadline
+from ai.prompts import agents_prompts, schemas
 from ai.utils.model_utils import format_response, format_error_response
 
 logger = logging.getLogger(__name__)
@@ -19,6 +19,7 @@ agents_bp = Blueprint('agents', __name__, url_prefix='/users')
 
 
 @agents_bp.route('/<user_id>/agents/fitness', methods=['POST'])
+@with_deadline(30)
 def fitness_agent(user_id):
     """
     Fitness agent: generate workouts based on activity level, fitness goal,
@@ -75,9 +76,12 @@ def fitness_agent(user_id):
             prompt=prompt,
             max_new_tokens=1500,
             temperature=0.6,
-            use_cache=False
+            use_cache=False,
+            prompt_family='fitness_agent',
+            priority='bulk',
+            response_schema=schemas.FITNESS_AGENT
         )
-        formatted = format_response(raw_output, expected_format='json')
+        formatted = format_response(raw_output, expected_format='json', prompt_family='fitness_agent', repair=True)
 
         if not formatted['success']:
             ai_logger.warning(f"AI_INFERENCE: Fitness agent parse failed for userId={user_id}")
@@ -99,12 +103,15 @@ def fitness_agent(user_id):
             'generation_time_seconds': round(elapsed, 2)
         }), 200
 
+    except (SchedulerFullError, DeadlineExceededError, UpstreamUnavailableError):
+        raise  # Rendered as 429 / 504 / 503 by the app error handlers
     except Exception as e:
         ai_logger.error(f"AI_INFERENCE: Fitness agent error for userId={user_id}: {e}", exc_info=True)
         return jsonify(format_error_response(e, 'fitness agent')), 500
 
 
 @agents_bp.route('/<user_id>/agents/nutrition', methods=['POST'])
+@with_deadline(30)
 def nutrition_agent(user_id):
     """
     Nutrition agent: generate food plan based on dietary restrictions and
@@ -150,9 +157,12 @@ def nutrition_agent(user_id):
             prompt=prompt,
             max_new_tokens=1200,
             temperature=0.5,
-            use_cache=False
+            use_cache=False,
+            prompt_family='nutrition_agent',
+            priority='bulk',
+            response_schema=schemas.NUTRITION_AGENT
         )
-        formatted = format_response(raw_output, expected_format='json')
+        formatted = format_response(raw_output, expected_format='json', prompt_family='nutrition_agent', repair=True)
 
         if not formatted['success']:
             ai_logger.warning(f"AI_INFERENCE: Nutrition agent parse failed for userId={user_id}")
@@ -175,6 +185,8 @@ def nutrition_agent(user_id):
             'generation_time_seconds': round(elapsed, 2)
         }), 200
 
+    except (SchedulerFullError, DeadlineExceededError, UpstreamUnavailableError):
+        raise  # Rendered as 429 / 504 / 503 by the app error handlers
     except Exception as e:
         ai_logger.error(f"AI_INFERENCE: Nutrition agent error for userId={user_id}: {e}", exc_info=True)
         return jsonify(format_error_response(e, 'nutrition agent')), 500
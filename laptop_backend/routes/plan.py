@@ -3,26 +3,43 @@ AI-Enhanced Plan Management Blueprint
 Uses Gemini LLM for intelligent plan generation
 """
 
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+import json
 import logging
 import time
 from dotenv import load_dotenv
 load_dotenv()
 
-from services.plan_service import create_plan, get_plan, update_plan, delete_plan
+from services.plan_service import create_plan, get_plan, update_plan, delete_plan, find_stored_week
 from services.health_service import get_health_data
 from services.nutrition_service import get_nutrition_data
-from ai import get_gemini_engine
-from ai.prompts import plan_prompts
-from ai.utils.model_utils import format_response, merge_user_context, format_error_response
+from services.plan_generation_service import (
+    build_plan_request, build_plan_context, apply_ai_plan, apply_mock_plan,
+    create_user_plan, run_plan_job
+)
+from services.job_queue import get_job_queue
+from ai import get_gemini_engine, SchedulerFullError, DeadlineExceededError, UpstreamUnavailableError, with_deadline
+from ai.inference.deadline import deadline
+from ai.prompts import plan_prompts, schemas
+from ai.inference.metrics import output_metrics
+from ai.utils.plan_validation import (
+    PlanValidationError, normalize_exercises, normalize_meal, normalize_plan
+)
+from ai.utils.model_utils import (
+    format_response, merge_user_context, format_error_response, StreamingJSONParser
+)
 
 logger = logging.getLogger(__name__)
 ai_logger = logging.getLogger('ai')
 
 plan_bp = Blueprint('plan', __name__, url_prefix='/users')
 
+PLAN_JOB = 'plan_generation'
+get_job_queue().register(PLAN_JOB, run_plan_job)
+
 
 @plan_bp.route('/<user_id>/plan', methods=['POST'])
+@with_deadline(45)
 def create_user_plan_ai(user_id):
     """
     Create a new diet/workout plan using Gemini LLM.
@@ -30,115 +47,142 @@ def create_user_plan_ai(user_id):
     Request Body:
         {
             "plan_type": "combined",  // "diet", "workout", or "combined"
-            "duration_weeks": 2,      // Keep low (1-2) for faster AI generation
+            "duration_weeks": 2,      // Up to 12; weeks are generated in parallel
             "intensity": "moderate",
             "specific_goals": ["goal1", "goal2"],
-            "use_ai": true  // Set to false to use mock data (faster)
+            "use_ai": true,  // Set to false to use mock data (faster)
+            "async": false   // Set to true to generate in the background (202 + job id)
         }
     """
     data = request.get_json(silent=True) or {}
 
-    plan_type = data.get('plan_type', 'combined')
-    if plan_type not in ['diet', 'workout', 'combined']:
-        return jsonify({'error': 'Invalid plan_type'}), 400
+    if data.get('async'):
+        try:
+            build_plan_request(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
 
-    use_ai = data.get('use_ai', True)
-    duration_weeks = min(data.get('duration_weeks', 2), 4)  # Cap at 4 weeks for performance
+        job_id = get_job_queue().submit(PLAN_JOB, user_id, {'request': data})
+        status_url = f"/users/{user_id}/plan/jobs/{job_id}"
+        return jsonify({
+            'job_id': job_id,
+            'status': 'queued',
+            'status_url': status_url
+        }), 202, {'Location': status_url}
+
+    result, status = create_user_plan(user_id, data)
+    return jsonify(result), status
 
-    plan_data = {
-        'plan_type': plan_type,
-        'preferences': {
-            'duration_weeks': duration_weeks,
-            'intensity': data.get('intensity', 'moderate'),
-            'specific_goals': data.get('specific_goals', [])
-        }
-    }
 
-    if use_ai:
+@plan_bp.route('/<user_id>/plan/jobs/<job_id>', methods=['GET'])
+def get_plan_job(user_id, job_id):
+    """
+    Get the status of a background plan generation job.
+
+    status is one of queued, running, succeeded, failed. result (the body
+    POST /users/<user_id>/plan would have returned) is set once succeeded;
+    error is set once failed.
+    """
+    job = get_job_queue().get(job_id)
+    if job is None or job['user_id'] != user_id:
+        return jsonify({'error': 'Job not found'}), 404
+
+    return jsonify({
+        'job_id': job['id'],
+        'status': job['status'],
+        'attempts': job['attempts'],
+        'created_at': job['created_at'],
+        'started_at': job['started_at'],
+        'finished_at': job['finished_at'],
+        'result': job['result'],
+        'error': job['error']
+    }), 200
+
+
+@plan_bp.route('/<user_id>/plan/stream', methods=['POST'])
+def stream_user_plan_ai(user_id):
+    """
+    Create a new diet/workout plan using Gemini, streamed as Server-Sent Events.
+
+    Request Body: same as POST /users/<user_id>/plan (use_ai and async are
+    ignored, duration_weeks is capped at 4).
+
+    Events:
+        diet_week     - a diet week, sent as soon as it is parseable
+        workout_week  - a workout week, sent as soon as it is parseable
+        complete      - the saved plan (same body as POST /users/<user_id>/plan);
+                        authoritative if the AI output had to fall back to mock data
+        error         - the plan could not be saved
+    """
+    data = request.get_json(silent=True) or {}
+
+    try:
+        # One streamed prompt covers the whole plan, so keep it short
+        plan_type, duration_weeks, plan_data = build_plan_request(dict(data, use_ai=True), max_weeks=4)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    def event_stream():
+        ai_logger.info(f"AI_USAGE: Initiating streaming AI plan generation - userId={user_id}, plan_type={plan_type}, weeks={duration_weeks}")
+        start_time = time.time()
+        parser = StreamingJSONParser(array_keys=['diet', 'workouts'])
+        events = {'diet': 'diet_week', 'workouts': 'workout_week'}
+        streamed_weeks = 0
+
         try:
-            ai_logger.info(f"AI_USAGE: Initiating AI plan generation - userId={user_id}, plan_type={plan_type}, weeks={duration_weeks}")
-            start_time = time.time()
-
-            # Get Gemini engine instance
-            ai_engine = get_gemini_engine()
-
-            # Fetch user context
-            health_response, health_status = get_health_data(user_id)
-            nutrition_response, nutrition_status = get_nutrition_data(user_id)
-
-            if health_status != 200 or nutrition_status != 200:
-                ai_logger.warning(f"AI_USAGE: Incomplete user data for userId={user_id}, using available data")
-
-            user_context = merge_user_context(
-                health_response.get('profile', {}),
-                nutrition_response.get('nutrition', {}),
-                plan_data
-            )
-
-            # Generate prompt
-            prompt = plan_prompts.generate_plan_prompt(user_context, plan_type)
-
-            ai_logger.info(f"AI_INFERENCE: Starting inference for userId={user_id}, plan_type={plan_type}")
-
-            # Generate plan using Gemini
-            raw_output = ai_engine.generate(
-                prompt=prompt,
-                max_new_tokens=1000,  # Reduced for faster response
-                temperature=0.7,
-                use_cache=True
-            )
-
-            # Parse and format response
-            formatted = format_response(raw_output, expected_format="json")
-
-            if not formatted['success']:
-                ai_logger.warning(f"AI_INFERENCE: Failed to parse AI response for userId={user_id}, falling back to mock data")
-                # Fallback to mock data if AI output is invalid
-                if plan_type in ['diet', 'combined']:
-                    plan_data['diet'] = generate_mock_diet_plan(duration_weeks)
-                if plan_type in ['workout', 'combined']:
-                    plan_data['workouts'] = generate_mock_workout_plan(duration_weeks)
-                plan_data['ai_generated'] = False
-                plan_data['fallback_reason'] = 'AI output parsing failed'
-            else:
-                ai_plan = formatted['data']
-                elapsed_time = time.time() - start_time
-
-                # Extract diet and workout plans
-                if 'diet' in ai_plan:
-                    plan_data['diet'] = ai_plan['diet']
-                if 'workouts' in ai_plan:
-                    plan_data['workouts'] = ai_plan['workouts']
-
-                # Add AI metadata
-                plan_data['ai_generated'] = True
-                plan_data['generation_method'] = 'gemini'
-                plan_data['generation_time'] = f"{elapsed_time:.2f}s"
-
-                ai_logger.info(f"AI_INFERENCE: Inference completed successfully for userId={user_id}, elapsed_time={elapsed_time:.2f}s")
+            # The stream runs after the view returns, so the deadline is set here
+            with deadline(90):
+                ai_engine = get_gemini_engine()
+                user_context = build_plan_context(user_id, plan_data)
+                prompt = plan_prompts.generate_plan_prompt(user_context, plan_type)
+
+                for chunk in ai_engine.generate_stream(
+                    prompt=prompt,
+                    max_new_tokens=1000,
+                    temperature=0.7,
+                    use_cache=True,
+                    prompt_family='plan',
+                    priority='bulk',
+                    response_schema=schemas.PLAN,
+                    cache_key_inputs=plan_prompts.generate_plan_key(user_context, plan_type)
+                ):
+                    for key, week in parser.feed(chunk):
+                        if streamed_weeks == 0:
+                            ai_logger.info(f"AI_INFERENCE: First plan week streamed for userId={user_id}, elapsed_time={time.time() - start_time:.2f}s")
+                        streamed_weeks += 1
+                        yield _sse(events[key], week)
+
+                formatted = format_response(parser.text, expected_format="json", prompt_family="plan")
+                if not formatted['success']:
+                    ai_logger.warning(f"AI_INFERENCE: Failed to parse streamed AI response for userId={user_id}, falling back to mock data")
+                    output_metrics.record_fallback('plan')
+                    apply_mock_plan(plan_data, plan_type, duration_weeks, 'AI output parsing failed')
+                else:
+                    elapsed_time = time.time() - start_time
+                    ai_plan, errors = normalize_plan(formatted['data'])
+                    if errors:
+                        ai_logger.warning(f"AI_INFERENCE: Dropped {len(errors)} invalid streamed weeks for userId={user_id}: {errors}")
+                    apply_ai_plan(plan_data, ai_plan, elapsed_time)
+                    ai_logger.info(f"AI_INFERENCE: Streaming inference completed for userId={user_id}, elapsed_time={elapsed_time:.2f}s")
 
         except Exception as e:
-            ai_logger.error(f"AI_INFERENCE: AI generation error for userId={user_id}: {e}, falling back to mock data")
-            # Fallback to mock data on any error (including timeout)
-            if plan_type in ['diet', 'combined']:
-                plan_data['diet'] = generate_mock_diet_plan(duration_weeks)
-            if plan_type in ['workout', 'combined']:
-                plan_data['workouts'] = generate_mock_workout_plan(duration_weeks)
-            plan_data['ai_generated'] = False
-            plan_data['fallback_reason'] = str(e)
-    else:
-        ai_logger.info(f"AI_NON_USAGE: Mock data used instead of AI for userId={user_id}, plan_type={plan_type}")
-        # Fallback to mock data
-        duration_weeks = data.get('duration_weeks', 4)
-        if plan_type in ['diet', 'combined']:
-            plan_data['diet'] = generate_mock_diet_plan(duration_weeks)
-        if plan_type in ['workout', 'combined']:
-            plan_data['workouts'] = generate_mock_workout_plan(duration_weeks)
-        plan_data['ai_generated'] = False
-
-    # Save plan to database
-    result, status = create_plan(user_id, plan_data)
-    return jsonify(result), status
+            ai_logger.error(f"AI_INFERENCE: Streaming AI generation error for userId={user_id}: {e}, falling back to mock data")
+            output_metrics.record_fallback('plan', error=True)
+            apply_mock_plan(plan_data, plan_type, duration_weeks, str(e))
+
+        result, status = create_plan(user_id, plan_data)
+        yield _sse('complete' if status == 201 else 'error', result)
+
+    return Response(
+        stream_with_context(event_stream()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+def _sse(event, data):
+    """Format one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
 
 @plan_bp.route('/<user_id>/plan', methods=['GET'])
@@ -156,6 +200,7 @@ def delete_user_plan(user_id):
 
 
 @plan_bp.route('/<user_id>/plan/validate', methods=['POST'])
+@with_deadline(20)
 def validate_user_plan(user_id):
     """
     Validate and analyze an existing plan using AI.
@@ -192,10 +237,12 @@ def validate_user_plan(user_id):
             prompt=prompt,
             max_new_tokens=800,
             temperature=0.5,  # Lower temp for more consistent analysis
-            use_cache=True
+            use_cache=True,
+            prompt_family='plan_validation',
+            response_schema=schemas.PLAN_VALIDATION
         )
 
-        formatted = format_response(raw_output, expected_format="json")
+        formatted = format_response(raw_output, expected_format="json", prompt_family="plan_validation")
 
         if not formatted['success']:
             ai_logger.error(f"AI_INFERENCE: Plan validation analysis failed for userId={user_id}")
@@ -212,12 +259,15 @@ def validate_user_plan(user_id):
             'timestamp': 'now'
         }), 200
 
+    except (SchedulerFullError, DeadlineExceededError, UpstreamUnavailableError):
+        raise  # Rendered as 429 / 504 / 503 by the app error handlers
     except Exception as e:
         ai_logger.error(f"AI_INFERENCE: Plan validation error for userId={user_id}: {e}", exc_info=True)
         return jsonify(format_error_response(e, "plan validation")), 500
 
 
 @plan_bp.route('/<user_id>/plan/adjust', methods=['PUT'])
+@with_deadline(30)
 def adjust_user_plan(user_id):
     """
     Adjust existing plan based on user feedback using AI.
@@ -258,10 +308,12 @@ def adjust_user_plan(user_id):
             prompt=prompt,
             max_new_tokens=1500,
             temperature=0.7,
-            use_cache=False  # Don't cache adjustments
+            use_cache=False,  # Don't cache adjustments
+            prompt_family='plan_adjustment',
+            response_schema=schemas.PLAN
         )
 
-        formatted = format_response(raw_output, expected_format="json")
+        formatted = format_response(raw_output, expected_format="json", prompt_family="plan_adjustment")
 
         if not formatted['success']:
             ai_logger.error(f"AI_INFERENCE: Plan adjustment failed for userId={user_id}")
@@ -270,7 +322,15 @@ def adjust_user_plan(user_id):
                 'details': formatted['error']
             }), 500
 
-        adjusted_plan = formatted['data']
+        # Normalize only the sections the AI returned, so the other is left as stored
+        adjusted_sections = [section for section in ('diet', 'workouts') if section in formatted['data']]
+        normalized, errors = normalize_plan(formatted['data'])
+        if errors:
+            ai_logger.error(f"AI_INFERENCE: Invalid adjusted plan for userId={user_id}: {errors}")
+            return jsonify({'error': 'Adjustment failed', 'details': errors}), 500
+        adjusted_plan = {section: normalized[section] for section in adjusted_sections}
+        if 'status' in formatted['data']:
+            adjusted_plan['status'] = formatted['data']['status']
         elapsed_time = time.time() - start_time
         ai_logger.info(f"AI_INFERENCE: Plan adjustment completed for userId={user_id}, elapsed_time={elapsed_time:.2f}s")
 
@@ -278,12 +338,15 @@ def adjust_user_plan(user_id):
         result, status = update_plan(user_id, adjusted_plan)
         return jsonify(result), status
 
+    except (SchedulerFullError, DeadlineExceededError, UpstreamUnavailableError):
+        raise  # Rendered as 429 / 504 / 503 by the app error handlers
     except Exception as e:
         ai_logger.error(f"AI_INFERENCE: Plan adjustment error for userId={user_id}: {e}", exc_info=True)
         return jsonify(format_error_response(e, "plan adjustment")), 500
 
 
 @plan_bp.route('/<user_id>/plan/workout/adjust', methods=['PUT'])
+@with_deadline(20)
 def adjust_workout_plan(user_id):
     """
     Adjust workout plan for current week when user skips exercises.
@@ -318,23 +381,17 @@ def adjust_workout_plan(user_id):
             ai_logger.warning(f"AI_INFERENCE: No plan found for adjustment - userId={user_id}")
             return jsonify({'error': 'No plan found'}), 404
 
-        current_plan = plan_response.get('plan', {})
-        workouts = current_plan.get('workouts', [])
-
         # Find current week (support both 'week' and 'weekName' keys)
-        current_week = None
-        for week in workouts:
-            if week.get('week') == week_name or week.get('weekName') == week_name:
-                current_week = week
-                break
-
-        if not current_week:
+        current_week = find_stored_week(plan_response['plan'].get('workouts', []), week_name)
+        if current_week is None:
             ai_logger.warning(f"AI_INFERENCE: Week {week_name} not found - userId={user_id}")
             return jsonify({'error': f'Week {week_name} not found'}), 404
 
         # Get remaining exercises (not yet completed)
-        all_exercises = current_week.get('exercises', [])
-        remaining_exercises = [ex for ex in all_exercises if not ex.get('completed', False)]
+        all_exercises = current_week.get('exercises') or []
+        remaining_exercises = [
+            ex for ex in all_exercises if isinstance(ex, dict) and not ex.get('completed', False)
+        ]
 
         if not remaining_exercises:
             ai_logger.info(f"AI_INFERENCE: No remaining exercises for week {week_name} - userId={user_id}")
@@ -359,10 +416,12 @@ def adjust_workout_plan(user_id):
             prompt=prompt,
             max_new_tokens=800,
             temperature=0.7,
-            use_cache=False  # Don't cache adjustments
+            use_cache=False,  # Don't cache adjustments
+            prompt_family='workout_adjustment',
+            response_schema=schemas.WORKOUT_ADJUSTMENT
         )
 
-        formatted = format_response(raw_output, expected_format="json")
+        formatted = format_response(raw_output, expected_format="json", prompt_family="workout_adjustment", repair=True)
 
         if not formatted['success']:
             ai_logger.error(f"AI_INFERENCE: Workout adjustment failed for userId={user_id}")
@@ -372,7 +431,11 @@ def adjust_workout_plan(user_id):
             }), 500
 
         adjusted_data = formatted['data']
-        adjusted_exercises = adjusted_data.get('exercises', [])
+        try:
+            adjusted_exercises = normalize_exercises(adjusted_data.get('exercises', []))
+        except PlanValidationError as e:
+            ai_logger.error(f"AI_INFERENCE: Invalid exercises returned from AI - userId={user_id}: {e}")
+            adjusted_exercises = []
 
         if not adjusted_exercises:
             ai_logger.error(f"AI_INFERENCE: No exercises returned from AI - userId={user_id}")
@@ -395,12 +458,15 @@ def adjust_workout_plan(user_id):
         else:
             return jsonify(result), status
 
+    except (SchedulerFullError, DeadlineExceededError, UpstreamUnavailableError):
+        raise  # Rendered as 429 / 504 / 503 by the app error handlers
     except Exception as e:
         ai_logger.error(f"AI_INFERENCE: Workout adjustment error for userId={user_id}: {e}", exc_info=True)
         return jsonify(format_error_response(e, "workout adjustment")), 500
 
 
 @plan_bp.route('/<user_id>/plan/nutrition/adjust', methods=['PUT'])
+@with_deadline(20)
 def adjust_nutrition_plan(user_id):
     """
     Adjust nutrition plan for current week when user eats extra calories.
@@ -440,17 +506,9 @@ def adjust_nutrition_plan(user_id):
             ai_logger.warning(f"AI_INFERENCE: No plan found for adjustment - userId={user_id}")
             return jsonify({'error': 'No plan found'}), 404
 
-        current_plan = plan_response.get('plan', {})
-        diet = current_plan.get('diet', [])
-
         # Find current week (support both 'week' and 'weekName' keys)
-        current_week = None
-        for week in diet:
-            if week.get('week') == week_name or week.get('weekName') == week_name:
-                current_week = week
-                break
-
-        if not current_week:
+        current_week = find_stored_week(plan_response['plan'].get('diet', []), week_name)
+        if current_week is None:
             ai_logger.warning(f"AI_INFERENCE: Week {week_name} not found - userId={user_id}")
             return jsonify({'error': f'Week {week_name} not found'}), 404
 
@@ -487,10 +545,12 @@ def adjust_nutrition_plan(user_id):
             prompt=prompt,
             max_new_tokens=1000,
             temperature=0.7,
-            use_cache=False  # Don't cache adjustments
+            use_cache=False,  # Don't cache adjustments
+            prompt_family='nutrition_adjustment',
+            response_schema=schemas.NUTRITION_ADJUSTMENT
         )
 
-        formatted = format_response(raw_output, expected_format="json")
+        formatted = format_response(raw_output, expected_format="json", prompt_family="nutrition_adjustment", repair=True)
 
         if not formatted['success']:
             ai_logger.error(f"AI_INFERENCE: Nutrition adjustment failed for userId={user_id}")
@@ -501,6 +561,14 @@ def adjust_nutrition_plan(user_id):
 
         adjusted_data = formatted['data']
         adjusted_meals = adjusted_data.get('adjusted_meals', {})
+        if isinstance(adjusted_meals, dict):
+            adjusted_meals = {
+                meal: normalize_meal(value, f"adjusted_meals.{meal}")
+                for meal, value in adjusted_meals.items()
+                if isinstance(value, (dict, str))
+            }
+        else:
+            adjusted_meals = {}
 
         if not adjusted_meals:
             ai_logger.error(f"AI_INFERENCE: No meals returned from AI - userId={user_id}")
@@ -527,177 +595,8 @@ def adjust_nutrition_plan(user_id):
         else:
             return jsonify(result), status
 
+    except (SchedulerFullError, DeadlineExceededError, UpstreamUnavailableError):
+        raise  # Rendered as 429 / 504 / 503 by the app error handlers
     except Exception as e:
         ai_logger.error(f"AI_INFERENCE: Nutrition adjustment error for userId={user_id}: {e}", exc_info=True)
         return jsonify(format_error_response(e, "nutrition adjustment")), 500
-
-
-# Fallback mock functions (for non-AI mode)
-def generate_mock_diet_plan(weeks=4):
-    """Mock diet plan generator matching Nutrition Architect format."""
-    diet_plans = [
-        {
-            'week': 'Week 1',
-            'breakfast': {
-                'dishName': 'Oatmeal with Fresh Berries and Almonds',
-                'calories': '350',
-                'carbs': '52g',
-                'fats': '10g',
-                'protein': '12g',
-                'completed': False
-            },
-            'lunch': {
-                'dishName': 'Grilled Chicken Caesar Salad',
-                'calories': '450',
-                'carbs': '20g',
-                'fats': '22g',
-                'protein': '42g',
-                'completed': False
-            },
-            'dinner': {
-                'dishName': 'Baked Salmon with Roasted Vegetables',
-                'calories': '520',
-                'carbs': '28g',
-                'fats': '24g',
-                'protein': '45g',
-                'completed': False
-            }
-        },
-        {
-            'week': 'Week 2',
-            'breakfast': {
-                'dishName': 'Greek Yogurt Parfait with Granola and Honey',
-                'calories': '380',
-                'carbs': '48g',
-                'fats': '12g',
-                'protein': '20g',
-                'completed': False
-            },
-            'lunch': {
-                'dishName': 'Quinoa Buddha Bowl with Chickpeas',
-                'calories': '480',
-                'carbs': '58g',
-                'fats': '16g',
-                'protein': '22g',
-                'completed': False
-            },
-            'dinner': {
-                'dishName': 'Turkey Stir-Fry with Brown Rice',
-                'calories': '490',
-                'carbs': '45g',
-                'fats': '14g',
-                'protein': '48g',
-                'completed': False
-            }
-        },
-        {
-            'week': 'Week 3',
-            'breakfast': {
-                'dishName': 'Veggie Omelette with Whole Wheat Toast',
-                'calories': '420',
-                'carbs': '32g',
-                'fats': '22g',
-                'protein': '28g',
-                'completed': False
-            },
-            'lunch': {
-                'dishName': 'Mediterranean Wrap with Hummus',
-                'calories': '440',
-                'carbs': '42g',
-                'fats': '18g',
-                'protein': '24g',
-                'completed': False
-            },
-            'dinner': {
-                'dishName': 'Grilled Chicken with Sweet Potato',
-                'calories': '510',
-                'carbs': '38g',
-                'fats': '12g',
-                'protein': '52g',
-                'completed': False
-            }
-        },
-        {
-            'week': 'Week 4',
-            'breakfast': {
-                'dishName': 'Protein Smoothie Bowl with Banana',
-                'calories': '360',
-                'carbs': '45g',
-                'fats': '8g',
-                'protein': '25g',
-                'completed': False
-            },
-            'lunch': {
-                'dishName': 'Tuna Poke Bowl with Edamame',
-                'calories': '470',
-                'carbs': '40g',
-                'fats': '16g',
-                'protein': '38g',
-                'completed': False
-            },
-            'dinner': {
-                'dishName': 'Beef and Vegetable Stew with Quinoa',
-                'calories': '530',
-                'carbs': '42g',
-                'fats': '18g',
-                'protein': '46g',
-                'completed': False
-            }
-        }
-    ]
-    return diet_plans[:weeks]
-
-
-def generate_mock_workout_plan(weeks=4):
-    """Mock workout plan generator matching frontend format."""
-    workout_plans = [
-        {
-            'week': 'Week 1',
-            'workoutName': 'Full Body Foundation',
-            'completed': False,
-            'exercises': [
-                {'name': 'Push-ups', 'sets': '3', 'reps': '12', 'completed': False},
-                {'name': 'Bodyweight Squats', 'sets': '3', 'reps': '15', 'completed': False},
-                {'name': 'Plank Hold', 'sets': '3', 'reps': '30 sec', 'completed': False},
-                {'name': 'Lunges', 'sets': '3', 'reps': '10 each', 'completed': False},
-                {'name': 'Mountain Climbers', 'sets': '3', 'reps': '20', 'completed': False}
-            ]
-        },
-        {
-            'week': 'Week 2',
-            'workoutName': 'Upper Body Strength',
-            'completed': False,
-            'exercises': [
-                {'name': 'Diamond Push-ups', 'sets': '3', 'reps': '10', 'completed': False},
-                {'name': 'Pike Push-ups', 'sets': '3', 'reps': '8', 'completed': False},
-                {'name': 'Tricep Dips', 'sets': '3', 'reps': '12', 'completed': False},
-                {'name': 'Superman Hold', 'sets': '3', 'reps': '20 sec', 'completed': False},
-                {'name': 'Arm Circles', 'sets': '3', 'reps': '30 sec', 'completed': False}
-            ]
-        },
-        {
-            'week': 'Week 3',
-            'workoutName': 'Lower Body Power',
-            'completed': False,
-            'exercises': [
-                {'name': 'Jump Squats', 'sets': '4', 'reps': '12', 'completed': False},
-                {'name': 'Walking Lunges', 'sets': '3', 'reps': '20', 'completed': False},
-                {'name': 'Glute Bridges', 'sets': '3', 'reps': '15', 'completed': False},
-                {'name': 'Calf Raises', 'sets': '3', 'reps': '20', 'completed': False},
-                {'name': 'Wall Sit', 'sets': '3', 'reps': '45 sec', 'completed': False}
-            ]
-        },
-        {
-            'week': 'Week 4',
-            'workoutName': 'Core & Cardio Blast',
-            'completed': False,
-            'exercises': [
-                {'name': 'Burpees', 'sets': '3', 'reps': '10', 'completed': False},
-                {'name': 'Bicycle Crunches', 'sets': '3', 'reps': '20', 'completed': False},
-                {'name': 'High Knees', 'sets': '3', 'reps': '30 sec', 'completed': False},
-                {'name': 'Russian Twists', 'sets': '3', 'reps': '20', 'completed': False},
-                {'name': 'Plank to Push-up', 'sets': '3', 'reps': '10', 'completed': False}
-            ]
-        }
-    ]
-    return workout_plans[:weeks]
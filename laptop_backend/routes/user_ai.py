@@ -13,8 +13,12 @@ from services.health_service import (
 from services.nutrition_service import (
     post_nutrition_data, get_nutrition_data, update_nutrition_data, delete_nutrition_data
 )
-from ai import get_gemini_engine
-from ai.prompts import health_prompts, nutrition_prompts
+from services.analysis_service import (
+    health_analysis_request, nutrition_analysis_request, nutrition_analysis_version
+)
+from ai import get_gemini_engine, SchedulerFullError, DeadlineExceededError, UpstreamUnavailableError, with_deadline
+from ai.inference import cache_namespace
+from ai.prompts import health_prompts, nutrition_prompts, schemas
 from ai.utils.model_utils import format_response, format_error_response
 
 logger = logging.getLogger(__name__)
@@ -23,11 +27,22 @@ ai_logger = logging.getLogger('ai')
 user_ai_bp = Blueprint('user_ai', __name__, url_prefix='/users')
 
 
+def _health_analysis_is_valid(raw_output):
+    """Whether a background refresh produced a usable health analysis."""
+    return format_response(raw_output, expected_format="json", prompt_family="health_analysis")['success']
+
+
+def _nutrition_analysis_is_valid(raw_output):
+    """Whether a background refresh produced a usable nutrition analysis."""
+    return format_response(raw_output, expected_format="json", prompt_family="nutrition_analysis")['success']
+
+
 # ============================================================================
 # AI-Enhanced Health Profile Endpoints
 # ============================================================================
 
 @user_ai_bp.route('/<user_id>/health', methods=['PUT'])
+@with_deadline(15)
 def update_health_profile_ai(user_id):
     """
     Update health profile with AI-powered insights and recommendations.
@@ -79,10 +94,14 @@ def update_health_profile_ai(user_id):
                 prompt=prompt,
                 max_new_tokens=800,
                 temperature=0.6,
-                use_cache=True
+                use_cache=True,
+                prompt_family='health_analysis',
+                response_schema=schemas.HEALTH_ANALYSIS,
+                cache_key_inputs=health_prompts.analyze_health_metrics_key(health_data),
+                cache_namespace=cache_namespace('health_analysis', user_id, health_response.get('profile_version', 0))
             )
 
-            formatted = format_response(raw_output, expected_format="json")
+            formatted = format_response(raw_output, expected_format="json", prompt_family="health_analysis")
 
             if formatted['success']:
                 result['ai_insights'] = formatted['data']
@@ -100,6 +119,7 @@ def update_health_profile_ai(user_id):
             result['ai_insights'] = {
                 'error': str(e)
             }
+            result['degraded'] = True
     else:
         ai_logger.info(f"AI_NON_USAGE: Health insights not requested for userId={user_id}")
 
@@ -107,6 +127,7 @@ def update_health_profile_ai(user_id):
 
 
 @user_ai_bp.route('/<user_id>/health/analyze', methods=['GET'])
+@with_deadline(20)
 def analyze_health_metrics(user_id):
     """
     Get comprehensive AI analysis of health metrics.
@@ -120,21 +141,15 @@ def analyze_health_metrics(user_id):
             ai_logger.warning(f"AI_INFERENCE: Health profile not found for userId={user_id}")
             return jsonify({'error': 'Health profile not found'}), 404
 
-        health_data = health_response.get('profile', {})
-
-        # Generate prompt
-        prompt = health_prompts.analyze_health_metrics_prompt(health_data)
-
         # Get AI analysis
         ai_engine = get_gemini_engine()
-        raw_output = ai_engine.generate(
-            prompt=prompt,
-            max_new_tokens=1000,
-            temperature=0.5,
-            use_cache=True
+        # Serve the last analysis immediately, refreshing it in the background once stale
+        raw_output, age = ai_engine.generate_swr(
+            **health_analysis_request(user_id, health_response),
+            validate=_health_analysis_is_valid
         )
 
-        formatted = format_response(raw_output, expected_format="json")
+        formatted = format_response(raw_output, expected_format="json", prompt_family="health_analysis")
 
         if not formatted['success']:
             ai_logger.error(f"AI_INFERENCE: Health analysis failed for userId={user_id}")
@@ -148,9 +163,12 @@ def analyze_health_metrics(user_id):
 
         return jsonify({
             'analysis': formatted['data'],
-            'user_id': user_id
+            'user_id': user_id,
+            'age': int(age)
         }), 200
 
+    except (SchedulerFullError, DeadlineExceededError, UpstreamUnavailableError):
+        raise  # Rendered as 429 / 504 / 503 by the app error handlers
     except Exception as e:
         ai_logger.error(f"AI_INFERENCE: Health analysis error for userId={user_id}: {e}", exc_info=True)
         return jsonify(format_error_response(e, "health analysis")), 500
@@ -161,6 +179,7 @@ def analyze_health_metrics(user_id):
 # ============================================================================
 
 @user_ai_bp.route('/<user_id>/nutrition', methods=['PUT'])
+@with_deadline(15)
 def update_nutrition_profile_ai(user_id):
     """
     Update nutrition profile with AI recommendations.
@@ -208,10 +227,14 @@ def update_nutrition_profile_ai(user_id):
                 prompt=prompt,
                 max_new_tokens=1000,
                 temperature=0.6,
-                use_cache=True
+                use_cache=True,
+                prompt_family='nutrition_analysis',
+                response_schema=schemas.NUTRITION_ANALYSIS,
+                cache_key_inputs=nutrition_prompts.analyze_nutrition_profile_key(nutrition_data, health_data),
+                cache_namespace=cache_namespace('nutrition_analysis', user_id, nutrition_analysis_version(health_response, nutrition_response))
             )
 
-            formatted = format_response(raw_output, expected_format="json")
+            formatted = format_response(raw_output, expected_format="json", prompt_family="nutrition_analysis")
 
             if formatted['success']:
                 result['ai_recommendations'] = formatted['data']
@@ -229,6 +252,7 @@ def update_nutrition_profile_ai(user_id):
             result['ai_recommendations'] = {
                 'error': str(e)
             }
+            result['degraded'] = True
     else:
         ai_logger.info(f"AI_NON_USAGE: Nutrition recommendations not requested for userId={user_id}")
 
@@ -236,6 +260,7 @@ def update_nutrition_profile_ai(user_id):
 
 
 @user_ai_bp.route('/<user_id>/nutrition/analyze', methods=['GET'])
+@with_deadline(20)
 def analyze_nutrition_profile(user_id):
     """
     Get comprehensive AI analysis of nutrition profile.
@@ -251,25 +276,18 @@ def analyze_nutrition_profile(user_id):
             ai_logger.warning(f"AI_INFERENCE: Nutrition profile not found for userId={user_id}")
             return jsonify({'error': 'Nutrition profile not found'}), 404
 
-        nutrition_data = nutrition_response.get('nutrition', {})
-        health_data = health_response.get('profile', {}) if health_status == 200 else {}
-
-        # Generate prompt
-        prompt = nutrition_prompts.analyze_nutrition_profile_prompt(
-            nutrition_data,
-            health_data
-        )
+        if health_status != 200:
+            health_response = {}
 
         # Get AI analysis
         ai_engine = get_gemini_engine()
-        raw_output = ai_engine.generate(
-            prompt=prompt,
-            max_new_tokens=1200,
-            temperature=0.5,
-            use_cache=True
+        # Serve the last analysis immediately, refreshing it in the background once stale
+        raw_output, age = ai_engine.generate_swr(
+            **nutrition_analysis_request(user_id, nutrition_response, health_response),
+            validate=_nutrition_analysis_is_valid
         )
 
-        formatted = format_response(raw_output, expected_format="json")
+        formatted = format_response(raw_output, expected_format="json", prompt_family="nutrition_analysis")
 
         if not formatted['success']:
             ai_logger.error(f"AI_INFERENCE: Nutrition analysis failed for userId={user_id}")
@@ -283,15 +301,19 @@ def analyze_nutrition_profile(user_id):
 
         return jsonify({
             'analysis': formatted['data'],
-            'user_id': user_id
+            'user_id': user_id,
+            'age': int(age)
         }), 200
 
+    except (SchedulerFullError, DeadlineExceededError, UpstreamUnavailableError):
+        raise  # Rendered as 429 / 504 / 503 by the app error handlers
     except Exception as e:
         ai_logger.error(f"AI_INFERENCE: Nutrition analysis error for userId={user_id}: {e}", exc_info=True)
         return jsonify(format_error_response(e, "nutrition analysis")), 500
 
 
 @user_ai_bp.route('/<user_id>/nutrition/meal-suggestions', methods=['POST'])
+@with_deadline(15)
 def get_meal_suggestions(user_id):
     """
     Get AI-powered meal suggestions based on remaining macros.
@@ -340,10 +362,12 @@ def get_meal_suggestions(user_id):
             prompt=prompt,
             max_new_tokens=800,
             temperature=0.8,  # Higher temp for variety
-            use_cache=False  # Don't cache meal suggestions
+            use_cache=False,  # Don't cache meal suggestions
+            prompt_family='meal_suggestions',
+            response_schema=schemas.MEAL_SUGGESTIONS
         )
 
-        formatted = format_response(raw_output, expected_format="json")
+        formatted = format_response(raw_output, expected_format="json", prompt_family="meal_suggestions", repair=True)
 
         if not formatted['success']:
             ai_logger.error(f"AI_INFERENCE: Meal suggestions generation failed for userId={user_id}")
@@ -357,6 +381,8 @@ def get_meal_suggestions(user_id):
 
         return jsonify(formatted['data']), 200
 
+    except (SchedulerFullError, DeadlineExceededError, UpstreamUnavailableError):
+        raise  # Rendered as 429 / 504 / 503 by the app error handlers
     except Exception as e:
         ai_logger.error(f"AI_INFERENCE: Meal suggestions error for userId={user_id}: {e}", exc_info=True)
         return jsonify(format_error_response(e, "meal suggestions")), 500
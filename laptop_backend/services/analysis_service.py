@@ -0,0 +1,53 @@
+"""
+Analysis service - builds the Gemini requests behind the health and
+nutrition analyze endpoints.
+Shared by the routes and the precompute hook, so both hit the same cache entries.
+"""
+
+from ai.inference import cache_namespace
+from ai.prompts import health_prompts, nutrition_prompts, schemas
+
+
+def nutrition_analysis_version(health_response, nutrition_response):
+    """Cache namespace version for nutrition analyses, which read both profiles."""
+    return f"{health_response.get('profile_version', 0)}.{nutrition_response.get('nutrition_version', 0)}"
+
+
+def health_analysis_request(user_id, health_response):
+    """
+    generate() keyword arguments for a user's health analysis.
+
+    Args:
+        health_response: get_health_data() response
+    """
+    health_data = health_response.get('profile', {})
+    return {
+        'prompt': health_prompts.analyze_health_metrics_prompt(health_data),
+        'max_new_tokens': 1000,
+        'temperature': 0.5,
+        'prompt_family': 'health_analysis',
+        'response_schema': schemas.HEALTH_ANALYSIS,
+        'cache_key_inputs': health_prompts.analyze_health_metrics_key(health_data),
+        'cache_namespace': cache_namespace('health_analysis', user_id, health_response.get('profile_version', 0))
+    }
+
+
+def nutrition_analysis_request(user_id, nutrition_response, health_response):
+    """
+    generate() keyword arguments for a user's nutrition analysis.
+
+    Args:
+        nutrition_response: get_nutrition_data() response
+        health_response: get_health_data() response, or {} if there is no health profile
+    """
+    nutrition_data = nutrition_response.get('nutrition', {})
+    health_data = health_response.get('profile', {})
+    return {
+        'prompt': nutrition_prompts.analyze_nutrition_profile_prompt(nutrition_data, health_data),
+        'max_new_tokens': 1200,
+        'temperature': 0.5,
+        'prompt_family': 'nutrition_analysis',
+        'response_schema': schemas.NUTRITION_ANALYSIS,
+        'cache_key_inputs': nutrition_prompts.analyze_nutrition_profile_key(nutrition_data, health_data),
+        'cache_namespace': cache_namespace('nutrition_analysis', user_id, nutrition_analysis_version(health_response, nutrition_response))
+    }
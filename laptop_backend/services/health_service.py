@@ -5,9 +5,14 @@ Health service - handles user health profile data.
 import logging
 from google.cloud import firestore
 from extensions import db
+from ai.inference import invalidate_user_cache
+from services.precompute import schedule_precompute
 
 logger = logging.getLogger('database')
 
+# Cached AI responses that depend on the profile map
+PROFILE_CACHE_FAMILIES = ('health_analysis', 'nutrition_analysis')
+
 
 def post_health_data(user_id, data):
     """Create or overwrite the profile object on a user document."""
@@ -19,8 +24,10 @@ def post_health_data(user_id, data):
             logger.warning(f"DB_WRITE: User not found for health profile creation - userId={user_id}")
             return {"error": "User not found"}, 404
 
-        doc_ref.set({"profile": data}, merge=True)
+        doc_ref.set({"profile": data, "profileVersion": firestore.Increment(1)}, merge=True)
         logger.info(f"DB_WRITE: Health profile created successfully for userId={user_id}")
+        invalidate_user_cache(user_id, PROFILE_CACHE_FAMILIES)
+        schedule_precompute(user_id)
         return {"message": "Profile created successfully", "profile": data}, 201
     except Exception as e:
         logger.error(f"DB_WRITE: Failed to create health profile - userId={user_id}, error={str(e)}", exc_info=True)
@@ -44,7 +51,7 @@ def get_health_data(user_id):
             return {"error": "Health profile not found"}, 404
 
         logger.debug(f"DB_READ: Health profile retrieved successfully for userId={user_id}")
-        return {"profile": profile}, 200
+        return {"profile": profile, "profile_version": doc_data.get("profileVersion", 0)}, 200
     except Exception as e:
         logger.error(f"DB_READ: Failed to retrieve health profile - userId={user_id}, error={str(e)}", exc_info=True)
         return {"error": str(e)}, 500
@@ -61,8 +68,10 @@ def patch_health_data(user_id, data):
             return {"error": "User not found"}, 404
 
         update_fields = {f"profile.{key}": value for key, value in data.items()}
+        update_fields["profileVersion"] = firestore.Increment(1)
         doc_ref.update(update_fields)
         logger.info(f"DB_WRITE: Health profile updated successfully for userId={user_id}")
+        invalidate_user_cache(user_id, PROFILE_CACHE_FAMILIES)
         return {"message": "Profile updated successfully"}, 200
     except Exception as e:
         logger.error(f"DB_WRITE: Failed to update health profile - userId={user_id}, error={str(e)}", exc_info=True)
@@ -79,8 +88,9 @@ def delete_health_data(user_id):
             logger.warning(f"DB_WRITE: User not found for health profile deletion - userId={user_id}")
             return {"error": "User not found"}, 404
 
-        doc_ref.update({"profile": firestore.DELETE_FIELD})
+        doc_ref.update({"profile": firestore.DELETE_FIELD, "profileVersion": firestore.Increment(1)})
         logger.info(f"DB_WRITE: Health profile deleted successfully for userId={user_id}")
+        invalidate_user_cache(user_id, PROFILE_CACHE_FAMILIES)
         return {"message": "Profile deleted successfully"}, 200
     except Exception as e:
         logger.error(f"DB_WRITE: Failed to delete health profile - userId={user_id}, error={str(e)}", exc_info=True)
@@ -0,0 +1,469 @@
+"""
+Job queue service - runs long tasks (e.g. AI plan generation) in the background.
+
+Jobs are persisted in a job store and executed by a pool of worker threads.
+The SQLite store is shared by every gunicorn worker on the host, so any
+process can pick up, and report on, a job submitted by another. A running
+job holds a lease that its process renews every heartbeat interval; a job
+whose lease lapses (its process died) is put back in the queue, unless it has
+used up its attempts. Finished jobs are purged once past the retention period.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Optional, Set
+
+logger = logging.getLogger('jobs')
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+
+DEFAULT_JOB_DB_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'cache',
+    'jobs.sqlite3'
+)
+
+
+def _exhausted_error(attempts):
+    return f"Gave up after {attempts} attempts"
+
+
+class MemoryJobStore:
+    """In-process job store. Jobs are lost on restart and not shared across workers."""
+
+    def __init__(self):
+        self._jobs: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def create(self, kind, user_id, payload):
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._jobs[job_id] = {
+                'id': job_id, 'kind': kind, 'user_id': user_id, 'status': QUEUED,
+                'payload': payload, 'result': None, 'error': None, 'attempts': 0,
+                'created_at': now, 'run_after': now, 'started_at': None, 'finished_at': None,
+                'heartbeat_at': None,
+            }
+        return job_id
+
+    def claim_next(self, max_attempts=None):
+        now = time.time()
+        with self._lock:
+            queued = [j for j in self._jobs.values() if j['status'] == QUEUED and j['run_after'] <= now]
+            if max_attempts is not None:
+                for job in [j for j in queued if j['attempts'] >= max_attempts]:
+                    job.update(status=FAILED, error=_exhausted_error(job['attempts']), finished_at=now)
+                    queued.remove(job)
+            if not queued:
+                return None
+            job = min(queued, key=lambda j: j['created_at'])
+            job['status'] = RUNNING
+            job['started_at'] = now
+            job['heartbeat_at'] = now
+            job['attempts'] += 1
+            return dict(job)
+
+    def finish(self, job_id, status, result=None, error=None):
+        with self._lock:
+            job = self._jobs[job_id]
+            job.update(status=status, result=result, error=error, finished_at=time.time())
+
+    def requeue(self, job_id, delay, error=None, refund_attempt=False):
+        with self._lock:
+            job = self._jobs[job_id]
+            job.update(status=QUEUED, run_after=time.time() + delay, error=error)
+            if refund_attempt:
+                job['attempts'] -= 1
+
+    def heartbeat(self, job_ids):
+        now = time.time()
+        with self._lock:
+            for job_id in job_ids:
+                self._jobs[job_id]['heartbeat_at'] = now
+
+    def requeue_stale(self, stale_after, max_attempts=None):
+        # Jobs live and die with this process, so none can be orphaned
+        return 0, 0
+
+    def purge_finished(self, older_than):
+        cutoff = time.time() - older_than
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job['status'] in (SUCCEEDED, FAILED) and job['finished_at'] < cutoff
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+        return len(expired)
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+
+class SQLiteJobStore:
+    """Job store in a SQLite (WAL) file shared by all processes on the host."""
+
+    def __init__(self, path=DEFAULT_JOB_DB_PATH):
+        self.path = path
+        self._local = threading.local()
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = self._conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                user_id TEXT,
+                status TEXT NOT NULL,
+                payload TEXT,
+                result TEXT,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                run_after REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                heartbeat_at REAL
+            )
+        """)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+        if 'heartbeat_at' not in columns:
+            # Job files created before leases existed
+            conn.execute("ALTER TABLE jobs ADD COLUMN heartbeat_at REAL")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, run_after)")
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def create(self, kind, user_id, payload):
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        self._conn().execute(
+            "INSERT INTO jobs (id, kind, user_id, status, payload, created_at, run_after) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (job_id, kind, user_id, QUEUED, json.dumps(payload), now, now)
+        )
+        return job_id
+
+    def claim_next(self, max_attempts=None):
+        conn = self._conn()
+        now = time.time()
+        # IMMEDIATE takes the write lock up front so two workers can't claim the same job
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if max_attempts is not None:
+                self._fail_exhausted(conn, QUEUED, "run_after <= ?", now, max_attempts, now)
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE status = ? AND run_after <= ? "
+                "ORDER BY created_at LIMIT 1",
+                (QUEUED, now)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, started_at = ?, heartbeat_at = ?, attempts = attempts + 1 "
+                "WHERE id = ?",
+                (RUNNING, now, now, row['id'])
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return self.get(row['id'])
+
+    def finish(self, job_id, status, result=None, error=None):
+        self._conn().execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+            (status, json.dumps(result) if result is not None else None, error, time.time(), job_id)
+        )
+
+    def requeue(self, job_id, delay, error=None, refund_attempt=False):
+        self._conn().execute(
+            "UPDATE jobs SET status = ?, run_after = ?, error = ?, attempts = attempts - ? WHERE id = ?",
+            (QUEUED, time.time() + delay, error, 1 if refund_attempt else 0, job_id)
+        )
+
+    def heartbeat(self, job_ids):
+        """Renew the lease of jobs this process is running."""
+        now = time.time()
+        self._conn().executemany(
+            "UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND status = ?",
+            [(now, job_id, RUNNING) for job_id in job_ids]
+        )
+
+    def requeue_stale(self, stale_after, max_attempts=None):
+        """
+        Put back jobs left 'running' by a worker that died (no heartbeat for stale_after seconds).
+
+        Jobs that already used max_attempts are failed instead, so a job that
+        kills its worker is not retried forever. Returns (requeued, failed).
+        """
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            failed = 0
+            if max_attempts is not None:
+                failed = self._fail_exhausted(
+                    conn, RUNNING, "COALESCE(heartbeat_at, started_at) < ?", now - stale_after, max_attempts, now
+                )
+            requeued = conn.execute(
+                "UPDATE jobs SET status = ?, run_after = ? "
+                "WHERE status = ? AND COALESCE(heartbeat_at, started_at) < ?",
+                (QUEUED, now, RUNNING, now - stale_after)
+            ).rowcount
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return requeued, failed
+
+    def _fail_exhausted(self, conn, status, condition, value, max_attempts, now):
+        """Fail jobs in status matching condition that have no attempts left (the caller commits)."""
+        rows = conn.execute(
+            f"SELECT id, attempts FROM jobs WHERE status = ? AND {condition} AND attempts >= ?",
+            (status, value, max_attempts)
+        ).fetchall()
+        conn.executemany(
+            "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+            [(FAILED, _exhausted_error(row['attempts']), now, row['id']) for row in rows]
+        )
+        return len(rows)
+
+    def purge_finished(self, older_than):
+        """Delete succeeded and failed jobs that finished more than older_than seconds ago."""
+        return self._conn().execute(
+            "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+            (SUCCEEDED, FAILED, time.time() - older_than)
+        ).rowcount
+
+    def get(self, job_id):
+        row = self._conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job['payload'] = json.loads(job['payload']) if job['payload'] else None
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+
+
+class JobQueue:
+    """
+    Background job runner.
+
+    Handlers are registered per job kind and called as handler(user_id, payload);
+    their return value is stored as the job result. A handler exception with a
+    `retry_after` attribute (e.g. SchedulerFullError) requeues the job until
+    max_attempts is reached; any other exception fails it.
+
+    While a job runs, a heartbeat thread renews its lease every
+    heartbeat_interval seconds. Every stale_after seconds each process puts
+    back running jobs whose lease is older than stale_after, so a job is only
+    taken over once the process running it has stopped heartbeating. A job
+    that has already been claimed max_attempts times is failed instead, so a
+    job that crashes its worker cannot loop forever. The same sweep deletes
+    finished jobs older than `retention` seconds (0 keeps them forever).
+    """
+
+    def __init__(
+        self,
+        store,
+        workers=2,
+        max_attempts=3,
+        poll_interval=1.0,
+        stale_after=120,
+        heartbeat_interval=30,
+        retention=86400
+    ):
+        self.store = store
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self.heartbeat_interval = heartbeat_interval
+        self.retention = retention
+        if heartbeat_interval >= stale_after:
+            # Leases would lapse between heartbeats and live jobs would be taken over
+            self.heartbeat_interval = max(1, stale_after // 3)
+            logger.warning(
+                f"JOB_QUEUE: Heartbeat interval {heartbeat_interval}s is not below stale_after "
+                f"{stale_after}s, using {self.heartbeat_interval}s"
+            )
+
+        self._handlers: Dict[str, Callable] = {}
+        self._wakeup = threading.Event()
+        self._started = False
+        self._start_lock = threading.Lock()
+
+        # Jobs this process is running, whose leases the heartbeat renews
+        self._running: Set[str] = set()
+        self._running_lock = threading.Lock()
+        self._stale_lock = threading.Lock()
+        self._last_stale_check = 0.0
+
+    def register(self, kind: str, handler: Callable):
+        """Register the function that executes jobs of this kind."""
+        self._handlers[kind] = handler
+
+    def submit(self, kind: str, user_id: str, payload: Dict) -> str:
+        """Persist a new job and wake a worker. Returns the job id."""
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for job kind '{kind}'")
+        self.start()
+        job_id = self.store.create(kind, user_id, payload)
+        logger.info(f"JOB_QUEUE: Submitted {kind} job {job_id} for userId={user_id}")
+        self._wakeup.set()
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Return a job record, or None if it does not exist."""
+        return self.store.get(job_id)
+
+    def start(self):
+        """Start the worker and heartbeat threads (idempotent). Called at app start."""
+        with self._start_lock:
+            if self._started:
+                return
+            self._sweep()
+            for i in range(self.workers):
+                threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True).start()
+            threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True).start()
+            self._started = True
+            logger.info(f"JOB_QUEUE: Started {self.workers} workers")
+
+    def _sweep(self):
+        """Put back jobs whose lease lapsed and purge old finished jobs, at most once per stale_after seconds."""
+        with self._stale_lock:
+            now = time.monotonic()
+            if self._last_stale_check and now - self._last_stale_check < self.stale_after:
+                return
+            self._last_stale_check = now
+        try:
+            requeued, failed = self.store.requeue_stale(self.stale_after, self.max_attempts)
+        except Exception as e:
+            logger.error(f"JOB_QUEUE: Failed to requeue stale jobs: {e}", exc_info=True)
+        else:
+            if requeued:
+                logger.warning(f"JOB_QUEUE: Requeued {requeued} stale running jobs")
+            if failed:
+                logger.error(f"JOB_QUEUE: Failed {failed} stale running jobs that used all {self.max_attempts} attempts")
+
+        if self.retention <= 0:
+            return
+        try:
+            purged = self.store.purge_finished(self.retention)
+        except Exception as e:
+            logger.error(f"JOB_QUEUE: Failed to purge finished jobs: {e}", exc_info=True)
+            return
+        if purged:
+            logger.info(f"JOB_QUEUE: Purged {purged} finished jobs older than {self.retention}s")
+
+    def _heartbeat(self):
+        while True:
+            time.sleep(self.heartbeat_interval)
+            with self._running_lock:
+                job_ids = list(self._running)
+            if not job_ids:
+                continue
+            try:
+                self.store.heartbeat(job_ids)
+            except Exception as e:
+                logger.error(f"JOB_QUEUE: Failed to renew job leases: {e}", exc_info=True)
+
+    def _worker(self):
+        while True:
+            try:
+                job = self.store.claim_next(self.max_attempts)
+            except Exception as e:
+                logger.error(f"JOB_QUEUE: Failed to claim job: {e}", exc_info=True)
+                job = None
+
+            if job is None:
+                self._sweep()
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+
+            with self._running_lock:
+                self._running.add(job['id'])
+            try:
+                self._run(job)
+            except Exception as e:
+                # A store error must not kill the worker; the job's lease
+                # lapses and it is requeued by the stale check
+                logger.error(f"JOB_QUEUE: Worker error on job {job['id']}: {e}", exc_info=True)
+            finally:
+                with self._running_lock:
+                    self._running.discard(job['id'])
+
+    def _run(self, job):
+        job_id = job['id']
+        handler = self._handlers.get(job['kind'])
+        if handler is None:
+            # Submitted by a process that knows this kind; leave it for that
+            # process, without spending one of the job's attempts
+            self.store.requeue(job_id, self.poll_interval, refund_attempt=True)
+            return
+
+        start_time = time.time()
+        logger.info(f"JOB_QUEUE: Running {job['kind']} job {job_id} (attempt {job['attempts']})")
+        try:
+            result = handler(job['user_id'], job['payload'])
+        except Exception as e:
+            retry_after = getattr(e, 'retry_after', None)
+            if retry_after is not None and job['attempts'] < self.max_attempts:
+                logger.warning(f"JOB_QUEUE: Job {job_id} deferred for {retry_after}s: {e}")
+                self.store.requeue(job_id, retry_after, error=str(e))
+            else:
+                logger.error(f"JOB_QUEUE: Job {job_id} failed: {e}", exc_info=True)
+                self.store.finish(job_id, FAILED, error=str(e))
+            return
+
+        self.store.finish(job_id, SUCCEEDED, result=result)
+        logger.info(f"JOB_QUEUE: Job {job_id} succeeded, elapsed_time={time.time() - start_time:.2f}s")
+
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """Return the process-wide job queue, configured from the environment."""
+    global _job_queue
+    if _job_queue is None:
+        with _job_queue_lock:
+            if _job_queue is None:
+                if os.getenv("JOB_QUEUE_BACKEND", "sqlite").lower() == "memory":
+                    store = MemoryJobStore()
+                else:
+                    store = SQLiteJobStore(os.getenv("JOB_QUEUE_PATH", DEFAULT_JOB_DB_PATH))
+                _job_queue = JobQueue(
+                    store,
+                    workers=int(os.getenv("JOB_QUEUE_WORKERS", "2")),
+                    stale_after=int(os.getenv("JOB_QUEUE_STALE_AFTER", "120")),
+                    heartbeat_interval=int(os.getenv("JOB_QUEUE_HEARTBEAT", "30")),
+                    retention=int(os.getenv("JOB_QUEUE_RETENTION", "86400"))
+                )
+    return _job_queue
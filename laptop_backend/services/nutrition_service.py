@@ -5,9 +5,14 @@ Nutrition service - handles user nutrition preferences and diet data.
 import logging
 from google.cloud import firestore
 from extensions import db
+from ai.inference import invalidate_user_cache
+from services.precompute import schedule_precompute
 
 logger = logging.getLogger('database')
 
+# Cached AI responses that depend on the nutrition map
+NUTRITION_CACHE_FAMILIES = ('nutrition_analysis',)
+
 
 def post_nutrition_data(user_id, nutrition_data):
     """Create or set nutrition preferences on a user document."""
@@ -19,8 +24,10 @@ def post_nutrition_data(user_id, nutrition_data):
             logger.warning(f"DB_WRITE: User not found for nutrition profile creation - userId={user_id}")
             return {"error": "User not found"}, 404
 
-        doc_ref.set({"nutrition": nutrition_data}, merge=True)
+        doc_ref.set({"nutrition": nutrition_data, "nutritionVersion": firestore.Increment(1)}, merge=True)
         logger.info(f"DB_WRITE: Nutrition profile created successfully for userId={user_id}")
+        invalidate_user_cache(user_id, NUTRITION_CACHE_FAMILIES)
+        schedule_precompute(user_id)
         return {"message": "Nutrition profile created successfully", "nutrition": nutrition_data}, 201
     except Exception as e:
         logger.error(f"DB_WRITE: Failed to create nutrition profile - userId={user_id}, error={str(e)}", exc_info=True)
@@ -44,7 +51,7 @@ def get_nutrition_data(user_id):
             return {"error": "Nutrition profile not found"}, 404
 
         logger.debug(f"DB_READ: Nutrition profile retrieved successfully for userId={user_id}")
-        return {"nutrition": nutrition}, 200
+        return {"nutrition": nutrition, "nutrition_version": doc_data.get("nutritionVersion", 0)}, 200
     except Exception as e:
         logger.error(f"DB_READ: Failed to retrieve nutrition profile - userId={user_id}, error={str(e)}", exc_info=True)
         return {"error": str(e)}, 500
@@ -61,8 +68,10 @@ def update_nutrition_data(user_id, data):
             return {"error": "User not found"}, 404
 
         update_fields = {f"nutrition.{key}": value for key, value in data.items()}
+        update_fields["nutritionVersion"] = firestore.Increment(1)
         doc_ref.update(update_fields)
         logger.info(f"DB_WRITE: Nutrition profile updated successfully for userId={user_id}")
+        invalidate_user_cache(user_id, NUTRITION_CACHE_FAMILIES)
         return {"message": "Nutrition profile updated successfully"}, 200
     except Exception as e:
         logger.error(f"DB_WRITE: Failed to update nutrition profile - userId={user_id}, error={str(e)}", exc_info=True)
@@ -79,8 +88,9 @@ def delete_nutrition_data(user_id):
             logger.warning(f"DB_WRITE: User not found for nutrition profile deletion - userId={user_id}")
             return {"error": "User not found"}, 404
 
-        doc_ref.update({"nutrition": firestore.DELETE_FIELD})
+        doc_ref.update({"nutrition": firestore.DELETE_FIELD, "nutritionVersion": firestore.Increment(1)})
         logger.info(f"DB_WRITE: Nutrition profile deleted successfully for userId={user_id}")
+        invalidate_user_cache(user_id, NUTRITION_CACHE_FAMILIES)
         return {"message": "Nutrition profile deleted successfully"}, 200
     except Exception as e:
         logger.error(f"DB_WRITE: Failed to delete nutrition profile - userId={user_id}, error={str(e)}", exc_info=True)
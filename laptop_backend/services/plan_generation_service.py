@@ -0,0 +1,481 @@
+"""
+Plan generation service - builds a diet/workout plan with Gemini and saves it.
+Shared by the synchronous, streaming and background-job plan routes.
+"""
+
+import copy
+import logging
+import os
+import time
+
+from services.plan_service import create_plan, get_plan
+from services.health_service import get_health_data
+from services.nutrition_service import get_nutrition_data
+from ai import get_gemini_engine, SchedulerFullError
+from ai.prompts import plan_prompts, schemas
+from ai.inference.context import usage_context
+from ai.inference.metrics import output_metrics
+from ai.utils.model_utils import format_response, merge_user_context
+from ai.utils.plan_validation import PlanValidationError, normalize_diet_week, normalize_workout_week
+
+ai_logger = logging.getLogger('ai')
+
+PLAN_TYPES = ['diet', 'workout', 'combined']
+
+# Plan sections generated for each plan type
+PLAN_SECTIONS = {
+    'diet': ['diet'],
+    'workout': ['workouts'],
+    'combined': ['diet', 'workouts'],
+}
+
+# Each week of each section is generated by its own small prompt
+SECTION_WEEK_PROMPTS = {
+    'diet': plan_prompts.generate_nutrition_week_prompt,
+    'workouts': plan_prompts.generate_fitness_week_prompt,
+}
+
+SECTION_WEEK_KEYS = {
+    'diet': plan_prompts.generate_nutrition_week_key,
+    'workouts': plan_prompts.generate_fitness_week_key,
+}
+
+SECTION_NORMALIZERS = {
+    'diet': normalize_diet_week,
+    'workouts': normalize_workout_week,
+}
+
+SECTION_WEEK_SCHEMAS = {
+    'diet': schemas.DIET_WEEK,
+    'workouts': schemas.WORKOUT_WEEK,
+}
+
+# Name field used to keep regenerated plans from repeating the previous one
+SECTION_NAME_FIELDS = {
+    'diet': ('breakfast', 'lunch', 'dinner'),
+    'workouts': ('workoutName',),
+}
+
+MAX_PLAN_WEEKS = int(os.getenv("PLAN_MAX_WEEKS", "12"))
+PLAN_WEEK_CONCURRENCY = int(os.getenv("PLAN_WEEK_CONCURRENCY", "4"))
+
+
+def build_plan_request(data, max_weeks=MAX_PLAN_WEEKS):
+    """
+    Turn a plan request body into (plan_type, duration_weeks, plan_data).
+
+    Raises:
+        ValueError: if plan_type is invalid
+    """
+    plan_type = data.get('plan_type', 'combined')
+    if plan_type not in PLAN_TYPES:
+        raise ValueError('Invalid plan_type')
+
+    if data.get('use_ai', True):
+        duration_weeks = min(data.get('duration_weeks', 2), max_weeks)
+    else:
+        duration_weeks = data.get('duration_weeks', 4)
+
+    plan_data = {
+        'plan_type': plan_type,
+        'preferences': {
+            'duration_weeks': duration_weeks,
+            'intensity': data.get('intensity', 'moderate'),
+            'specific_goals': data.get('specific_goals', [])
+        }
+    }
+    return plan_type, duration_weeks, plan_data
+
+
+def build_plan_context(user_id, plan_data):
+    """Fetch health and nutrition data and merge them with the plan request."""
+    health_response, health_status = get_health_data(user_id)
+    nutrition_response, nutrition_status = get_nutrition_data(user_id)
+
+    if health_status != 200 or nutrition_status != 200:
+        ai_logger.warning(f"AI_USAGE: Incomplete user data for userId={user_id}, using available data")
+
+    return merge_user_context(
+        health_response.get('profile', {}),
+        nutrition_response.get('nutrition', {}),
+        plan_data
+    )
+
+
+def apply_ai_plan(plan_data, ai_plan, elapsed_time):
+    """Copy the diet/workout weeks from parsed AI output into plan_data."""
+    if 'diet' in ai_plan:
+        plan_data['diet'] = ai_plan['diet']
+    if 'workouts' in ai_plan:
+        plan_data['workouts'] = ai_plan['workouts']
+
+    plan_data['ai_generated'] = True
+    plan_data['generation_method'] = 'gemini'
+    plan_data['generation_time'] = f"{elapsed_time:.2f}s"
+
+
+def apply_mock_plan(plan_data, plan_type, duration_weeks, fallback_reason=None):
+    """Fill plan_data with mock diet/workout weeks."""
+    if plan_type in ['diet', 'combined']:
+        plan_data['diet'] = generate_mock_diet_plan(duration_weeks)
+    if plan_type in ['workout', 'combined']:
+        plan_data['workouts'] = generate_mock_workout_plan(duration_weeks)
+    plan_data['ai_generated'] = False
+    if fallback_reason:
+        # Mock data served in place of a failed or timed-out generation
+        plan_data['fallback_reason'] = fallback_reason
+        plan_data['degraded'] = True
+
+
+def plan_week_requests(user_id, plan_type, duration_weeks, plan_data):
+    """
+    Build the generate_batch() requests for every week of every section.
+
+    Returns:
+        Tuple of ((section, week) shards, request dicts in the same order)
+    """
+    sections = PLAN_SECTIONS[plan_type]
+    shards = [(section, week) for section in sections for week in range(1, duration_weeks + 1)]
+
+    # Fetch user context
+    user_context = build_plan_context(user_id, plan_data)
+    avoid = _previous_plan_names(user_id, sections)
+
+    requests = [
+        {
+            'prompt': SECTION_WEEK_PROMPTS[section](user_context, week, duration_weeks, avoid[section]),
+            'max_new_tokens': 500,
+            'temperature': 0.7,
+            'use_cache': True,
+            'prompt_family': 'plan',
+            'priority': 'bulk',
+            'response_schema': SECTION_WEEK_SCHEMAS[section],
+            'cache_key_inputs': SECTION_WEEK_KEYS[section](user_context, week, duration_weeks, avoid[section])
+        }
+        for section, week in shards
+    ]
+    return shards, requests
+
+
+def generate_plan_data(user_id, plan_type, duration_weeks, plan_data):
+    """
+    Fill plan_data with AI-generated weeks, falling back to mock data on error.
+
+    Every week of every section (diet, workouts) gets its own small prompt
+    and all of them run concurrently, so an 8-12 week plan takes about as
+    long as a one-week plan. Weeks are stitched back in order; each prompt
+    carries a per-week theme so weeks generated in parallel don't repeat
+    each other. Only a failed week falls back to mock data.
+
+    SchedulerFullError is re-raised so callers can surface backpressure.
+    """
+    sections = PLAN_SECTIONS[plan_type]
+    ai_logger.info(f"AI_USAGE: Initiating AI plan generation - userId={user_id}, plan_type={plan_type}, weeks={duration_weeks}")
+    start_time = time.time()
+
+    try:
+        # Get Gemini engine instance
+        ai_engine = get_gemini_engine()
+
+        shards, requests = plan_week_requests(user_id, plan_type, duration_weeks, plan_data)
+
+        ai_logger.info(f"AI_INFERENCE: Starting inference for userId={user_id}, sections={sections}, shards={len(shards)}")
+
+        # Generate all weeks concurrently
+        outputs = ai_engine.generate_batch(requests, concurrency=PLAN_WEEK_CONCURRENCY)
+    except SchedulerFullError:
+        raise
+    except Exception as e:
+        ai_logger.error(f"AI_INFERENCE: AI generation error for userId={user_id}: {e}, falling back to mock data")
+        # Fallback to mock data on any error (including timeout)
+        output_metrics.record_fallback('plan', error=True)
+        apply_mock_plan(plan_data, plan_type, duration_weeks, str(e))
+        return plan_data
+
+    for output in outputs:
+        if isinstance(output, SchedulerFullError):
+            raise output
+
+    elapsed_time = time.time() - start_time
+    failures = {}
+    for section in sections:
+        plan_data[section] = []
+    for (section, week), output in zip(shards, outputs):
+        week_plan, error = _parse_week(section, week, output)
+        if error:
+            ai_logger.warning(f"AI_INFERENCE: {section} week {week} generation failed for userId={user_id}: {error}, falling back to mock data")
+            failures[f"{section} week {week}"] = error
+            output_metrics.record_fallback('plan', error=isinstance(output, Exception))
+            week_plan = SECTION_MOCKS[section](week)[week - 1]
+        plan_data[section].append(week_plan)
+
+    plan_data['ai_generated'] = len(failures) < len(shards)
+    if plan_data['ai_generated']:
+        plan_data['generation_method'] = 'gemini'
+        plan_data['generation_time'] = f"{elapsed_time:.2f}s"
+    if failures:
+        plan_data['degraded'] = True
+        plan_data['fallback_sections'] = list(failures)
+        plan_data['fallback_reason'] = '; '.join(f"{shard}: {error}" for shard, error in failures.items())
+
+    ai_logger.info(f"AI_INFERENCE: Inference completed for userId={user_id}, failed_shards={len(failures)}/{len(shards)}, elapsed_time={elapsed_time:.2f}s")
+    return plan_data
+
+
+def _previous_plan_names(user_id, sections):
+    """Dish/workout names from the user's current plan, to avoid repeating them."""
+    names = {section: [] for section in sections}
+    plan_response, plan_status = get_plan(user_id)
+    if plan_status != 200:
+        return names
+
+    for section in sections:
+        for week in plan_response['plan'].get(section, []):
+            if not isinstance(week, dict):
+                continue
+            for field in SECTION_NAME_FIELDS[section]:
+                value = week.get(field)
+                name = value.get('dishName') if isinstance(value, dict) else value
+                if name and name not in names[section]:
+                    names[section].append(name)
+        names[section] = names[section][:15]
+    return names
+
+
+def _parse_week(section, week, output):
+    """Return (week_plan, None) for a usable week output, or (None, reason)."""
+    if isinstance(output, Exception):
+        return None, str(output)
+
+    formatted = format_response(output, expected_format="json", prompt_family='plan')
+    if not formatted['success']:
+        return None, 'AI output parsing failed'
+
+    week_plan = formatted['data']
+    # Tolerate the model wrapping the week in its section array
+    if isinstance(week_plan, dict) and isinstance(week_plan.get(section), list) and week_plan[section]:
+        week_plan = week_plan[section][0]
+
+    try:
+        week_plan = SECTION_NORMALIZERS[section](week_plan, f"{section}[{week - 1}]")
+    except PlanValidationError as e:
+        return None, str(e)
+
+    week_plan['week'] = f"Week {week}"
+    return week_plan, None
+
+
+def create_user_plan(user_id, data):
+    """
+    Build, generate and save a plan from a plan request body.
+
+    Returns:
+        Tuple of (response dict, status code), as create_plan
+    """
+    try:
+        plan_type, duration_weeks, plan_data = build_plan_request(data)
+    except ValueError as e:
+        return {'error': str(e)}, 400
+
+    if data.get('use_ai', True):
+        generate_plan_data(user_id, plan_type, duration_weeks, plan_data)
+    else:
+        ai_logger.info(f"AI_NON_USAGE: Mock data used instead of AI for userId={user_id}, plan_type={plan_type}")
+        apply_mock_plan(plan_data, plan_type, duration_weeks)
+
+    # Save plan to database
+    return create_plan(user_id, plan_data)
+
+
+def run_plan_job(user_id, payload):
+    """Job queue handler: generate and save a plan, returning the saved plan."""
+    with usage_context('job:plan_generation', user_id):
+        result, status = create_user_plan(user_id, payload.get('request', {}))
+    if status != 201:
+        raise RuntimeError(result.get('error', f'Plan creation failed with status {status}'))
+    return result
+
+
+# Fallback mock functions (for non-AI mode)
+def generate_mock_diet_plan(weeks=4):
+    """Mock diet plan generator matching Nutrition Architect format."""
+    diet_plans = [
+        {
+            'week': 'Week 1',
+            'breakfast': {
+                'dishName': 'Oatmeal with Fresh Berries and Almonds',
+                'calories': '350',
+                'carbs': '52g',
+                'fats': '10g',
+                'protein': '12g',
+                'completed': False
+            },
+            'lunch': {
+                'dishName': 'Grilled Chicken Caesar Salad',
+                'calories': '450',
+                'carbs': '20g',
+                'fats': '22g',
+                'protein': '42g',
+                'completed': False
+            },
+            'dinner': {
+                'dishName': 'Baked Salmon with Roasted Vegetables',
+                'calories': '520',
+                'carbs': '28g',
+                'fats': '24g',
+                'protein': '45g',
+                'completed': False
+            }
+        },
+        {
+            'week': 'Week 2',
+            'breakfast': {
+                'dishName': 'Greek Yogurt Parfait with Granola and Honey',
+                'calories': '380',
+                'carbs': '48g',
+                'fats': '12g',
+                'protein': '20g',
+                'completed': False
+            },
+            'lunch': {
+                'dishName': 'Quinoa Buddha Bowl with Chickpeas',
+                'calories': '480',
+                'carbs': '58g',
+                'fats': '16g',
+                'protein': '22g',
+                'completed': False
+            },
+            'dinner': {
+                'dishName': 'Turkey Stir-Fry with Brown Rice',
+                'calories': '490',
+                'carbs': '45g',
+                'fats': '14g',
+                'protein': '48g',
+                'completed': False
+            }
+        },
+        {
+            'week': 'Week 3',
+            'breakfast': {
+                'dishName': 'Veggie Omelette with Whole Wheat Toast',
+                'calories': '420',
+                'carbs': '32g',
+                'fats': '22g',
+                'protein': '28g',
+                'completed': False
+            },
+            'lunch': {
+                'dishName': 'Mediterranean Wrap with Hummus',
+                'calories': '440',
+                'carbs': '42g',
+                'fats': '18g',
+                'protein': '24g',
+                'completed': False
+            },
+            'dinner': {
+                'dishName': 'Grilled Chicken with Sweet Potato',
+                'calories': '510',
+                'carbs': '38g',
+                'fats': '12g',
+                'protein': '52g',
+                'completed': False
+            }
+        },
+        {
+            'week': 'Week 4',
+            'breakfast': {
+                'dishName': 'Protein Smoothie Bowl with Banana',
+                'calories': '360',
+                'carbs': '45g',
+                'fats': '8g',
+                'protein': '25g',
+                'completed': False
+            },
+            'lunch': {
+                'dishName': 'Tuna Poke Bowl with Edamame',
+                'calories': '470',
+                'carbs': '40g',
+                'fats': '16g',
+                'protein': '38g',
+                'completed': False
+            },
+            'dinner': {
+                'dishName': 'Beef and Vegetable Stew with Quinoa',
+                'calories': '530',
+                'carbs': '42g',
+                'fats': '18g',
+                'protein': '46g',
+                'completed': False
+            }
+        }
+    ]
+    return _repeat_weeks(diet_plans, weeks)
+
+
+def generate_mock_workout_plan(weeks=4):
+    """Mock workout plan generator matching frontend format."""
+    workout_plans = [
+        {
+            'week': 'Week 1',
+            'workoutName': 'Full Body Foundation',
+            'completed': False,
+            'exercises': [
+                {'name': 'Push-ups', 'sets': '3', 'reps': '12', 'completed': False},
+                {'name': 'Bodyweight Squats', 'sets': '3', 'reps': '15', 'completed': False},
+                {'name': 'Plank Hold', 'sets': '3', 'reps': '30 sec', 'completed': False},
+                {'name': 'Lunges', 'sets': '3', 'reps': '10 each', 'completed': False},
+                {'name': 'Mountain Climbers', 'sets': '3', 'reps': '20', 'completed': False}
+            ]
+        },
+        {
+            'week': 'Week 2',
+            'workoutName': 'Upper Body Strength',
+            'completed': False,
+            'exercises': [
+                {'name': 'Diamond Push-ups', 'sets': '3', 'reps': '10', 'completed': False},
+                {'name': 'Pike Push-ups', 'sets': '3', 'reps': '8', 'completed': False},
+                {'name': 'Tricep Dips', 'sets': '3', 'reps': '12', 'completed': False},
+                {'name': 'Superman Hold', 'sets': '3', 'reps': '20 sec', 'completed': False},
+                {'name': 'Arm Circles', 'sets': '3', 'reps': '30 sec', 'completed': False}
+            ]
+        },
+        {
+            'week': 'Week 3',
+            'workoutName': 'Lower Body Power',
+            'completed': False,
+            'exercises': [
+                {'name': 'Jump Squats', 'sets': '4', 'reps': '12', 'completed': False},
+                {'name': 'Walking Lunges', 'sets': '3', 'reps': '20', 'completed': False},
+                {'name': 'Glute Bridges', 'sets': '3', 'reps': '15', 'completed': False},
+                {'name': 'Calf Raises', 'sets': '3', 'reps': '20', 'completed': False},
+                {'name': 'Wall Sit', 'sets': '3', 'reps': '45 sec', 'completed': False}
+            ]
+        },
+        {
+            'week': 'Week 4',
+            'workoutName': 'Core & Cardio Blast',
+            'completed': False,
+            'exercises': [
+                {'name': 'Burpees', 'sets': '3', 'reps': '10', 'completed': False},
+                {'name': 'Bicycle Crunches', 'sets': '3', 'reps': '20', 'completed': False},
+                {'name': 'High Knees', 'sets': '3', 'reps': '30 sec', 'completed': False},
+                {'name': 'Russian Twists', 'sets': '3', 'reps': '20', 'completed': False},
+                {'name': 'Plank to Push-up', 'sets': '3', 'reps': '10', 'completed': False}
+            ]
+        }
+    ]
+    return _repeat_weeks(workout_plans, weeks)
+
+
+def _repeat_weeks(plans, weeks):
+    """Cycle the mock weeks to cover plans longer than the templates."""
+    return [
+        dict(copy.deepcopy(plans[i % len(plans)]), week=f"Week {i + 1}")
+        for i in range(weeks)
+    ]
+
+
+SECTION_MOCKS = {
+    'diet': generate_mock_diet_plan,
+    'workouts': generate_mock_workout_plan,
+}
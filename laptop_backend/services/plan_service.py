@@ -4,10 +4,27 @@ Plan service - handles diet and workout plan management.
 
 import logging
 from extensions import db
+from ai.utils.plan_validation import MEAL_TYPES
 
 logger = logging.getLogger('database')
 
 
+def find_stored_week(weeks, week_name):
+    """
+    Return the week labelled week_name ('week' or 'weekName') from a stored
+    diet/workouts array, as the dict to patch in place, or None.
+    """
+    if not isinstance(weeks, list):
+        return None
+    return next(
+        (
+            week for week in weeks
+            if isinstance(week, dict) and (week.get("week") == week_name or week.get("weekName") == week_name)
+        ),
+        None
+    )
+
+
 def create_plan(user_id, plan_data):
     """Initialize the diet and workouts arrays on a user document."""
     logger.info(f"DB_WRITE: Creating plan for userId={user_id}, ai_generated={plan_data.get('ai_generated', False)}")
@@ -127,22 +144,17 @@ def update_week_workouts(user_id, week_name, new_exercises):
             logger.warning(f"DB_WRITE: User not found - userId={user_id}")
             return {"error": "User not found"}, 404
 
-        doc_data = doc.to_dict()
-        workouts = doc_data.get("workouts", [])
+        workouts = doc.to_dict().get("workouts", [])
 
         # Find and update the week (support both 'week' and 'weekName' keys)
-        week_found = False
-        for week in workouts:
-            if week.get("week") == week_name or week.get("weekName") == week_name:
-                week["exercises"] = new_exercises
-                week_found = True
-                logger.debug(f"DB_WRITE: Found week {week_name}, updating {len(new_exercises)} exercises")
-                break
-
-        if not week_found:
+        week = find_stored_week(workouts, week_name)
+        if week is None:
             logger.warning(f"DB_WRITE: Week {week_name} not found in workouts for userId={user_id}")
             return {"error": f"Week {week_name} not found"}, 404
 
+        week["exercises"] = new_exercises
+        logger.debug(f"DB_WRITE: Found week {week_name}, updating {len(new_exercises)} exercises")
+
         # Save updated workouts
         doc_ref.set({"workouts": workouts}, merge=True)
         logger.info(f"DB_WRITE: Workouts updated successfully for userId={user_id}, week={week_name}")
@@ -173,28 +185,23 @@ def update_week_meals(user_id, week_name, new_meals):
             logger.warning(f"DB_WRITE: User not found - userId={user_id}")
             return {"error": "User not found"}, 404
 
-        doc_data = doc.to_dict()
-        diet = doc_data.get("diet", [])
+        diet = doc.to_dict().get("diet", [])
 
         # Find and update the week (support both 'week' and 'weekName' keys)
-        week_found = False
-        for week in diet:
-            if week.get("week") == week_name or week.get("weekName") == week_name:
-                # Update meal fields directly on the week object (new format)
-                for meal_type in ['breakfast', 'lunch', 'dinner']:
-                    if meal_type in new_meals:
-                        week[meal_type] = new_meals[meal_type]
-                # Also support old 'meals' format
-                if 'meals' in week:
-                    week["meals"] = new_meals
-                week_found = True
-                logger.debug(f"DB_WRITE: Found week {week_name}, updating meals")
-                break
-
-        if not week_found:
+        week = find_stored_week(diet, week_name)
+        if week is None:
             logger.warning(f"DB_WRITE: Week {week_name} not found in diet for userId={user_id}")
             return {"error": f"Week {week_name} not found"}, 404
 
+        # Update meal fields directly on the week object (new format)
+        for meal_type in MEAL_TYPES:
+            if meal_type in new_meals:
+                week[meal_type] = new_meals[meal_type]
+        # Also support old 'meals' format
+        if 'meals' in week:
+            week["meals"] = new_meals
+        logger.debug(f"DB_WRITE: Found week {week_name}, updating meals")
+
         # Save updated diet
         doc_ref.set({"diet": diet}, merge=True)
         logger.info(f"DB_WRITE: Meals updated successfully for userId={user_id}, week={week_name}")
@@ -0,0 +1,113 @@
+"""
+Precompute service - warms the AI caches right after a profile is created.
+
+The app calls /health/analyze, /nutrition/analyze and POST /plan right after
+creating the health and nutrition profiles. schedule_precompute() starts
+those generations on a background pool as soon as the profile write
+commits, so the requests that follow hit a warm cache entry or join the
+in-flight generation. Precompute runs at bulk priority and is capped by a
+per-minute generation budget (PRECOMPUTE_BUDGET_PER_MINUTE, 0 disables it).
+
+A profile write that lands while the user's precompute is running (the
+nutrition write right after the health one) makes it run once more when it
+finishes, since only then are both profiles present.
+"""
+
+import logging
+import os
+import threading
+import time
+
+from ai.inference.context import usage_context
+from ai.inference.refresher import BackgroundRefresher
+
+logger = logging.getLogger('ai')
+
+PRECOMPUTE_BUDGET_PER_MINUTE = float(os.getenv("PRECOMPUTE_BUDGET_PER_MINUTE", "30"))
+PRECOMPUTE_CONCURRENCY = int(os.getenv("PRECOMPUTE_CONCURRENCY", "2"))
+
+
+class GenerationBudget:
+    """Token bucket of generations per minute; the burst is one minute's worth."""
+
+    def __init__(self, per_minute: float):
+        self.per_minute = per_minute
+        self._tokens = per_minute
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_spend(self, generations: int) -> bool:
+        """Take generations from the bucket if it holds enough."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.per_minute, self._tokens + (now - self._updated) * self.per_minute / 60)
+            self._updated = now
+            if generations > self._tokens:
+                return False
+            self._tokens -= generations
+            return True
+
+
+_budget = GenerationBudget(PRECOMPUTE_BUDGET_PER_MINUTE)
+_pool = BackgroundRefresher(
+    workers=int(os.getenv("PRECOMPUTE_WORKERS", "1")),
+    max_pending=int(os.getenv("PRECOMPUTE_MAX_PENDING", "16"))
+)
+
+
+def schedule_precompute(user_id):
+    """Schedule cache warm-up for a user whose profile was just written."""
+    if PRECOMPUTE_BUDGET_PER_MINUTE <= 0:
+        return
+    if _pool.submit(f"precompute:{user_id}", lambda: _run_precompute(user_id), rerun=True):
+        logger.info(f"AI_PRECOMPUTE: Scheduled for userId={user_id}")
+
+
+def _run_precompute(user_id):
+    with usage_context('precompute', user_id):
+        _precompute(user_id)
+
+
+def _precompute(user_id):
+    """Generate (into the cache) what the app will ask for next, given the profiles present."""
+    # Imported here: these services import the profile services that call schedule_precompute()
+    from ai import get_gemini_engine
+    from services.analysis_service import health_analysis_request, nutrition_analysis_request
+    from services.health_service import get_health_data
+    from services.nutrition_service import get_nutrition_data
+    from services.plan_generation_service import build_plan_request, plan_week_requests
+
+    health_response, health_status = get_health_data(user_id)
+    nutrition_response, nutrition_status = get_nutrition_data(user_id)
+
+    requests = []
+    if health_status == 200:
+        requests.append(health_analysis_request(user_id, health_response))
+    # Nutrition analysis and plans depend on both profiles; wait for the second write
+    if health_status == 200 and nutrition_status == 200:
+        requests.append(nutrition_analysis_request(user_id, nutrition_response, health_response))
+        plan_type, duration_weeks, plan_data = build_plan_request({})
+        requests.extend(plan_week_requests(user_id, plan_type, duration_weeks, plan_data)[1])
+
+    if not requests:
+        return
+    if not _budget.try_spend(len(requests)):
+        logger.info(f"AI_PRECOMPUTE: Budget exhausted, skipping {len(requests)} generations for userId={user_id}")
+        return
+
+    start_time = time.time()
+    try:
+        outputs = get_gemini_engine().generate_batch(
+            [dict(request, priority='bulk') for request in requests],
+            concurrency=PRECOMPUTE_CONCURRENCY
+        )
+    except Exception as e:
+        logger.warning(f"AI_PRECOMPUTE: Failed for userId={user_id}: {e}")
+        return
+
+    failed = sum(isinstance(output, Exception) for output in outputs)
+    logger.info(
+        f"AI_PRECOMPUTE: Completed for userId={user_id}, generations={len(outputs)}, "
+        f"failed={failed}, elapsed_time={time.time() - start_time:.2f}s"
+    )
+
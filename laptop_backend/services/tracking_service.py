@@ -4,6 +4,8 @@ Tracking service - handles daily meal and workout tracking.
 
 import logging
 from extensions import db
+from ai.utils.plan_validation import MEAL_TYPES
+from services.plan_service import find_stored_week
 
 logger = logging.getLogger('database')
 
@@ -18,25 +20,24 @@ def update_meal_completion(user_id, week_name, meal_type, actual_meal):
             logger.warning(f"DB_WRITE: User not found for meal completion update - userId={user_id}")
             return {"error": "User not found"}, 404
 
-        doc_data = doc.to_dict()
-        diet = doc_data.get("diet", [])
-
-        updated = False
-        for entry in diet:
-            if entry.get("weekName") == week_name:
-                meals = entry.get("meals", {})
-                if meal_type not in meals:
-                    logger.warning(f"DB_WRITE: Meal type '{meal_type}' not found for userId={user_id}")
-                    return {"error": f"Meal type '{meal_type}' not found"}, 404
-                meals[meal_type]["actualMeal"] = actual_meal
-                meals[meal_type]["completed"] = True
-                updated = True
-                break
-
-        if not updated:
+        diet = doc.to_dict().get("diet", [])
+
+        # Patch only the targeted meal; the rest of the stored diet is written back as read
+        week = find_stored_week(diet, week_name)
+        if week is None:
             logger.warning(f"DB_WRITE: Week '{week_name}' not found for userId={user_id}")
             return {"error": f"Week '{week_name}' not found"}, 404
 
+        meal = week.get(meal_type) if meal_type in MEAL_TYPES else None
+        if not isinstance(meal, dict):
+            # Old 'meals' map format
+            meal = (week.get("meals") or {}).get(meal_type)
+        if not isinstance(meal, dict):
+            logger.warning(f"DB_WRITE: Meal type '{meal_type}' not found for userId={user_id}")
+            return {"error": f"Meal type '{meal_type}' not found"}, 404
+        meal["actualMeal"] = actual_meal
+        meal["completed"] = True
+
         doc_ref.set({"diet": diet}, merge=True)
         logger.info(f"DB_WRITE: Meal completion updated successfully for userId={user_id}")
         return {"message": "Meal completion updated successfully"}, 200
@@ -55,23 +56,22 @@ def toggle_workout_status(user_id, week_name, workout_id, is_completed):
             logger.warning(f"DB_WRITE: User not found for workout toggle - userId={user_id}")
             return {"error": "User not found"}, 404
 
-        doc_data = doc.to_dict()
-        workouts = doc_data.get("workouts", [])
-
-        updated = False
-        for entry in workouts:
-            if entry.get("weekName") == week_name:
-                exercises = entry.get("exercises", [])
-                for exercise in exercises:
-                    if exercise.get("workoutId") == workout_id:
-                        exercise["completed"] = is_completed
-                        updated = True
-                        break
-                break
-
-        if not updated:
+        workouts = doc.to_dict().get("workouts", [])
+
+        # Patch only the targeted exercise; the rest of the stored workouts is written back as read
+        week = find_stored_week(workouts, week_name)
+        exercise = next(
+            (
+                exercise for exercise in (week or {}).get("exercises") or []
+                if isinstance(exercise, dict) and exercise.get("workoutId") == workout_id
+            ),
+            None
+        )
+
+        if exercise is None:
             logger.warning(f"DB_WRITE: Workout '{workout_id}' in week '{week_name}' not found for userId={user_id}")
             return {"error": f"Workout '{workout_id}' in week '{week_name}' not found"}, 404
+        exercise["completed"] = is_completed
 
         doc_ref.set({"workouts": workouts}, merge=True)
         logger.info(f"DB_WRITE: Workout status updated successfully for userId={user_id}")
@@ -0,0 +1,38 @@
+"""
+Shared pytest setup for the backend tests
+Run from laptop_backend: python -m pytest tests
+"""
+
+import os
+import sys
+import types
+
+import pytest
+
+# Make the backend packages (ai, services, routes) importable
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# extensions connects to Firestore on import, which needs service account
+# credentials; give services a client-less module instead of a live
+# connection (tests that need a database patch in fakes.FakeFirestore)
+extensions = types.ModuleType("extensions")
+extensions.db = None
+sys.modules.setdefault("extensions", extensions)
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    """
+    A fresh GeminiEngine with a dummy API key, in-memory cache and no warm-up.
+
+    Tests replace engine.model (or the engine's upstream methods) with fakes;
+    configuring the client makes no network calls.
+    """
+    from ai.inference.gemini_engine import GeminiEngine
+
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+    monkeypatch.setenv("GEMINI_CACHE_BACKEND", "memory")
+    monkeypatch.setenv("GEMINI_RETRY_BASE_DELAY", "0")
+    monkeypatch.setattr(GeminiEngine, "_instance", None)
+    yield GeminiEngine()
+    GeminiEngine._instance = None
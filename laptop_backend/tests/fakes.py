@@ -0,0 +1,119 @@
+"""
+Fakes for tests
+FakeModel stands in for genai.GenerativeModel (responses, delays and errors
+are scripted per test); FakeFirestore stands in for extensions.db.
+"""
+
+import asyncio
+import copy
+import threading
+import time
+from typing import Callable, List, Optional
+
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+        self.parts = [text] if text else []
+        self.prompt_feedback = None
+        self.usage_metadata = None
+
+
+class FakeModel:
+    """
+    Scripted replacement for engine.model.
+
+    Each call pops the next entry of `script` (or reuses `default` once it is
+    empty): a string is returned as the response text, an exception is
+    raised. `delay` (seconds, or a callable taking the call number) is
+    slept before answering. `timeouts` records each call's request timeout.
+    """
+
+    def __init__(self, default: str = '{"ok": true}', delay=0.0, script: Optional[List] = None):
+        self.default = default
+        self.delay = delay
+        self.script = list(script or [])
+        self.calls = 0
+        self.cancelled = 0
+        self.timeouts = []
+        self._lock = threading.Lock()
+
+    def _next(self, request_options=None):
+        with self._lock:
+            self.calls += 1
+            self.timeouts.append((request_options or {}).get("timeout"))
+            call = self.calls
+            outcome = self.script.pop(0) if self.script else self.default
+        delay = self.delay(call) if isinstance(self.delay, Callable) else self.delay
+        return delay, outcome
+
+    @staticmethod
+    def _answer(outcome) -> FakeResponse:
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return FakeResponse(outcome)
+
+    def generate_content(self, prompt, generation_config=None, stream=False, request_options=None):
+        delay, outcome = self._next(request_options)
+        time.sleep(delay)
+        if stream:
+            if isinstance(outcome, BaseException):
+                raise outcome
+            return iter([FakeResponse(outcome[i:i + 5]) for i in range(0, len(outcome), 5)])
+        return self._answer(outcome)
+
+    async def generate_content_async(self, prompt, generation_config=None, request_options=None):
+        delay, outcome = self._next(request_options)
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            with self._lock:
+                self.cancelled += 1
+            raise
+        return self._answer(outcome)
+
+
+class ApiError(Exception):
+    """Upstream error carrying an HTTP status, like google.api_core exceptions."""
+
+    def __init__(self, code: int, message: str = "upstream error"):
+        super().__init__(f"{code} {message}")
+        self.code = code
+
+
+class FakeSnapshot:
+    def __init__(self, data: Optional[dict]):
+        self._data = data
+        self.exists = data is not None
+
+    def to_dict(self) -> Optional[dict]:
+        return copy.deepcopy(self._data)
+
+
+class FakeDocument:
+    def __init__(self, store: dict, doc_id: str):
+        self._store = store
+        self._id = doc_id
+
+    def get(self) -> FakeSnapshot:
+        return FakeSnapshot(self._store.get(self._id))
+
+    def set(self, data: dict, merge: bool = False):
+        current = self._store.get(self._id) if merge else None
+        self._store[self._id] = {**(current or {}), **copy.deepcopy(data)}
+
+
+class FakeFirestore:
+    """In-memory db.collection(name).document(id) with get() and set(merge=True)."""
+
+    def __init__(self):
+        self.collections = {}
+
+    def collection(self, name: str):
+        store = self.collections.setdefault(name, {})
+
+        class _Collection:
+            def document(self, doc_id: str) -> FakeDocument:
+                return FakeDocument(store, doc_id)
+
+        return _Collection()
@@ -0,0 +1,30 @@
+import json
+
+import pytest
+
+from ai.prompts.cache_keys import age_band, bucket
+from ai.prompts.health_prompts import analyze_health_metrics_key
+
+
+def test_bucket_rounds_to_step():
+    assert bucket(75.4, 1) == 75
+    assert bucket("2013.75", 50) == 2000
+    assert bucket(22.3, 0.5) == 22.5
+
+
+def test_bucket_keeps_non_numeric_as_text():
+    assert bucket(" Unknown ", 1) == "unknown"
+    assert bucket(None, 1) is None
+
+
+@pytest.mark.parametrize("value", [float("nan"), float("inf"), float("-inf"), "nan", "Infinity"])
+def test_non_finite_values_are_missing(value):
+    assert bucket(value, 1) is None
+    assert age_band(value) is None
+
+
+def test_health_key_with_non_finite_metrics_is_serializable():
+    key = analyze_health_metrics_key({"age": 30, "weight": float("nan"), "bmi": float("inf")})
+
+    assert key["weight"] is None and key["bmi"] is None
+    json.dumps(key, allow_nan=False)
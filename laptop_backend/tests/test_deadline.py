@@ -0,0 +1,56 @@
+import pytest
+
+from ai.inference.deadline import DeadlineExceededError, UpstreamTimeoutError, deadline
+from fakes import ApiError, FakeModel
+
+
+def test_deadline_caps_upstream_timeout(engine):
+    engine.model = FakeModel()
+
+    with deadline(2.0):
+        engine.generate("p", use_cache=False)
+
+    assert 0 < engine.model.timeouts[-1] <= 2.0
+
+
+def test_expired_deadline_fails_without_calling_upstream(engine):
+    engine.model = FakeModel()
+
+    with pytest.raises(DeadlineExceededError):
+        with deadline(0):
+            engine.generate("p", use_cache=False)
+
+    assert engine.model.calls == 0
+
+
+def test_upstream_timeout_at_deadline_is_not_retried(engine):
+    engine.model = FakeModel(delay=0.15, script=[ApiError(504, "Deadline Exceeded")])
+
+    with pytest.raises(DeadlineExceededError):
+        with deadline(0.1):
+            engine.generate("p", use_cache=False)
+
+    assert engine.model.calls == 1
+
+
+def test_request_deadline_does_not_feed_breaker_or_limiter(engine):
+    engine.model = FakeModel(delay=0.15, script=[ApiError(504, "Deadline Exceeded")])
+
+    with pytest.raises(DeadlineExceededError) as raised:
+        with deadline(0.1):
+            engine.generate("p", use_cache=False)
+
+    assert not isinstance(raised.value, UpstreamTimeoutError)
+    assert engine._breaker.stats()["consecutive_failures"] == 0
+    assert engine._scheduler.stats()["avg_service_time"] == 5.0
+
+
+def test_full_upstream_timeout_feeds_breaker(engine):
+    engine.timeout = 0.1
+    engine.model = FakeModel(delay=0.15, script=[ApiError(504, "Deadline Exceeded")])
+
+    with pytest.raises(UpstreamTimeoutError):
+        engine.generate("p", use_cache=False)
+
+    assert engine._breaker.stats()["consecutive_failures"] == 1
+    assert engine._scheduler.stats()["avg_service_time"] != 5.0
@@ -0,0 +1,158 @@
+"""Tests for the SQLite response cache."""
+
+import sqlite3
+import time
+
+from ai.inference.disk_cache import SQLiteResponseCache
+
+
+def make_cache(tmp_path, **kwargs):
+    kwargs.setdefault("max_entries", 100)
+    kwargs.setdefault("max_bytes", 1024 * 1024)
+    return SQLiteResponseCache(path=str(tmp_path / "cache.sqlite3"), **kwargs)
+
+
+def test_round_trip_and_stats(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.set("a", "alpha", family="plan", namespace="user:1:")
+
+    assert cache.get("a") == "alpha"
+    assert cache.get("missing") is None
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["entries"] == 1
+    assert len(cache) == 1
+
+
+def test_occupancy_tracks_replace_delete_and_invalidate(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.set("a", "x" * 10, namespace="user:1:")
+    cache.set("a", "y" * 500, namespace="user:1:")
+    cache.set("b", "z", namespace="user:2:")
+    row_bytes = cache._conn().execute("SELECT SUM(size) FROM responses").fetchone()[0]
+    assert cache.stats()["entries"] == 2
+    assert cache.stats()["bytes"] == row_bytes
+
+    assert cache.invalidate_namespace("user:1:") == 1
+    assert cache.delete("b")
+    assert cache.stats()["entries"] == 0
+    assert cache.stats()["bytes"] == 0
+
+
+def test_occupancy_shared_between_instances(tmp_path):
+    first = make_cache(tmp_path)
+    second = make_cache(tmp_path)
+    first.set("a", "alpha")
+    second.set("b", "beta")
+
+    assert first.stats()["entries"] == 2
+    assert second.get("a") == "alpha"
+
+
+def test_evicts_least_recently_used_over_entry_budget(tmp_path):
+    cache = make_cache(tmp_path, max_entries=2)
+    cache.set("a", "alpha")
+    time.sleep(0.01)
+    cache.set("b", "beta")
+    time.sleep(0.01)
+    # Buffered hit on "a" is flushed before victims are picked
+    assert cache.get("a") == "alpha"
+    cache.set("c", "gamma")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "alpha"
+    assert cache.get("c") == "gamma"
+    assert cache.stats()["evictions"] == 1
+    assert len(cache) == 2
+
+
+def test_reads_buffer_access_times(tmp_path):
+    cache = make_cache(tmp_path, access_batch=3, access_flush_interval=3600)
+    for key in ("a", "b", "c"):
+        cache.set(key, key)
+    query = "SELECT last_access FROM responses WHERE key = 'a'"
+    stored = cache._conn().execute(query).fetchone()[0]
+
+    cache.get("a")
+    cache.get("b")
+    assert cache._conn().execute(query).fetchone()[0] == stored
+
+    cache.get("c")
+    assert cache._conn().execute(query).fetchone()[0] > stored
+
+
+def test_expired_entries_are_misses_and_purged(tmp_path):
+    cache = make_cache(tmp_path, default_ttl=1, family_ttls={"forever": 0}, purge_interval=1)
+    cache.set("short", "value")
+    cache.set("long", "value", family="forever")
+    row = cache._conn().execute("SELECT expires_at FROM responses WHERE key = 'long'").fetchone()
+    assert row[0] == 0
+
+    cache._conn().execute("UPDATE responses SET expires_at = ? WHERE key = 'short'", (time.time() - 1,))
+    cache._conn().commit()
+    assert cache.get("short") is None
+    assert cache.stats()["expirations"] == 1
+    assert cache.get("long") == "value"
+
+
+def test_oversized_value_not_cached(tmp_path):
+    cache = make_cache(tmp_path, max_bytes=64)
+    cache.set("big", "".join(chr(33 + i % 90) * 3 for i in range(500)))
+
+    assert cache.get("big") is None
+    assert len(cache) == 0
+
+
+def test_existing_file_without_meta_is_seeded(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.set("a", "alpha")
+    cache.set("b", "beta")
+    conn = cache._conn()
+    conn.execute("DROP TABLE responses_meta")
+    conn.commit()
+
+    reopened = make_cache(tmp_path)
+    assert reopened.stats()["entries"] == 2
+
+
+def other_writer_can_lock(path):
+    other = sqlite3.connect(path, timeout=0)
+    try:
+        other.execute("BEGIN IMMEDIATE")
+        other.rollback()
+        return True
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        other.close()
+
+
+def test_failed_write_rolls_back_and_releases_lock(tmp_path, monkeypatch):
+    cache = make_cache(tmp_path)
+
+    def failing_evict(conn, now):
+        raise sqlite3.OperationalError("disk I/O error")
+
+    monkeypatch.setattr(cache, "_evict", failing_evict)
+    cache.set("a", "alpha")
+
+    assert not cache._conn().in_transaction
+    assert other_writer_can_lock(cache.path)
+    assert cache._conn().execute("SELECT COUNT(*) FROM responses").fetchone()[0] == 0
+
+
+def test_failed_access_flush_still_returns_hit(tmp_path, monkeypatch):
+    cache = make_cache(tmp_path, access_batch=1)
+    cache.set("a", "alpha")
+
+    def failing_flush(conn):
+        conn.execute("UPDATE responses SET last_access = 0")
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(cache, "_flush_access", failing_flush)
+
+    assert cache.get("a") == "alpha"
+    assert cache.stats()["hits"] == 1
+    assert not cache._conn().in_transaction
+    assert other_writer_can_lock(cache.path)
@@ -0,0 +1,112 @@
+import time
+
+import pytest
+
+from ai.inference import cache_namespace, invalidate_user_cache
+from ai.prompts.health_prompts import analyze_health_metrics_key
+from fakes import FakeModel
+
+
+def analyze(engine, user_id, profile, version=0):
+    return engine.generate(
+        f"analyze {user_id} {profile}",
+        prompt_family="health_analysis",
+        cache_key_inputs=analyze_health_metrics_key(profile),
+        cache_namespace=cache_namespace("health_analysis", user_id, version)
+    )
+
+
+def test_users_with_same_bucketed_inputs_share_an_entry(engine):
+    engine.model = FakeModel()
+
+    analyze(engine, "u1", {"age": 30, "weight": 75.4})
+    analyze(engine, "u2", {"age": 31, "weight": 75.1})
+
+    assert engine.model.calls == 1
+
+
+def test_profile_change_misses_and_invalidation_frees_the_entry(engine):
+    engine.model = FakeModel()
+    analyze(engine, "u1", {"age": 30, "weight": 75})
+
+    analyze(engine, "u1", {"age": 30, "weight": 90}, version=1)
+    assert engine.model.calls == 2
+
+    assert invalidate_user_cache("u1", ["health_analysis"]) == 2
+    assert len(engine._cache) == 0
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controls time.time(), which the cache uses for entry ages and expiry."""
+    now = [1_000_000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def swr_engine(engine, monkeypatch):
+    """Builds a fresh engine with a 60s soft TTL and a 10x hard TTL factor."""
+    from ai.inference.gemini_engine import GeminiEngine
+
+    def build(family_ttls=None):
+        monkeypatch.setenv("GEMINI_SWR_SOFT_TTL", "60")
+        monkeypatch.setenv("GEMINI_SWR_HARD_TTL_FACTOR", "10")
+        if family_ttls:
+            monkeypatch.setenv("GEMINI_CACHE_FAMILY_TTLS", family_ttls)
+        GeminiEngine._instance = None
+        return GeminiEngine()
+
+    return build
+
+
+def wait_for_calls(model, calls, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while model.calls < calls and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return model.calls
+
+
+def test_swr_family_hard_ttl_defaults_above_soft_ttl(swr_engine):
+    engine = swr_engine()
+
+    assert engine._cache.ttl_for("health_analysis") == 600
+    assert engine._cache.ttl_for("plan") == engine._cache.default_ttl
+
+
+def test_swr_family_ttl_not_above_soft_ttl_is_raised(swr_engine):
+    engine = swr_engine(family_ttls="health_analysis=60,nutrition_analysis=86400")
+
+    assert engine._cache.ttl_for("health_analysis") == 600
+    assert engine._cache.ttl_for("nutrition_analysis") == 86400
+
+
+def test_swr_serves_stale_within_hard_ttl_and_refreshes(swr_engine, clock):
+    engine = swr_engine()
+    engine.model = FakeModel(script=['{"v": 1}', '{"v": 2}'])
+
+    assert engine.generate_swr("analyze", prompt_family="health_analysis") == ('{"v": 1}', 0.0)
+
+    clock[0] += 30
+    assert engine.generate_swr("analyze", prompt_family="health_analysis") == ('{"v": 1}', 30)
+    assert engine.model.calls == 1
+
+    clock[0] += 100
+    text, age = engine.generate_swr("analyze", prompt_family="health_analysis")
+    assert (text, age) == ('{"v": 1}', 130)
+    assert wait_for_calls(engine.model, 2) == 2
+
+    deadline = time.monotonic() + 5
+    while engine.generate_swr("analyze", prompt_family="health_analysis")[0] != '{"v": 2}':
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_swr_blocks_on_regeneration_after_hard_ttl(swr_engine, clock):
+    engine = swr_engine()
+    engine.model = FakeModel(script=['{"v": 1}', '{"v": 2}'])
+    engine.generate_swr("analyze", prompt_family="health_analysis")
+
+    clock[0] += 601
+
+    assert engine.generate_swr("analyze", prompt_family="health_analysis") == ('{"v": 2}', 0.0)
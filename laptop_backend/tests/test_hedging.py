@@ -0,0 +1,52 @@
+import time
+
+import pytest
+
+from ai.inference.deadline import DeadlineExceededError, deadline
+from ai.inference.hedging import HedgeBudget
+from fakes import FakeModel
+
+FAMILY = "meal_suggestions"
+
+
+@pytest.fixture
+def hedged_engine(engine):
+    """Engine hedging FAMILY after a 0.1s p90, with budget for every call."""
+    engine.hedging = True
+    engine._hedge_budget = HedgeBudget(ratio=1.0)
+    for _ in range(engine._family_latency.min_samples):
+        engine._family_latency.record(FAMILY, 0.1)
+    return engine
+
+
+def settle(engine, timeout=2.0):
+    """Wait until the engine loop has finished cleaning up and no slot is held."""
+    waited = time.monotonic() + timeout
+    while engine._scheduler.stats()["active"] and time.monotonic() < waited:
+        time.sleep(0.01)
+    return engine._scheduler.stats()["active"]
+
+
+def test_hedge_wins_and_slow_primary_is_cancelled(hedged_engine):
+    hedged_engine.model = FakeModel(delay=lambda call: 5.0 if call == 1 else 0.0)
+
+    assert hedged_engine.generate("p", prompt_family=FAMILY, use_cache=False) == '{"ok": true}'
+
+    assert hedged_engine.model.calls == 2
+    assert hedged_engine.model.cancelled == 1
+    assert hedged_engine._hedge_budget.hedge_wins == 1
+    assert settle(hedged_engine) == 0
+
+
+def test_cancel_during_hedge_delay_cancels_primary(hedged_engine):
+    hedged_engine._family_latency = type(hedged_engine._family_latency)(min_samples=1)
+    hedged_engine._family_latency.record(FAMILY, 10.0)
+    hedged_engine.model = FakeModel(delay=30.0)
+
+    with pytest.raises(DeadlineExceededError):
+        with deadline(0.2):
+            hedged_engine.generate("p", prompt_family=FAMILY, use_cache=False)
+
+    assert hedged_engine.model.calls == 1
+    assert hedged_engine.model.cancelled == 1
+    assert settle(hedged_engine) == 0
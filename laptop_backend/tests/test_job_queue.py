@@ -0,0 +1,181 @@
+"""Tests for the background job queue and its job stores."""
+
+import time
+
+import pytest
+
+from services.job_queue import (
+    FAILED, QUEUED, RUNNING, SUCCEEDED, JobQueue, MemoryJobStore, SQLiteJobStore
+)
+
+
+class RetryLater(Exception):
+    retry_after = 0
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryJobStore()
+    return SQLiteJobStore(str(tmp_path / "jobs.sqlite3"))
+
+
+def wait_for(job_queue, job_id, statuses=(SUCCEEDED, FAILED), timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = job_queue.get(job_id)
+        if job['status'] in statuses:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} stuck in {job_queue.get(job_id)['status']}")
+
+
+def make_queue(store, **kwargs):
+    kwargs.setdefault("poll_interval", 0.01)
+    return JobQueue(store, workers=1, **kwargs)
+
+
+def test_job_succeeds_with_handler_result(store):
+    job_queue = make_queue(store)
+    job_queue.register("echo", lambda user_id, payload: {"user": user_id, **payload})
+    job_id = job_queue.submit("echo", "u1", {"weeks": 2})
+
+    job = wait_for(job_queue, job_id)
+    assert job['status'] == SUCCEEDED
+    assert job['result'] == {"user": "u1", "weeks": 2}
+    assert job['attempts'] == 1
+
+
+def test_retry_after_requeues_until_max_attempts(store):
+    job_queue = make_queue(store, max_attempts=3)
+    job_queue.register("busy", lambda user_id, payload: (_ for _ in ()).throw(RetryLater("saturated")))
+    job_id = job_queue.submit("busy", "u1", {})
+
+    job = wait_for(job_queue, job_id, statuses=(FAILED,))
+    assert job['attempts'] == 3
+    assert job['error'] == "saturated"
+
+
+def test_submit_rejects_unknown_kind(store):
+    with pytest.raises(ValueError):
+        make_queue(store).submit("unknown", "u1", {})
+
+
+def test_start_runs_jobs_queued_before_restart(store):
+    job_id = store.create("echo", "u1", {})
+    job_queue = make_queue(store)
+    job_queue.register("echo", lambda user_id, payload: "done")
+    job_queue.start()
+
+    assert wait_for(job_queue, job_id)['result'] == "done"
+
+
+def test_worker_survives_store_errors(store, monkeypatch):
+    job_queue = make_queue(store)
+    job_queue.register("echo", lambda user_id, payload: "done")
+    real_finish = store.finish
+    failures = []
+
+    def flaky_finish(job_id, status, result=None, error=None):
+        if not failures:
+            failures.append(job_id)
+            raise RuntimeError("database is locked")
+        real_finish(job_id, status, result, error)
+
+    monkeypatch.setattr(store, "finish", flaky_finish)
+    first = job_queue.submit("echo", "u1", {})
+    second = job_queue.submit("echo", "u2", {})
+
+    assert wait_for(job_queue, second)['status'] == SUCCEEDED
+    assert failures == [first]
+    assert job_queue.get(first)['status'] == RUNNING
+
+
+def test_stale_check_respects_heartbeat(tmp_path):
+    store = SQLiteJobStore(str(tmp_path / "jobs.sqlite3"))
+    live = store.create("plan", "u1", {})
+    dead = store.create("plan", "u2", {})
+    store.claim_next()
+    store.claim_next()
+    long_ago = time.time() - 600
+    store._conn().execute("UPDATE jobs SET started_at = ?, heartbeat_at = ?", (long_ago, long_ago))
+    # The live job's process is still renewing its lease
+    store.heartbeat([live])
+
+    assert store.requeue_stale(120) == (1, 0)
+    assert store.get(live)['status'] == RUNNING
+    assert store.get(dead)['status'] == QUEUED
+
+
+def test_stale_job_out_of_attempts_is_failed(tmp_path):
+    store = SQLiteJobStore(str(tmp_path / "jobs.sqlite3"))
+    poison = store.create("plan", "u1", {})
+    retry = store.create("plan", "u2", {})
+    store.claim_next()
+    store.claim_next()
+    long_ago = time.time() - 600
+    store._conn().execute("UPDATE jobs SET started_at = ?, heartbeat_at = ?", (long_ago, long_ago))
+    store._conn().execute("UPDATE jobs SET attempts = 3 WHERE id = ?", (poison,))
+
+    assert store.requeue_stale(120, max_attempts=3) == (1, 1)
+    job = store.get(poison)
+    assert job['status'] == FAILED
+    assert job['error'] == "Gave up after 3 attempts"
+    assert store.get(retry)['status'] == QUEUED
+
+
+def test_claim_fails_queued_job_out_of_attempts(store):
+    poison = store.create("plan", "u1", {})
+    for _ in range(2):
+        store.claim_next()
+        store.requeue(poison, 0)
+    fresh = store.create("plan", "u2", {})
+
+    assert store.claim_next(max_attempts=2)['id'] == fresh
+    assert store.get(poison)['status'] == FAILED
+    assert store.get(poison)['finished_at'] is not None
+
+
+def test_unknown_kind_requeue_keeps_attempts(store):
+    job_id = store.create("other", "u1", {})
+    job_queue = make_queue(store, max_attempts=1)
+    job_queue.register("echo", lambda user_id, payload: "done")
+    job_queue.start()
+    time.sleep(0.1)
+
+    # Bounced many times by this process, but never failed for it
+    assert store.get(job_id)['status'] in (QUEUED, RUNNING)
+
+
+def test_purge_finished_keeps_pending_and_recent_jobs(store):
+    old_done, old_failed, recent, queued = (store.create("plan", f"u{i}", {}) for i in range(4))
+    for job_id in (old_done, old_failed, recent):
+        store.claim_next()
+    store.finish(old_done, SUCCEEDED, result="ok")
+    store.finish(old_failed, FAILED, error="boom")
+    store.finish(recent, SUCCEEDED, result="ok")
+    time.sleep(0.05)
+    store.finish(recent, SUCCEEDED, result="ok")
+
+    assert store.purge_finished(0.03) == 2
+    assert store.get(old_done) is None
+    assert store.get(old_failed) is None
+    assert store.get(recent)['status'] == SUCCEEDED
+    assert store.get(queued)['status'] == QUEUED
+
+
+def test_running_job_lease_is_renewed(tmp_path):
+    store = SQLiteJobStore(str(tmp_path / "jobs.sqlite3"))
+    job_queue = JobQueue(store, workers=1, poll_interval=0.01, stale_after=3, heartbeat_interval=0.05)
+    job_queue.register("slow", lambda user_id, payload: time.sleep(0.3) or "done")
+    job_id = job_queue.submit("slow", "u1", {})
+
+    running = wait_for(job_queue, job_id, statuses=(RUNNING,))
+    time.sleep(0.2)
+    assert job_queue.get(job_id)['heartbeat_at'] > running['heartbeat_at']
+    assert wait_for(job_queue, job_id)['status'] == SUCCEEDED
+
+
+def test_heartbeat_interval_kept_below_stale_after():
+    job_queue = JobQueue(MemoryJobStore(), stale_after=60, heartbeat_interval=60)
+    assert job_queue.heartbeat_interval == 20
@@ -0,0 +1,120 @@
+"""Tests for the adaptive concurrency limit and the scheduler outcomes that drive it."""
+
+import pytest
+
+from ai.inference.limiter import AdaptiveLimiter
+from ai.inference.scheduler import InferenceScheduler
+from fakes import ApiError, FakeModel
+
+
+def test_limit_grows_when_saturated_and_healthy():
+    limiter = AdaptiveLimiter(initial_limit=2, max_limit=4, window=4)
+    for _ in range(4):
+        limiter.on_sample(1.0, True, in_flight=2)
+
+    assert limiter.limit == 3
+    assert limiter.stats()["increases"] == 1
+
+
+def test_idle_limit_does_not_grow():
+    limiter = AdaptiveLimiter(initial_limit=2, window=4)
+    for _ in range(4):
+        limiter.on_sample(1.0, True, in_flight=1)
+
+    assert limiter.limit == 2
+
+
+def test_congestion_backs_off_to_floor():
+    limiter = AdaptiveLimiter(initial_limit=8, min_limit=2, window=4)
+    limiter.on_sample(1.0, False, in_flight=8)
+    assert limiter.limit == 5
+    for _ in range(5):
+        limiter.on_sample(1.0, False, in_flight=1)
+    assert limiter.limit == 2
+
+
+def test_slow_window_backs_off_against_fixed_target():
+    limiter = AdaptiveLimiter(initial_limit=4, latency_target=2.0, window=2)
+    limiter.on_sample(3.0, True, in_flight=1)
+    limiter.on_sample(3.0, True, in_flight=1)
+
+    assert limiter.limit == 2
+
+
+def test_slow_bulk_calls_do_not_back_off_healthy_interactive_traffic():
+    limiter = AdaptiveLimiter(initial_limit=4, window=4)
+    for _ in range(4):
+        limiter.on_sample(1.0, True, in_flight=1, priority='interactive')
+    for _ in range(8):
+        limiter.on_sample(30.0, True, in_flight=1, priority='bulk')
+    for _ in range(4):
+        limiter.on_sample(1.1, True, in_flight=1, priority='interactive')
+
+    assert limiter.limit == 4
+    assert limiter.stats()["decreases"] == 0
+    assert limiter.stats()["classes"]["interactive"]["baseline_latency"] < 2.0
+    assert limiter.stats()["classes"]["bulk"]["baseline_latency"] == 30.0
+
+
+def test_bulk_calls_back_off_against_their_own_baseline():
+    limiter = AdaptiveLimiter(initial_limit=4, latency_target=2.0, window=2)
+    for _ in range(2):
+        limiter.on_sample(20.0, True, in_flight=1, priority='bulk')
+    assert limiter.limit == 4
+
+    for _ in range(2):
+        limiter.on_sample(60.0, True, in_flight=1, priority='bulk')
+    assert limiter.limit == 2
+
+
+def test_scheduler_samples_under_the_slot_priority():
+    scheduler = InferenceScheduler(limiter=AdaptiveLimiter(initial_limit=4, window=10))
+    with scheduler.slot('bulk'):
+        pass
+
+    assert list(scheduler.stats()["adaptive"]["classes"]) == ["bulk"]
+
+
+def run_in_slot(scheduler, error):
+    with pytest.raises(type(error)):
+        with scheduler.slot():
+            raise error
+
+
+@pytest.mark.parametrize("error", [ApiError(400, "invalid schema"), ValueError("bad prompt"), RuntimeError("blocked")])
+def test_client_errors_do_not_shrink_limit(error):
+    scheduler = InferenceScheduler(limiter=AdaptiveLimiter(initial_limit=4, window=10))
+    for _ in range(4):
+        run_in_slot(scheduler, error)
+
+    assert scheduler.limit == 4
+    assert scheduler.stats()["active"] == 0
+
+
+@pytest.mark.parametrize("error", [ApiError(429), ApiError(503), TimeoutError("slow"), ConnectionError("reset")])
+def test_congestion_errors_shrink_limit(error):
+    scheduler = InferenceScheduler(limiter=AdaptiveLimiter(initial_limit=4, window=10))
+    run_in_slot(scheduler, error)
+
+    assert scheduler.limit == 2
+
+
+def test_abandoned_slot_is_freed_without_sample():
+    scheduler = InferenceScheduler(limiter=AdaptiveLimiter(initial_limit=4, window=10))
+    for _ in range(3):
+        run_in_slot(scheduler, GeneratorExit())
+
+    assert scheduler.limit == 4
+    assert scheduler.stats()["active"] == 0
+
+
+def test_disconnected_stream_clients_do_not_shrink_limit(engine):
+    engine.model = FakeModel(default='{"weeks": [1, 2, 3, 4, 5, 6, 7, 8]}')
+    engine._scheduler.limiter = AdaptiveLimiter(initial_limit=8, window=10)
+    for client in range(3):
+        stream = engine.generate_stream(f"plan for client {client}", use_cache=False)
+        next(stream)
+        stream.close()
+
+    assert engine._scheduler.limit == 8
+    assert engine._scheduler.stats()["active"] == 0
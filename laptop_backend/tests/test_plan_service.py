@@ -0,0 +1,107 @@
+import copy
+
+import pytest
+
+from services import plan_service, tracking_service
+from fakes import FakeFirestore
+
+# A stored document with user edits, legacy shapes and values normalization would rewrite
+STORED = {
+    "name": "Asha",
+    "diet": [
+        {"weekName": "Week 1", "meals": {"breakfast": {"dishName": "Poha", "calories": 300}}},
+        {"week": "Week 2", "breakfast": {"dishName": "Idli", "calories": "2-3 pieces"}},
+        "corrupt week",
+    ],
+    "workouts": [
+        {"weekName": "Week 1", "exercises": [
+            {"workoutId": "w1", "sets": 4, "reps": 12, "completed": False},
+            {"name": "Plank", "sets": "3x", "reps": "30s", "workoutId": "w2", "completed": False},
+        ]},
+        42,
+    ],
+}
+
+
+@pytest.fixture
+def db(monkeypatch):
+    fake = FakeFirestore()
+    for module in (plan_service, tracking_service):
+        monkeypatch.setattr(module, "db", fake)
+    fake.collection("users").document("u1").set(copy.deepcopy(STORED))
+    return fake
+
+
+def stored(db):
+    return db.collection("users").document("u1").get().to_dict()
+
+
+def test_find_stored_week_matches_week_or_week_name():
+    assert plan_service.find_stored_week(STORED["diet"], "Week 1") is STORED["diet"][0]
+    assert plan_service.find_stored_week(STORED["diet"], "Week 2") is STORED["diet"][1]
+    assert plan_service.find_stored_week(STORED["diet"], "Week 3") is None
+    assert plan_service.find_stored_week("not a list", "Week 1") is None
+
+
+def test_toggle_workout_changes_only_the_target_field(db):
+    result, status = tracking_service.toggle_workout_status("u1", "Week 1", "w1", True)
+
+    assert status == 200, result
+    expected = copy.deepcopy(STORED)
+    expected["workouts"][0]["exercises"][0]["completed"] = True
+    assert stored(db) == expected
+
+
+def test_meal_completion_changes_only_the_target_meal(db):
+    _, status = tracking_service.update_meal_completion("u1", "Week 2", "breakfast", "Dosa")
+
+    assert status == 200
+    expected = copy.deepcopy(STORED)
+    expected["diet"][1]["breakfast"].update(actualMeal="Dosa", completed=True)
+    assert stored(db) == expected
+
+
+def test_meal_completion_patches_legacy_meals_map(db):
+    _, status = tracking_service.update_meal_completion("u1", "Week 1", "breakfast", "Upma")
+
+    assert status == 200
+    expected = copy.deepcopy(STORED)
+    expected["diet"][0]["meals"]["breakfast"].update(actualMeal="Upma", completed=True)
+    assert stored(db) == expected
+
+
+def test_missing_targets_leave_document_untouched(db):
+    assert tracking_service.toggle_workout_status("u1", "Week 1", "nope", True)[1] == 404
+    assert tracking_service.update_meal_completion("u1", "Week 1", "dinner", "x")[1] == 404
+    assert tracking_service.update_meal_completion("u1", "Week 9", "lunch", "x")[1] == 404
+    assert stored(db) == STORED
+
+
+def test_update_week_workouts_replaces_only_that_week(db):
+    exercises = [{"name": "Lunge", "sets": "3", "reps": "12", "completed": False}]
+
+    _, status = plan_service.update_week_workouts("u1", "Week 1", exercises)
+
+    assert status == 200
+    expected = copy.deepcopy(STORED)
+    expected["workouts"][0]["exercises"] = exercises
+    assert stored(db) == expected
+
+
+def test_update_week_meals_replaces_only_given_meals(db):
+    dinner = {"dishName": "Khichdi", "calories": "450", "protein": "15g",
+              "carbs": "70g", "fats": "8g", "completed": False}
+
+    _, status = plan_service.update_week_meals("u1", "Week 2", {"dinner": dinner})
+
+    assert status == 200
+    expected = copy.deepcopy(STORED)
+    expected["diet"][1]["dinner"] = dinner
+    assert stored(db) == expected
+
+
+def test_get_plan_returns_stored_arrays(db):
+    result, status = plan_service.get_plan("u1")
+
+    assert status == 200
+    assert result == {"plan": {"diet": STORED["diet"], "workouts": STORED["workouts"]}}
@@ -0,0 +1,115 @@
+"""Tests for normalizing generated plan payloads."""
+
+import pytest
+
+from ai.utils.plan_validation import (
+    PlanValidationError, normalize_diet_week, normalize_exercise, normalize_exercises,
+    normalize_meal, normalize_plan, normalize_workout_week
+)
+
+
+@pytest.mark.parametrize("raw, expected", [
+    (400, "400"),
+    (399.6, "400"),
+    ("400", "400"),
+    ("400 kcal", "400"),
+    (" 450Calories ", "450"),
+    ("300-400 kcal", "300-400 kcal"),
+    ("about 400", "about 400"),
+    ("~400kcal", "~400kcal"),
+])
+def test_calories_only_coerced_when_whole_value_is_numeric(raw, expected):
+    assert normalize_meal({"dishName": "Oats", "calories": raw})["calories"] == expected
+
+
+@pytest.mark.parametrize("raw, expected", [
+    (15, "15g"),
+    ("15 g", "15g"),
+    ("12.5 grams", "12.5g"),
+    ("10-15g", "10-15g"),
+    ("2 scoops", "2 scoops"),
+])
+def test_macros_only_coerced_when_whole_value_is_numeric(raw, expected):
+    assert normalize_meal({"dishName": "Oats", "protein": raw})["protein"] == expected
+
+
+@pytest.mark.parametrize("raw, expected", [
+    (3, "3"),
+    ("3", "3"),
+    ("3-4", "3-4"),
+    ("2x10", "2x10"),
+    ("AMRAP", "AMRAP"),
+])
+def test_sets_kept_as_written_unless_numeric(raw, expected):
+    assert normalize_exercise({"name": "Squat", "sets": raw})["sets"] == expected
+
+
+def test_reps_keep_time_and_per_side_values():
+    assert normalize_exercise({"name": "Plank", "reps": "30s"})["reps"] == "30s"
+    assert normalize_exercise({"name": "Lunge", "reps": 10})["reps"] == "10"
+    assert normalize_exercise({"name": "Run", "duration": "20 min"})["reps"] == "20 min"
+
+
+def test_meal_aliases_flags_and_passthrough():
+    meal = normalize_meal({"name": "Oats", "kcal": 300, "fat": "5 g", "completed": "true", "actualMeal": "Toast"})
+
+    assert meal["dishName"] == "Oats"
+    assert meal["calories"] == "300"
+    assert meal["fats"] == "5g"
+    assert meal["completed"] is True
+    assert meal["actualMeal"] == "Toast"
+
+
+def test_bare_string_meal_and_exercise():
+    assert normalize_meal("Oats")["dishName"] == "Oats"
+    assert normalize_exercises(["Squat"])[0]["name"] == "Squat"
+
+
+def test_missing_meals_stay_missing():
+    week = normalize_diet_week({"weekName": "Week 1", "breakfast": {"dishName": "Oats"}})
+
+    assert week["week"] == "Week 1"
+    assert "lunch" not in week
+    assert "dinner" not in week
+    assert normalize_meal(None) is None
+
+
+def test_diet_week_without_meals_is_rejected():
+    with pytest.raises(PlanValidationError) as info:
+        normalize_diet_week({"week": "Week 1", "meals": {}}, "diet[0]")
+    assert info.value.path == "diet[0]"
+
+
+def test_workout_week_requires_exercise_names():
+    with pytest.raises(PlanValidationError) as info:
+        normalize_workout_week({"week": "Week 1", "exercises": [{"sets": 3}]}, "workouts[0]")
+    assert info.value.path == "workouts[0].exercises[0]"
+
+    with pytest.raises(PlanValidationError):
+        normalize_workout_week({"week": "Week 1", "exercises": "Squat"})
+
+
+def test_normalize_plan_drops_invalid_weeks_and_reports_them():
+    plan, errors = normalize_plan({
+        "diet": [{"week": "Week 1", "breakfast": "Oats"}, "not a week"],
+        "workouts": [{"week": "Week 1", "workouts": [{"name": "Squat"}]}, {"week": "Week 2"}],
+    })
+
+    assert [week["week"] for week in plan["diet"]] == ["Week 1"]
+    assert plan["workouts"][0]["exercises"][0]["name"] == "Squat"
+    assert len(plan["workouts"]) == 1
+    assert len(errors) == 2
+
+
+def test_aliases_are_replaced_by_canonical_keys():
+    meal = normalize_meal({"name": "Oats", "kcal": 300, "fat": "5 g", "carbohydrates": 40})
+    assert set(meal) == {"dishName", "calories", "fats", "carbs", "completed"}
+
+    week = normalize_workout_week({"weekName": "Week 1", "title": "Legs", "workouts": [{"exercise": "Squat"}]})
+    assert set(week) == {"week", "workoutName", "completed", "exercises"}
+    assert week["exercises"] == [{"name": "Squat", "completed": False}]
+
+
+def test_missing_optional_fields_are_left_out():
+    assert normalize_exercise({"name": "Squat"}) == {"name": "Squat", "completed": False}
+    assert normalize_meal({"calories": None}) == {"completed": False}
@@ -0,0 +1,69 @@
+import threading
+import time
+
+import pytest
+
+from ai.inference.refresher import BackgroundRefresher
+from services import precompute
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+@pytest.fixture
+def runs(monkeypatch):
+    """Replaces _precompute with a fake that records which profiles each run saw."""
+    profiles = set()
+    seen = []
+    first_run_started = threading.Event()
+    release_first_run = threading.Event()
+
+    def fake_precompute(user_id):
+        seen.append(frozenset(profiles))
+        if len(seen) == 1:
+            first_run_started.set()
+            release_first_run.wait(5)
+
+    monkeypatch.setattr(precompute, "_pool", BackgroundRefresher(workers=1))
+    monkeypatch.setattr(precompute, "_precompute", fake_precompute)
+    return profiles, seen, first_run_started, release_first_run
+
+
+def test_profile_write_during_run_triggers_one_more_run(runs):
+    profiles, seen, first_run_started, release_first_run = runs
+
+    profiles.add("health")
+    precompute.schedule_precompute("u1")
+    assert first_run_started.wait(5)
+
+    profiles.add("nutrition")
+    precompute.schedule_precompute("u1")
+    precompute.schedule_precompute("u1")
+    release_first_run.set()
+
+    assert wait_until(lambda: precompute._pool.stats()["pending"] == 0)
+    assert seen == [{"health"}, {"health", "nutrition"}]
+
+
+def test_refresher_without_rerun_deduplicates():
+    pool = BackgroundRefresher(workers=1)
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def refresh():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+
+    assert pool.submit("k", refresh)
+    assert started.wait(5)
+    assert not pool.submit("k", refresh)
+    release.set()
+
+    assert wait_until(lambda: pool.stats()["pending"] == 0)
+    assert len(calls) == 1
+    assert pool.stats()["deduplicated"] == 1
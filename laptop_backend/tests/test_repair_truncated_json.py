@@ -0,0 +1,108 @@
+"""Tests for salvaging truncated JSON output."""
+
+import json
+
+import pytest
+
+from ai.utils.model_utils import format_response, repair_truncated_json
+
+EXERCISES = '{"exercises": [{"name": "Squat", "sets": "3"}, {"name": "Bench", "sets": "4"}]}'
+
+
+@pytest.mark.parametrize("cut_after", [
+    '{"name": "Bench", "se',            # mid-key
+    '{"name": "Bench", "sets": "4',     # mid-value
+    '{"name": "Bench", "sets": ',       # after a colon
+    '{"name": "Bench"',                 # after a complete member
+    '{"name": "Bench",',                # after a member comma
+    '{',                                # element just opened
+])
+def test_partial_exercise_is_dropped(cut_after):
+    text = EXERCISES[:EXERCISES.index('{"name": "Bench"')] + cut_after
+
+    data, report = repair_truncated_json(text)
+    assert data == {"exercises": [{"name": "Squat", "sets": "3"}]}
+    assert report["closed"] == "]}"
+    assert report["dropped_chars"] > 0
+
+
+def test_week_open_mid_nested_object_is_dropped():
+    week_1 = {"week": "Week 1", "breakfast": {"name": "Oats"}, "lunch": {"name": "Salad"}}
+    text = json.dumps({"diet": [week_1]})[:-2] + ', {"week": "Week 2", "breakfast": {"name": "Eggs"}, "lunch": {"na'
+
+    data, _ = repair_truncated_json(text)
+    assert data == {"diet": [week_1]}
+
+
+def test_nested_array_keeps_its_complete_elements():
+    text = (
+        '{"workouts": [{"week": "Week 1", "exercises": [{"name": "Squat"}]}, '
+        '{"week": "Week 2", "exercises": [{"name": "Row"}, {"name": "Pu'
+    )
+
+    data, report = repair_truncated_json(text)
+    assert data == {"workouts": [
+        {"week": "Week 1", "exercises": [{"name": "Squat"}]},
+        {"week": "Week 2", "exercises": [{"name": "Row"}]},
+    ]}
+    assert report["closed"] == "]}]}"
+
+
+def test_element_without_complete_inner_items_is_dropped():
+    text = '{"workouts": [{"week": "Week 1", "exercises": [{"name": "Squat"}]}, {"week": "Week 2", "exercises": [{"na'
+
+    data, _ = repair_truncated_json(text)
+    assert data == {"workouts": [{"week": "Week 1", "exercises": [{"name": "Squat"}]}]}
+
+
+def test_arrays_of_arrays_keep_complete_elements():
+    data, report = repair_truncated_json('{"grid": [[1, 2], [3, 4], [5, ')
+
+    assert data == {"grid": [[1, 2], [3, 4], [5]]}
+    assert report["closed"] == "]]}"
+
+
+def test_complete_root_members_are_kept():
+    data, _ = repair_truncated_json('{"plan_name": "Cut", "diet": [{"week": "Week 1"}], "workouts": [{"we')
+
+    assert data == {"plan_name": "Cut", "diet": [{"week": "Week 1"}], "workouts": []}
+
+
+def test_brackets_and_escapes_inside_strings_are_ignored():
+    text = '{"notes": ["say \\"hi\\" {ok}", "a]b"], "more": ["x\\\\", "y'
+
+    data, _ = repair_truncated_json(text)
+    assert data == {"notes": ['say "hi" {ok}', "a]b"], "more": ["x\\"]}
+
+
+def test_complete_object_with_trailing_chatter():
+    data, report = repair_truncated_json('Plan: ' + EXERCISES + '\nHope this helps')
+
+    assert data == json.loads(EXERCISES)
+    assert report["closed"] == ""
+
+
+@pytest.mark.parametrize("text", [
+    "no json here",
+    '{"name": "Sq',
+    '{"workouts": [{"week": "Week 1", "exerc',
+    '{"workouts": [{"week": "Week 1", "exercises": [{"name": "Sq',
+    '{"summary": "Stay active", "workouts": [',
+])
+def test_nothing_to_salvage(text):
+    assert repair_truncated_json(text)[0] is None
+
+
+def test_format_response_fails_when_nothing_is_salvaged():
+    result = format_response('{"workouts": [{"name": "Sq', expected_format="json", repair=True)
+
+    assert not result["success"]
+    assert "repaired" not in result
+
+
+def test_format_response_marks_repaired_output():
+    result = format_response(EXERCISES[:-10], expected_format="json", repair=True)
+
+    assert result["success"]
+    assert result["repaired"]
+    assert result["data"] == {"exercises": [{"name": "Squat", "sets": "3"}]}
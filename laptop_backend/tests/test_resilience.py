@@ -0,0 +1,135 @@
+import pytest
+
+from ai.inference import resilience
+from ai.inference.resilience import (
+    CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, RetryPolicy,
+    UpstreamUnavailableError, is_congestion, is_retryable
+)
+from ai.inference.deadline import DeadlineExceededError, UpstreamTimeoutError
+from fakes import ApiError, FakeModel
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controls time.monotonic() as seen by the breaker."""
+    now = [100.0]
+    monkeypatch.setattr(resilience.time, "monotonic", lambda: now[0])
+    return now
+
+
+@pytest.mark.parametrize("error, retryable", [
+    (ApiError(429), True),
+    (ApiError(503), True),
+    (ApiError(400), False),
+    (ConnectionError(), True),
+    (TimeoutError(), True),
+    (ValueError(), False),
+    (UpstreamUnavailableError("down", 5), False),
+])
+def test_is_retryable(error, retryable):
+    assert is_retryable(error) is retryable
+    assert is_congestion(error) is retryable
+
+
+def test_only_full_upstream_timeouts_are_congestion():
+    assert not is_retryable(DeadlineExceededError())
+    assert not is_congestion(DeadlineExceededError())
+    assert is_congestion(UpstreamTimeoutError())
+
+
+def test_backoff_is_jittered_and_capped(monkeypatch):
+    policy = RetryPolicy(max_attempts=5, base_delay=1.0, max_delay=4.0)
+    monkeypatch.setattr(resilience.random, "uniform", lambda low, high: high)
+
+    assert [policy.backoff(attempt) for attempt in (1, 2, 3, 4)] == [1.0, 2.0, 4.0, 4.0]
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=10)
+
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.retry_after() == 11
+
+
+def test_breaker_half_open_lets_one_probe_through(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+    breaker.record_failure()
+
+    clock[0] += 10
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+    clock[0] += 10
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+
+
+def test_lost_probe_is_replaced_after_reset_timeout(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+    breaker.record_failure()
+    clock[0] += 10
+    assert breaker.allow()
+
+    clock[0] += 10
+    assert breaker.allow()
+    assert breaker.stats()["probes"] == 2
+
+
+def test_zero_threshold_disables_breaker():
+    breaker = CircuitBreaker(failure_threshold=0)
+    for _ in range(10):
+        breaker.record_failure()
+    assert breaker.allow()
+
+
+def test_engine_retries_transient_errors(engine):
+    engine.model = FakeModel(script=[ApiError(503), ApiError(429)])
+
+    assert engine.generate("p", use_cache=False) == '{"ok": true}'
+    assert engine.model.calls == 3
+    assert engine._retry.retries == 2
+
+
+def test_engine_gives_up_after_max_attempts(engine):
+    engine.model = FakeModel(default=ApiError(503))
+
+    with pytest.raises(UpstreamUnavailableError):
+        engine.generate("p", use_cache=False)
+    assert engine.model.calls == engine._retry.max_attempts
+    assert engine._retry.exhausted == 1
+
+
+def test_engine_does_not_retry_client_errors(engine):
+    engine.model = FakeModel(script=[ApiError(400)])
+
+    with pytest.raises(ApiError):
+        engine.generate("p", use_cache=False)
+    assert engine.model.calls == 1
+
+
+def test_open_breaker_fails_fast_without_calling_upstream(engine):
+    engine._breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    engine.model = FakeModel(default=ApiError(503))
+    with pytest.raises(UpstreamUnavailableError):
+        engine.generate("p", use_cache=False)
+    calls = engine.model.calls
+
+    with pytest.raises(CircuitOpenError) as raised:
+        engine.generate("p", use_cache=False)
+    assert engine.model.calls == calls
+    assert raised.value.retry_after > 0
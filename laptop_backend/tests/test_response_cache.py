@@ -0,0 +1,91 @@
+"""Tests for the in-memory response cache."""
+
+from ai.inference.response_cache import (
+    ResponseCache, cache_namespace, namespace_prefix, parse_family_ttls
+)
+
+
+def test_lru_eviction_over_entry_budget():
+    cache = ResponseCache(max_entries=2)
+    cache.set("a", "alpha")
+    cache.set("b", "beta")
+    assert cache.get("a") == "alpha"
+    cache.set("c", "gamma")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "alpha"
+    assert cache.get("c") == "gamma"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_eviction_over_byte_budget():
+    cache = ResponseCache(max_entries=100, max_bytes=30)
+    cache.set("a", "x" * 10)
+    cache.set("b", "y" * 10)
+    cache.set("c", "z" * 10)
+
+    assert cache.get("a") is None
+    assert cache.stats()["bytes"] <= 30
+    assert len(cache) == 2
+
+
+def test_replacing_a_key_releases_its_bytes():
+    cache = ResponseCache()
+    cache.set("a", "x" * 100)
+    cache.set("a", "y")
+
+    assert cache.stats()["bytes"] == len("a") + len("y")
+    assert cache.get("a") == "y"
+
+
+def test_oversized_value_not_cached():
+    cache = ResponseCache(max_bytes=10)
+    cache.set("a", "x" * 100)
+
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_ttl_expiry_and_family_overrides(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("ai.inference.response_cache.time.time", lambda: now[0])
+    cache = ResponseCache(default_ttl=10, family_ttls={"long": 100, "forever": 0})
+    cache.set("default", "d")
+    cache.set("long", "l", family="long")
+    cache.set("forever", "f", family="forever")
+
+    now[0] += 11
+    assert cache.get("default") is None
+    assert cache.get("long") == "l"
+    now[0] += 1000
+    assert cache.get("long") is None
+    assert cache.get("forever") == "f"
+    assert cache.stats()["expirations"] == 2
+
+
+def test_get_with_age(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("ai.inference.response_cache.time.time", lambda: now[0])
+    cache = ResponseCache()
+    cache.set("a", "alpha")
+    now[0] += 42
+
+    assert cache.get_with_age("a") == ("alpha", 42.0)
+
+
+def test_invalidate_namespace_drops_every_version():
+    cache = ResponseCache()
+    cache.set("v1", "old", namespace=cache_namespace("health_analysis", "u1", 1))
+    cache.set("v2", "new", namespace=cache_namespace("health_analysis", "u1", 2))
+    cache.set("other", "kept", namespace=cache_namespace("health_analysis", "u2", 1))
+
+    assert cache.invalidate_namespace(namespace_prefix("health_analysis", "u1")) == 2
+    assert cache.get("other") == "kept"
+
+
+def test_parse_family_ttls_skips_invalid_items():
+    assert parse_family_ttls("plan=60, health_analysis = 0,bad,worse=x") == {
+        "plan": 60,
+        "health_analysis": 0
+    }
+    assert parse_family_ttls(None) == {}
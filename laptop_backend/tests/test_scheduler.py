@@ -0,0 +1,57 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from ai.inference.scheduler import InferenceScheduler, SchedulerFullError
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_async_acquire_and_release():
+    scheduler = InferenceScheduler(max_concurrency=1)
+
+    asyncio.run(scheduler.acquire_async())
+    assert scheduler.stats()["active"] == 1
+    scheduler.release()
+    assert scheduler.stats()["active"] == 0
+
+
+@pytest.fixture
+def loop():
+    """A long-lived event loop on its own thread, like the engine's."""
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield loop
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(5)
+
+
+def test_cancelled_async_wait_does_not_leak_the_slot(loop):
+    scheduler = InferenceScheduler(max_concurrency=1, queue_timeout=5)
+    scheduler.acquire()
+
+    waiting = asyncio.run_coroutine_threadsafe(asyncio.wait_for(scheduler.acquire_async(), 0.05), loop)
+    with pytest.raises(asyncio.TimeoutError):
+        waiting.result(5)
+    assert scheduler.stats()["queue_depth"] == 1
+
+    # The abandoned waiter takes the freed slot and gives it straight back
+    scheduler.release()
+    assert wait_until(lambda: scheduler.stats()["queue_depth"] == 0 and scheduler.stats()["active"] == 0)
+    assert scheduler.try_acquire()
+
+
+def test_async_acquire_raises_when_queue_is_full():
+    scheduler = InferenceScheduler(max_concurrency=1, max_queue=0)
+    scheduler.acquire()
+
+    with pytest.raises(SchedulerFullError):
+        asyncio.run(scheduler.acquire_async())
@@ -0,0 +1,92 @@
+"""Tests for single-flight coalescing of identical in-flight calls."""
+
+import threading
+import time
+
+import pytest
+
+from ai.inference.single_flight import LeaderAbandonedError, SingleFlight
+
+
+def test_followers_share_leader_result():
+    flight = SingleFlight()
+    future, is_leader = flight.join("k")
+    same, follower_is_leader = flight.join("k")
+
+    assert is_leader and not follower_is_leader
+    assert same is future
+    flight.complete("k", result="value")
+    assert same.result(timeout=1) == "value"
+    assert flight.stats() == {"leader_calls": 1, "coalesced_calls": 1, "in_flight": 0}
+
+
+def test_key_is_forgotten_after_completion():
+    flight = SingleFlight()
+    flight.join("k")
+    flight.complete("k", result="first")
+
+    _, is_leader = flight.join("k")
+    assert is_leader
+
+
+def test_followers_receive_leader_exception():
+    flight = SingleFlight()
+    flight.join("k")
+    future, _ = flight.join("k")
+    flight.complete("k", error=ValueError("boom"))
+
+    with pytest.raises(ValueError):
+        future.result(timeout=1)
+
+
+@pytest.mark.parametrize("exit_error", [KeyboardInterrupt(), SystemExit(1), GeneratorExit()])
+def test_base_exception_exit_becomes_abandoned_error(exit_error):
+    flight = SingleFlight()
+    flight.join("k")
+    future, _ = flight.join("k")
+    flight.complete("k", error=exit_error)
+
+    with pytest.raises(LeaderAbandonedError) as info:
+        future.result(timeout=1)
+    assert info.value.__cause__ is exit_error
+
+
+def test_engine_leader_exiting_with_base_exception_releases_followers(engine, monkeypatch):
+    started = threading.Event()
+    release = threading.Event()
+
+    def leader_call(*args, **kwargs):
+        started.set()
+        release.wait(5)
+        raise KeyboardInterrupt()
+
+    monkeypatch.setattr(engine, "_generate_uncached", leader_call)
+    # Without the fix the follower would wait out the whole call timeout
+    monkeypatch.setattr(engine, "timeout", 5)
+    outcome = {}
+
+    def lead():
+        try:
+            engine.generate("same prompt")
+        except KeyboardInterrupt:
+            outcome["leader"] = "interrupted"
+
+    def follow():
+        try:
+            engine.generate("same prompt")
+        except LeaderAbandonedError:
+            outcome["follower"] = "abandoned"
+
+    leader = threading.Thread(target=lead)
+    leader.start()
+    assert started.wait(5)
+    follower = threading.Thread(target=follow)
+    follower.start()
+    waited = time.monotonic() + 5
+    while engine._inflight.stats()["coalesced_calls"] == 0 and time.monotonic() < waited:
+        time.sleep(0.01)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+
+    assert outcome == {"leader": "interrupted", "follower": "abandoned"}
@@ -0,0 +1,72 @@
+"""Tests for the incremental streaming JSON parser."""
+
+import json
+
+import pytest
+
+from ai.utils.model_utils import StreamingJSONParser
+
+PLAN = {
+    "diet": [
+        {"week": "Week 1", "breakfast": {"name": "Oats {with} \"berries\""}, "notes": "a\\b"},
+        {"week": "Week 2", "breakfast": {"name": "Eggs [2]"}, "tags": ["x", {"y": 1}]},
+    ],
+    "summary": "done",
+    "workouts": [{"week": "Week 1", "exercises": [{"name": "Squat", "sets": "3"}]}],
+    "ignored": [{"not": "emitted"}],
+}
+OUTPUT = "Here is your plan:\n```json\n" + json.dumps(PLAN, indent=2) + "\n```\nEnjoy!"
+
+
+def feed_in_chunks(parser, text, size):
+    items = []
+    for i in range(0, len(text), size):
+        items.extend(parser.feed(text[i:i + size]))
+    return items
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 16, 64, len(OUTPUT)])
+def test_elements_and_result_independent_of_chunking(size):
+    parser = StreamingJSONParser(array_keys=["diet", "workouts"])
+    items = feed_in_chunks(parser, OUTPUT, size)
+
+    assert items == [
+        ("diet", PLAN["diet"][0]),
+        ("diet", PLAN["diet"][1]),
+        ("workouts", PLAN["workouts"][0]),
+    ]
+    assert parser.done
+    assert parser.result() == PLAN
+
+
+def test_all_top_level_arrays_emitted_without_filter():
+    parser = StreamingJSONParser()
+    keys = [key for key, _ in feed_in_chunks(parser, OUTPUT, 5)]
+
+    assert keys == ["diet", "diet", "workouts", "ignored"]
+
+
+def test_unfinished_root_has_no_result():
+    parser = StreamingJSONParser(array_keys=["diet"])
+    items = parser.feed(OUTPUT[:OUTPUT.index('"summary"')])
+
+    assert len(items) == 2
+    assert not parser.done
+    assert parser.result() is None
+
+
+def test_text_before_root_is_skipped_across_chunks():
+    parser = StreamingJSONParser()
+    assert parser.feed("Sure! ") == []
+    assert parser.feed('```json\n{"diet": [{"a": 1}') == [("diet", {"a": 1})]
+    parser.feed("]}")
+
+    assert parser.result() == {"diet": [{"a": 1}]}
+    assert parser.text.startswith("Sure! ")
+
+
+def test_unparseable_element_is_skipped():
+    parser = StreamingJSONParser()
+    items = parser.feed('{"diet": [{"a": 1,}, {"b": 2}]}')
+
+    assert items == [("diet", {"b": 2})]